@@ -22,6 +22,10 @@ contextBridge.exposeInMainWorld('api', {
   // Tone adjustment
   adjustTone: (text, toneOptions) => ipcRenderer.invoke('adjust-tone', text, toneOptions),
   getTonePresets: () => ipcRenderer.invoke('get-tone-presets'),
+  previewTonePresets: (text, presetIds) => ipcRenderer.invoke('preview-tone-presets', text, presetIds),
+  startToneSession: (sessionId, text) => ipcRenderer.invoke('start-tone-session', sessionId, text),
+  editToneSession: (sessionId, offset, deletedLength, insertedText) =>
+    ipcRenderer.invoke('edit-tone-session', sessionId, offset, deletedLength, insertedText),
   
   // Plagiarism detection
   checkPlagiarism: (text) => ipcRenderer.invoke('check-plagiarism', text),
@@ -32,6 +36,7 @@ contextBridge.exposeInMainWorld('api', {
     const validChannels = [
       'typing-progress', 
       'typing-error', 
+      'humanization-partial',
       'humanization-complete',
       'tone-adjustment-complete',
       'plagiarism-results'
@@ -47,6 +52,7 @@ contextBridge.exposeInMainWorld('api', {
     const validChannels = [
       'typing-progress', 
       'typing-error', 
+      'humanization-partial',
       'humanization-complete',
       'tone-adjustment-complete',
       'plagiarism-results'
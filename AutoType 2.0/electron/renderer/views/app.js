@@ -388,6 +388,13 @@ function initHumanizer() {
     }
   });
   
+  // Show partial results as they stream in
+  let receivedPartial = false;
+  window.api.on('humanization-partial', (partial) => {
+    humanizedText.value = (receivedPartial ? humanizedText.value : '') + partial.text;
+    receivedPartial = true;
+  });
+  
   // Humanize button
   humanizeBtn.addEventListener('click', async () => {
     try {
@@ -410,10 +417,11 @@ function initHumanizer() {
       };
       
       // Call humanize API
+      receivedPartial = false;
       const result = await window.api.humanizeText(originalText.value, options);
       
       // Update UI with result
-      humanizedText.value = result;
+      humanizedText.value = result.text;
       humanizeBtn.disabled = false;
     } catch (error) {
       console.error('Failed to humanize text:', error);
@@ -450,6 +458,56 @@ function initToneAdjuster() {
   const pasteBtn = document.getElementById('tone-paste-btn');
   const pastePlainBtn = document.getElementById('tone-paste-plain-btn');
   const tonePresetBtns = document.querySelectorAll('.tone-preset-btn');
+  const liveAnalysis = document.getElementById('tone-live-analysis');
+  
+  // Live tone analysis, kept up to date by a session in the Python service
+  const toneSessionId = 'tone-adjuster';
+  let sessionText = null; // Text the session holds, null until it is started
+  
+  const showLiveAnalysis = (analysis) => {
+    liveAnalysis.textContent = `Formality ${analysis.formality.toFixed(1)} · ` +
+      `Technical ${analysis.technical_level.toFixed(1)} · ` +
+      `Reading ease ${analysis.flesch_reading_ease.toFixed(0)} · ` +
+      `Closest preset: ${analysis.closest_preset}`;
+  };
+  
+  const syncToneSession = async () => {
+    const text = originalText.value;
+    try {
+      if (sessionText === null) {
+        sessionText = text;
+        showLiveAnalysis(await window.api.startToneSession(toneSessionId, text));
+        return;
+      }
+      
+      const previous = sessionText;
+      if (text === previous) {
+        return;
+      }
+      
+      // Send only the changed range between the common prefix and suffix
+      let prefix = 0;
+      while (prefix < previous.length && prefix < text.length && previous[prefix] === text[prefix]) {
+        prefix++;
+      }
+      let suffix = 0;
+      while (suffix < previous.length - prefix && suffix < text.length - prefix &&
+             previous[previous.length - 1 - suffix] === text[text.length - 1 - suffix]) {
+        suffix++;
+      }
+      
+      // Edits are sent in order, so the next one may be sent before this one returns
+      sessionText = text;
+      showLiveAnalysis(await window.api.editToneSession(toneSessionId, prefix, previous.length - prefix - suffix,
+                                                        text.slice(prefix, text.length - suffix)));
+    } catch (error) {
+      // The service restarted and lost the session; the next change starts a new one
+      console.error('Failed to update tone analysis:', error);
+      sessionText = null;
+    }
+  };
+  
+  originalText.addEventListener('input', syncToneSession);
   
   // Range sliders and their value displays
   const sliders = [
@@ -478,6 +536,7 @@ function initToneAdjuster() {
     try {
       const text = await navigator.clipboard.readText();
       originalText.value = text;
+      syncToneSession();
     } catch (error) {
       console.error('Failed to read clipboard:', error);
     }
@@ -487,6 +546,7 @@ function initToneAdjuster() {
     try {
       const text = await navigator.clipboard.readText();
       originalText.value = text.replace(/\\r\\n/g, '\n').replace(/[\\u2018\\u2019]/g, "'").replace(/[\\u201C\\u201D]/g, '"');
+      syncToneSession();
     } catch (error) {
       console.error('Failed to read clipboard:', error);
     }
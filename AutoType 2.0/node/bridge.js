@@ -79,8 +79,8 @@ function runPythonScript(scriptName, args = [], progressCallback = null) {
     
     // Handle messages from the Python script
     pyshell.on('message', (message) => {
-      // If this is a progress update and a progress callback is provided
-      if (message.type === 'progress' && progressCallback) {
+      // If this is a progress update or a partial result and a progress callback is provided
+      if ((message.type === 'progress' || message.type === 'partial') && progressCallback) {
         progressCallback(message);
       } 
       // Otherwise, collect the result
@@ -102,6 +102,92 @@ function runPythonScript(scriptName, args = [], progressCallback = null) {
   });
 }
 
+// Long-lived Python process running the serve command, so NLP models and
+// reference index caches stay warm across commands
+let service = null;
+
+/**
+ * Start the serve process if it is not running
+ * @returns {Object} The service: its shell and the queue of pending commands
+ */
+function getService() {
+  if (service) {
+    return service;
+  }
+  
+  const options = {
+    mode: 'json',
+    pythonPath: pythonPath,
+    scriptPath: path.join(rootDir, 'python'),
+    args: ['serve']
+  };
+  
+  const current = {
+    shell: new PythonShell('api.py', options),
+    // Commands run one after another, so messages belong to the oldest pending command
+    pending: [],
+    ready: false,
+    nlpFeatures: []
+  };
+  
+  current.shell.on('message', (message) => {
+    if (message.type === 'ready') {
+      current.ready = true;
+      current.nlpFeatures = message.data.nlpFeatures || [];
+      return;
+    }
+    
+    const command = current.pending[0];
+    if (!current.ready || !command) {
+      // Messages outside a command, such as import errors at startup
+      console.error('Python service message:', message);
+      return;
+    }
+    
+    if (message.type === 'done') {
+      current.pending.shift();
+      command.resolve(command.results);
+    } else if ((message.type === 'progress' || message.type === 'partial') && command.progressCallback) {
+      command.progressCallback(message);
+    } else {
+      command.results.push(message);
+    }
+  });
+  
+  // Fail the pending commands if the process dies; the next command restarts it
+  const stop = (err) => {
+    if (service === current) {
+      service = null;
+    }
+    const pending = current.pending.splice(0);
+    pending.forEach((command) => command.reject(err || new Error('Python service exited')));
+  };
+  current.shell.on('error', (err) => {
+    console.error('Error in Python service:', err);
+    stop(err);
+  });
+  current.shell.on('close', () => stop(null));
+  
+  service = current;
+  return service;
+}
+
+/**
+ * Run an API command in the serve process and return its output
+ * @param {string} command - Name of the API command
+ * @param {Array} args - Arguments of the command
+ * @param {Function} progressCallback - Optional callback for progress updates and partial results
+ * @returns {Promise} Promise that resolves with the command's messages, like runPythonScript
+ */
+function runServiceCommand(command, args = [], progressCallback = null) {
+  return new Promise((resolve, reject) => {
+    const current = getService();
+    current.pending.push({ resolve, reject, progressCallback, results: [] });
+    // One JSON array of command-line arguments per line
+    current.shell.send([command, ...args]);
+  });
+}
+
 /**
  * Register IPC handlers for the auto-typing feature
  */
@@ -223,6 +309,8 @@ function registerHumanizerHandlers() {
       const vocabularyLevel = options.vocabularyLevel || 3; // Default: medium
       const addFillerWords = options.addFillerWords ? 'true' : 'false'; // Default: false
       const varySentenceBeginnings = options.varySentenceBeginnings ? 'true' : 'false'; // Default: false
+      const trackChanges = options.trackChanges ? 'true' : 'false'; // Default: false
+      const useNlp = options.useNlp === false ? 'false' : 'true'; // Default: true, falls back to rules without spaCy
       
       // Prepare arguments for the Python script
       const args = [
@@ -230,17 +318,37 @@ function registerHumanizerHandlers() {
         '--sentence_complexity', sentenceComplexity.toString(),
         '--vocabulary_level', vocabularyLevel.toString(),
         '--add_filler_words', addFillerWords,
-        '--vary_sentence_beginnings', varySentenceBeginnings
+        '--vary_sentence_beginnings', varySentenceBeginnings,
+        '--track_changes', trackChanges,
+        '--use_nlp', useNlp
       ];
       
+      // Forward partial results to the renderer as they arrive
+      const chunks = [];
+      const changes = [];
+      const partialCallback = (message) => {
+        if (message.type === 'partial') {
+          chunks.push(message.data.text);
+          // Spans are in offsets of the whole input and output, so they compose by concatenation
+          changes.push(...(message.data.changes || []));
+          event.sender.send('humanization-partial', message.data);
+        }
+      };
+      
       // Run the Python script
-      const result = await runPythonScript('api', ['humanize_text', ...args]);
+      const result = await runServiceCommand('humanize_text', args, partialCallback);
+      
+      // Report errors from the Python side
+      const errorMessage = result.find((message) => message.type === 'error');
+      if (errorMessage) {
+        throw new Error(errorMessage.data);
+      }
       
       // Send a completion event
       event.sender.send('humanization-complete', { success: true });
       
-      // Return the humanized text
-      return result[0].data.humanizedText || '';
+      // Return the humanized text with its edit spans [sourceStart, sourceEnd, targetStart, targetEnd]
+      return { text: chunks.join(''), changes: trackChanges === 'true' ? changes : null };
     } catch (error) {
       console.error('Error humanizing text:', error);
       event.sender.send('humanization-complete', { success: false, error: error.message });
@@ -270,7 +378,7 @@ function registerToneAdjusterHandlers() {
       ];
       
       // Run the Python script
-      const result = await runPythonScript('api', ['adjust_tone', ...args]);
+      const result = await runServiceCommand('adjust_tone', args);
       
       // Send a completion event
       event.sender.send('tone-adjustment-complete', { success: true });
@@ -287,13 +395,83 @@ function registerToneAdjusterHandlers() {
   // Get tone presets handler
   ipcMain.handle('get-tone-presets', async (event) => {
     try {
-      const result = await runPythonScript('api', ['get_tone_presets']);
+      const result = await runServiceCommand('get_tone_presets');
       return result[0].data || [];
     } catch (error) {
       console.error('Error getting tone presets:', error);
       throw error;
     }
   });
+  
+  // Preview presets handler
+  ipcMain.handle('preview-tone-presets', async (event, text, presetIds) => {
+    try {
+      // Prepare arguments for the Python script
+      const args = [
+        '--text', text,
+        '--presets', (presetIds || []).join(',')
+      ];
+      
+      // Run the Python script
+      const result = await runServiceCommand('preview_presets', args);
+      
+      // Report errors from the Python side
+      const errorMessage = result.find((message) => message.type === 'error');
+      if (errorMessage) {
+        throw new Error(errorMessage.data);
+      }
+      
+      // Return the analysis and the preview of each preset
+      return result[0].data.data || {};
+    } catch (error) {
+      console.error('Error previewing tone presets:', error);
+      throw error;
+    }
+  });
+  
+  // Start tone session handler; the session lives in the service process
+  ipcMain.handle('start-tone-session', async (event, sessionId, text) => {
+    try {
+      const result = await runServiceCommand('tone_session', ['--session_id', sessionId, '--text', text]);
+      
+      // Report errors from the Python side
+      const errorMessage = result.find((message) => message.type === 'error');
+      if (errorMessage) {
+        throw new Error(errorMessage.data);
+      }
+      
+      // Return the analysis of the initial text
+      return result[0].data.data;
+    } catch (error) {
+      console.error('Error starting tone session:', error);
+      throw error;
+    }
+  });
+  
+  // Edit tone session handler; an error means the session is gone and must be restarted
+  ipcMain.handle('edit-tone-session', async (event, sessionId, offset, deletedLength, insertedText) => {
+    try {
+      const args = [
+        '--session_id', sessionId,
+        '--offset', offset.toString(),
+        '--deleted_length', deletedLength.toString(),
+        '--inserted_text', insertedText
+      ];
+      const result = await runServiceCommand('tone_edit', args);
+      
+      // Report errors from the Python side
+      const errorMessage = result.find((message) => message.type === 'error');
+      if (errorMessage) {
+        throw new Error(errorMessage.data);
+      }
+      
+      // Return the updated analysis
+      return result[0].data.data;
+    } catch (error) {
+      console.error('Error editing tone session:', error);
+      throw error;
+    }
+  });
 }
 
 /**
@@ -309,7 +487,7 @@ function registerPlagiarismHandlers() {
       ];
       
       // Run the Python script
-      const result = await runPythonScript('api', ['check_plagiarism', ...args]);
+      const result = await runServiceCommand('check_plagiarism', args);
       
       // Send a completion event
       event.sender.send('plagiarism-results', { success: true });
@@ -327,5 +505,6 @@ function registerPlagiarismHandlers() {
 // Export the bridge functions
 module.exports = {
   initBridge,
-  runPythonScript
+  runPythonScript,
+  runServiceCommand
 }; 
\ No newline at end of file
@@ -8,7 +8,7 @@ import sys
 import json
 import argparse
 import traceback
-from typing import Dict, List, Any, Union
+from typing import Dict, List, Any, Optional, Union
 
 # Import modules
 try:
@@ -19,14 +19,20 @@ try:
     # Text humanization modules
     from humanizer.sentence_structure import restructure_sentences
     from humanizer.vocabulary import adjust_vocabulary
+    from humanizer.stream import humanize_stream, humanize_stream_with_changes
     
     # Tone adjustment modules
-    from tone.analyzer import analyze_tone
-    from tone.presets import get_tone_presets, apply_tone_preset
+    from tone.analyzer import analyze_tone, adjust_tone, get_closest_presets
+    from tone.presets import get_tone_presets, apply_tone_preset, preview_presets
+    from tone.session import ToneSession
     
     # Plagiarism detection modules
     from plagiarism.checker import check_plagiarism
+    from plagiarism.collusion import check_collusion
     from plagiarism.reports import generate_report
+    
+    # Shared NLP models
+    from nlp.model_service import configure_model_service
 except ImportError as e:
     # If modules can't be imported yet, we'll handle it when the functions are called
     print(json.dumps({"type": "error", "data": f"Module import error: {str(e)}"}))
@@ -37,7 +43,7 @@ def send_response(response_type: str, data: Any) -> None:
     Send a JSON response to stdout for the Node.js bridge to receive.
     
     Args:
-        response_type: The type of response (result, error, progress)
+        response_type: The type of response (result, error, progress, partial)
         data: The data to send
     """
     response = {
@@ -65,6 +71,21 @@ def send_progress(percent_complete: float, characters_typed: int, total_characte
     send_response("progress", progress_data)
 
 
+def send_partial(index: int, text: str, changes: Optional[List[Any]] = None) -> None:
+    """
+    Send an incremental piece of a streamed result.
+    
+    Args:
+        index: Position of the piece in the stream
+        text: The text of the piece
+        changes: Optional edit spans [sourceStart, sourceEnd, targetStart, targetEnd] in the piece
+    """
+    partial = {"index": index, "text": text}
+    if changes is not None:
+        partial["changes"] = [list(span) for span in changes]
+    send_response("partial", partial)
+
+
 def send_error(error_message: str) -> None:
     """
     Send an error message.
@@ -215,27 +236,26 @@ def handle_humanize_text(args: argparse.Namespace) -> None:
         vocabulary_level = int(args.vocabulary_level)
         add_filler_words = args.add_filler_words.lower() == 'true'
         vary_sentence_beginnings = args.vary_sentence_beginnings.lower() == 'true'
+        use_nlp = args.use_nlp.lower() == 'true'
+        track_changes = args.track_changes.lower() == 'true'
         
-        # This is a placeholder - in a real implementation, this would actually humanize the text
-        humanized_text = f"Humanized: {text}\n\n(This is a placeholder for the humanization algorithm.)"
-        
-        # If high complexity, add some lorem ipsum
-        if sentence_complexity > 3:
-            humanized_text += "\n\nLorem ipsum dolor sit amet, consectetur adipiscing elit."
-        
-        # If high vocabulary level, add some fancy words
-        if vocabulary_level > 3:
-            humanized_text += "\n\nIndubitably, the perspicacious erudition exemplifies grandiloquent vernacular."
-        
-        # If adding filler words, add some fillers
-        if add_filler_words:
-            humanized_text += "\n\nWell, you know, basically, to be honest, I think that, like, this text actually sounds more human now."
-        
-        # If varying sentence beginnings, add some variety
-        if vary_sentence_beginnings:
-            humanized_text += "\n\nFirstly, this shows variety. Additionally, the begins are different. Moreover, it has improved flow. Finally, it sounds natural."
+        # Forward each batch as soon as it is ready so the UI can show it immediately
+        chunk_count = 0
+        if track_changes:
+            # Edit spans let the UI highlight changes without diffing
+            for chunk, changes in humanize_stream_with_changes(text, sentence_complexity, vocabulary_level,
+                                                               add_filler_words, vary_sentence_beginnings,
+                                                               use_nlp=use_nlp):
+                send_partial(chunk_count, chunk, changes)
+                chunk_count += 1
+        else:
+            for chunk in humanize_stream(text, sentence_complexity, vocabulary_level,
+                                         add_filler_words, vary_sentence_beginnings, use_nlp=use_nlp):
+                send_partial(chunk_count, chunk)
+                chunk_count += 1
         
-        send_response("result", {"success": True, "data": {"humanizedText": humanized_text}})
+        # The text itself was already sent in the partial messages
+        send_response("result", {"success": True, "data": {"streamed": True, "chunks": chunk_count}})
     except Exception as e:
         send_error(f"Humanize text error: {str(e)}")
         traceback.print_exc()
@@ -257,30 +277,14 @@ def handle_adjust_tone(args: argparse.Namespace) -> None:
         technical_level = int(args.technical_level)
         preset = args.preset
         
-        # This is a placeholder - in a real implementation, this would actually adjust the tone
-        adjusted_text = f"Tone adjusted: {text}\n\n(This is a placeholder for the tone adjustment algorithm.)"
+        iterative = args.iterative.lower() == 'true'
+        tolerance = float(args.tolerance)
         
-        # Apply different adjustments based on the preset
-        if preset == 'academic':
-            adjusted_text = f"[Academic tone] {text}\n\nThe aforementioned subject matter presents a scholarly approach to the discourse. It is imperative to acknowledge the academic rigor required in this domain."
-        elif preset == 'casual':
-            adjusted_text = f"[Casual tone] {text}\n\nHey there! Just wanted to chat about this stuff. It's pretty cool when you think about it, right?"
-        elif preset == 'professional':
-            adjusted_text = f"[Professional tone] {text}\n\nThank you for your consideration of this matter. We believe this approach will yield optimal results for all stakeholders involved."
-        elif preset == 'technical':
-            adjusted_text = f"[Technical tone] {text}\n\nThe implementation utilizes a multi-threaded architecture with asynchronous I/O operations to maximize throughput while minimizing latency."
-        elif preset == 'creative':
-            adjusted_text = f"[Creative tone] {text}\n\nWords dance across the page, painting pictures in the mind's eye. Each syllable whispers a new possibility, a world of wonder waiting to be explored."
+        # Apply the preset, or the levels for a custom tone
+        if preset and preset != 'custom':
+            adjusted_text = apply_tone_preset(text, preset, iterative, tolerance)
         else:
-            # Custom tone based on formality and technical levels
-            if formality_level > 3 and technical_level > 3:
-                adjusted_text += "\n\nThis represents a highly formal and technical tone adjustment."
-            elif formality_level > 3:
-                adjusted_text += "\n\nThis represents a highly formal but less technical tone adjustment."
-            elif technical_level > 3:
-                adjusted_text += "\n\nThis represents a less formal but highly technical tone adjustment."
-            else:
-                adjusted_text += "\n\nThis represents a less formal and less technical tone adjustment."
+            adjusted_text = adjust_tone(text, formality_level, technical_level, iterative, tolerance)
         
         send_response("result", {"success": True, "data": {"adjustedText": adjusted_text}})
     except Exception as e:
@@ -296,20 +300,86 @@ def handle_get_tone_presets(_args: argparse.Namespace) -> None:
         _args: Command-line arguments (unused)
     """
     try:
-        # This is a placeholder - in a real implementation, this would get the actual tone presets
-        presets = [
-            {"id": "academic", "name": "Academic/Formal", "description": "Scholarly and rigorous tone suitable for academic papers"},
-            {"id": "casual", "name": "Casual/Conversational", "description": "Relaxed and friendly tone for informal communication"},
-            {"id": "professional", "name": "Professional/Business", "description": "Polished and respectful tone for business communication"},
-            {"id": "technical", "name": "Technical/Scientific", "description": "Precise and detailed tone for technical documentation"},
-            {"id": "creative", "name": "Creative/Narrative", "description": "Expressive and vivid tone for storytelling"}
-        ]
+        presets = get_tone_presets()
         send_response("result", {"success": True, "data": presets})
     except Exception as e:
         send_error(f"Get tone presets error: {str(e)}")
         traceback.print_exc()
 
 
+def handle_analyze_tone(args: argparse.Namespace) -> None:
+    """
+    Handle analyze tone command.
+    
+    Args:
+        args: Command-line arguments
+    """
+    try:
+        analysis = analyze_tone(args.text, heatmap_buckets=int(args.heatmap_buckets))
+        if int(args.top_k) > 0:
+            analysis["closest_presets"] = get_closest_presets(analysis, int(args.top_k))
+        send_response("result", {"success": True, "data": analysis})
+    except Exception as e:
+        send_error(f"Analyze tone error: {str(e)}")
+        traceback.print_exc()
+
+
+def handle_preview_presets(args: argparse.Namespace) -> None:
+    """
+    Handle preview presets command, which renders several tone presets at once.
+    
+    Args:
+        args: Command-line arguments
+    """
+    try:
+        preset_ids = [preset_id.strip() for preset_id in args.presets.split(',') if preset_id.strip()] if args.presets else None
+        preview = preview_presets(args.text, preset_ids)
+        send_response("result", {"success": True, "data": preview})
+    except Exception as e:
+        send_error(f"Preview presets error: {str(e)}")
+        traceback.print_exc()
+
+
+# Live tone sessions by ID; they persist across commands in serve mode, which the bridge uses for them
+tone_sessions: Dict[str, Any] = {}
+
+
+def handle_tone_session(args: argparse.Namespace) -> None:
+    """
+    Handle tone session command, which starts (or restarts) a live tone session.
+    
+    Args:
+        args: Command-line arguments
+    """
+    try:
+        session = ToneSession(args.text)
+        tone_sessions[args.session_id] = session
+        send_response("result", {"success": True, "data": session.analysis()})
+    except Exception as e:
+        send_error(f"Tone session error: {str(e)}")
+        traceback.print_exc()
+
+
+def handle_tone_edit(args: argparse.Namespace) -> None:
+    """
+    Handle tone edit command, which applies an edit to a live tone session.
+    
+    Args:
+        args: Command-line arguments
+    """
+    try:
+        session = tone_sessions.get(args.session_id)
+        if session is None:
+            send_error(f"Unknown tone session: {args.session_id}")
+            return
+        
+        analysis = session.apply_edit(int(args.offset), int(args.deleted_length), args.inserted_text)
+        send_response("result", {"success": True, "data": analysis})
+    except Exception as e:
+        send_error(f"Tone edit error: {str(e)}")
+        traceback.print_exc()
+
+
 def handle_check_plagiarism(args: argparse.Namespace) -> None:
     """
     Handle check plagiarism command.
@@ -318,37 +388,84 @@ def handle_check_plagiarism(args: argparse.Namespace) -> None:
         args: Command-line arguments
     """
     try:
-        # Get the text to check
-        text = args.text
-        
-        # This is a placeholder - in a real implementation, this would actually check for plagiarism
-        similarity_score = 0.25  # 25% similarity
-        
-        # Generate some fake sources
-        sources = [
-            {"url": "https://example.com/source1", "similarity": 0.15, "matchedText": "This part of the text seems to be similar to content found online."},
-            {"url": "https://example.org/source2", "similarity": 0.10, "matchedText": "Another part of the text has matching content from a different source."}
-        ]
-        
-        # Generate highlighted text
-        highlighted_text = text.replace("this", "<span class='plagiarism-highlight'>this</span>")
-        highlighted_text = highlighted_text.replace("the", "<span class='plagiarism-highlight'>the</span>")
+        result = check_plagiarism(args.text, args.index or None,
+                                  deadline_ms=float(args.deadline_ms) if args.deadline_ms else None,
+                                  stop_above=float(args.stop_above) if args.stop_above else None)
         
         send_response("result", {
             "success": True, 
-            "data": {
-                "similarityScore": similarity_score,
-                "sources": sources,
-                "highlightedText": highlighted_text
-            }
+            "data": result
         })
     except Exception as e:
         send_error(f"Check plagiarism error: {str(e)}")
         traceback.print_exc()
 
 
-def main() -> None:
-    """Main entry point for the API."""
+def handle_check_collusion(args: argparse.Namespace) -> None:
+    """
+    Handle check collusion command, which compares a batch of submissions with each other.
+    
+    Args:
+        args: Command-line arguments
+    """
+    try:
+        result = check_collusion(args.documents, args.template or None, float(args.min_similarity), int(args.workers))
+        
+        send_response("result", {
+            "success": True, 
+            "data": result
+        })
+    except Exception as e:
+        send_error(f"Check collusion error: {str(e)}")
+        traceback.print_exc()
+
+
+def handle_serve(args: argparse.Namespace, parser: argparse.ArgumentParser) -> None:
+    """
+    Handle serve command.
+    
+    Keeps the process alive and reads one command per line from stdin, so the
+    NLP pipelines are loaded once and stay warm across commands. Each line is a
+    JSON array of command-line arguments, e.g. ["humanize_text", "--text", "..."].
+    Every command's responses are followed by a "done" message.
+    
+    Args:
+        args: Command-line arguments
+        parser: The argument parser used to parse each command
+    """
+    service = configure_model_service(args.model, int(args.batch_size), int(args.workers))
+    if args.preload.lower() == 'true':
+        send_response("ready", {"nlpFeatures": service.warm_up()})
+    else:
+        send_response("ready", {"nlpFeatures": []})
+    
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        
+        try:
+            command_args = parser.parse_args(json.loads(line))
+            if command_args.command == 'serve':
+                send_error("Cannot nest serve commands")
+            else:
+                run_command(command_args)
+        except SystemExit:
+            # argparse exits on invalid arguments; report it and keep serving
+            send_error(f"Invalid command: {line.strip()}")
+        except Exception as e:
+            send_error(f"Serve error: {str(e)}")
+            traceback.print_exc()
+        
+        send_response("done", None)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Build the argument parser for all API commands.
+    
+    Returns:
+        The argument parser
+    """
     parser = argparse.ArgumentParser(description='AutoType API')
     subparsers = parser.add_subparsers(dest='command', help='Command to run')
     
@@ -385,6 +502,8 @@ def main() -> None:
     humanize_text_parser.add_argument('--vocabulary_level', default='3', help='Vocabulary level (1-5)')
     humanize_text_parser.add_argument('--add_filler_words', default='false', help='Add filler words (true/false)')
     humanize_text_parser.add_argument('--vary_sentence_beginnings', default='false', help='Vary sentence beginnings (true/false)')
+    humanize_text_parser.add_argument('--track_changes', default='false', help='Report edit spans with each partial result (true/false)')
+    humanize_text_parser.add_argument('--use_nlp', default='false', help='Use the spaCy pipeline for restructuring (true/false)')
     
     # Adjust tone command
     adjust_tone_parser = subparsers.add_parser('adjust_tone', help='Adjust tone')
@@ -392,18 +511,65 @@ def main() -> None:
     adjust_tone_parser.add_argument('--formality_level', default='3', help='Formality level (1-5)')
     adjust_tone_parser.add_argument('--technical_level', default='3', help='Technical level (1-5)')
     adjust_tone_parser.add_argument('--preset', default='custom', help='Tone preset (academic, casual, professional, technical, creative, custom)')
+    adjust_tone_parser.add_argument('--iterative', default='false', help='Keep rewriting until the target tone is reached (true/false)')
+    adjust_tone_parser.add_argument('--tolerance', default='0.25', help='How close to the target the scores must get in iterative mode')
     
     # Get tone presets command
     get_tone_presets_parser = subparsers.add_parser('get_tone_presets', help='Get tone presets')
     
+    # Analyze tone command
+    analyze_tone_parser = subparsers.add_parser('analyze_tone', help='Analyze tone')
+    analyze_tone_parser.add_argument('--text', required=True, help='Text to analyze')
+    analyze_tone_parser.add_argument('--heatmap_buckets', default='0', help='Number of heatmap sections (0 for none)')
+    analyze_tone_parser.add_argument('--top_k', default='0', help='Number of closest presets to list (0 for none)')
+    
+    # Preview presets command
+    preview_presets_parser = subparsers.add_parser('preview_presets', help='Preview several tone presets at once')
+    preview_presets_parser.add_argument('--text', required=True, help='Text to adjust tone')
+    preview_presets_parser.add_argument('--presets', default='', help='Comma-separated preset IDs (all presets if empty)')
+    
+    # Live tone session commands (only useful in serve mode, where sessions persist)
+    tone_session_parser = subparsers.add_parser('tone_session', help='Start a live tone session')
+    tone_session_parser.add_argument('--session_id', required=True, help='Session ID')
+    tone_session_parser.add_argument('--text', default='', help='Initial text')
+    
+    tone_edit_parser = subparsers.add_parser('tone_edit', help='Apply an edit to a live tone session')
+    tone_edit_parser.add_argument('--session_id', required=True, help='Session ID')
+    tone_edit_parser.add_argument('--offset', required=True, help='Offset of the edit')
+    tone_edit_parser.add_argument('--deleted_length', default='0', help='Number of characters deleted')
+    tone_edit_parser.add_argument('--inserted_text', default='', help='Text inserted')
+    
     # Check plagiarism command
     check_plagiarism_parser = subparsers.add_parser('check_plagiarism', help='Check plagiarism')
     check_plagiarism_parser.add_argument('--text', required=True, help='Text to check for plagiarism')
+    check_plagiarism_parser.add_argument('--index', default='', help='Reference index directory (defaults to the bundled index)')
+    check_plagiarism_parser.add_argument('--deadline_ms', default='', help='Time budget in ms; partial results are marked incomplete')
+    check_plagiarism_parser.add_argument('--stop_above', default='', help='Stop once the similarity score is known to exceed this')
     
-    # Parse arguments
-    args = parser.parse_args()
+    # Check collusion command
+    check_collusion_parser = subparsers.add_parser('check_collusion', help='Find submissions that share passages')
+    check_collusion_parser.add_argument('--documents', nargs='+', required=True, help='Submission files or directories')
+    check_collusion_parser.add_argument('--template', default='', help='File with text given to every student')
+    check_collusion_parser.add_argument('--min_similarity', default='0.1', help='Share of either text that must be shared')
+    check_collusion_parser.add_argument('--workers', default='1', help='Number of worker processes')
     
-    # Run the appropriate command
+    # Serve command
+    serve_parser = subparsers.add_parser('serve', help='Read commands from stdin, keeping NLP models warm')
+    serve_parser.add_argument('--model', default='en_core_web_sm', help='spaCy model to load')
+    serve_parser.add_argument('--batch_size', default='256', help='Number of texts per nlp.pipe batch')
+    serve_parser.add_argument('--workers', default='1', help='Number of nlp.pipe worker processes')
+    serve_parser.add_argument('--preload', default='true', help='Load the NLP pipelines at startup (true/false)')
+    
+    return parser
+
+
+def run_command(args: argparse.Namespace) -> None:
+    """
+    Run the handler for a parsed command.
+    
+    Args:
+        args: Parsed command-line arguments
+    """
     if args.command == 'auto_typer':
         handle_auto_typer(args)
     elif args.command == 'stop_typing':
@@ -422,12 +588,36 @@ def main() -> None:
         handle_adjust_tone(args)
     elif args.command == 'get_tone_presets':
         handle_get_tone_presets(args)
+    elif args.command == 'analyze_tone':
+        handle_analyze_tone(args)
+    elif args.command == 'preview_presets':
+        handle_preview_presets(args)
+    elif args.command == 'tone_session':
+        handle_tone_session(args)
+    elif args.command == 'tone_edit':
+        handle_tone_edit(args)
     elif args.command == 'check_plagiarism':
         handle_check_plagiarism(args)
+    elif args.command == 'check_collusion':
+        handle_check_collusion(args)
     else:
         send_error(f"Unknown command: {args.command}")
 
 
+def main() -> None:
+    """Main entry point for the API."""
+    parser = build_parser()
+    
+    # Parse arguments
+    args = parser.parse_args()
+    
+    # Run the appropriate command
+    if args.command == 'serve':
+        handle_serve(args, parser)
+    else:
+        run_command(args)
+
+
 if __name__ == '__main__':
     try:
         main()
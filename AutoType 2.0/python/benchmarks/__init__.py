@@ -0,0 +1,4 @@
+"""
+Benchmark module for the AutoType application.
+This module handles measuring the performance of the Python backend.
+"""
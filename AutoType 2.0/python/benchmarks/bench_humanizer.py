@@ -0,0 +1,204 @@
+"""
+Humanizer benchmark module for AutoType.
+This module measures how the humanization pipeline scales with input size and settings.
+
+Usage:
+    python -m benchmarks.bench_humanizer [--sizes 1KB,1MB] [--stages restructure,vocabulary]
+                                         [--save] [--compare] [--allocations]
+
+Each measurement runs in its own process and reports throughput in MB/s, peak RSS
+and allocation figures. Results can be saved as the baseline of the current release
+and compared against the baseline of the previous one.
+"""
+
+import argparse
+import os
+import random
+import sys
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.common import compare_results, load_results, measure, save_results
+from benchmarks.corpus import CORPUS_SIZES, format_size, get_corpus
+from humanizer.sentence_structure import restructure_sentences
+from humanizer.stream import humanize_stream
+from humanizer.vocabulary import adjust_vocabulary
+
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "humanizer.json")
+
+LEVELS = [1, 2, 3, 4, 5]
+
+# Fields that identify a measurement across runs
+KEY_FIELDS = ("stage", "size", "complexity", "vocabulary_level")
+
+
+def run_restructure(text: str, complexity: int, _vocabulary_level: int) -> None:
+    """Run the sentence restructuring stage."""
+    random.seed(0)
+    restructure_sentences(text, complexity, vary_beginnings=True)
+
+
+def run_vocabulary(text: str, _complexity: int, vocabulary_level: int) -> None:
+    """Run the vocabulary adjustment stage."""
+    random.seed(0)
+    adjust_vocabulary(text, vocabulary_level, add_fillers=True)
+
+
+def run_pipeline(text: str, complexity: int, vocabulary_level: int) -> None:
+    """Run the full streaming pipeline, discarding the output batches."""
+    random.seed(0)
+    for _ in humanize_stream(text, complexity, vocabulary_level, add_fillers=True, vary_beginnings=True):
+        pass
+
+
+# Stage name -> (function, whether it depends on complexity, whether it depends on vocabulary level)
+STAGES: Dict[str, Tuple[Callable, bool, bool]] = {
+    "restructure": (run_restructure, True, False),
+    "vocabulary": (run_vocabulary, False, True),
+    "pipeline": (run_pipeline, True, True),
+}
+
+
+def parse_size(value: str) -> int:
+    """
+    Parse a size such as '10KB' or '1MB'.
+    
+    Args:
+        value: The size string
+    
+    Returns:
+        Size in characters
+    """
+    value = value.strip().upper()
+    for unit, factor in (("MB", 1_000_000), ("KB", 1_000), ("B", 1)):
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * factor)
+    return int(value)
+
+
+def run_benchmarks(sizes: List[int], stages: List[str], trace_allocations: bool = False,
+                   isolate: bool = True) -> List[Dict[str, Any]]:
+    """
+    Run the benchmark matrix.
+    
+    Args:
+        sizes: Corpus sizes in characters
+        stages: Names of the stages to run (keys of STAGES)
+        trace_allocations: Whether to trace Python allocations (slower)
+        isolate: Whether to run each measurement in its own process
+    
+    Returns:
+        One result dictionary per (stage, size, complexity, vocabulary level);
+        failed measurements have an "error" instead of figures
+    """
+    results = []
+    
+    for size in sizes:
+        text = get_corpus(size)
+        
+        for stage in stages:
+            func, uses_complexity, uses_vocabulary = STAGES[stage]
+            complexities = LEVELS if uses_complexity else [None]
+            vocabulary_levels = LEVELS if uses_vocabulary else [None]
+            
+            for complexity in complexities:
+                for vocabulary_level in vocabulary_levels:
+                    result = {
+                        "stage": stage,
+                        "size": size,
+                        "complexity": complexity,
+                        "vocabulary_level": vocabulary_level,
+                    }
+                    try:
+                        measurement = measure(func, (text, complexity or 3, vocabulary_level or 3),
+                                              trace_allocations, isolate)
+                    except RuntimeError as e:
+                        # Keep going, so one crash (e.g. out of memory on the largest corpus) does not lose the run
+                        result["error"] = str(e)
+                    else:
+                        result["mb_per_second"] = (len(text) / 1_000_000) / max(measurement["seconds"], 1e-9)
+                        result.update(measurement)
+                    results.append(result)
+                    print_result(result)
+    
+    return results
+
+
+def print_result(result: Dict[str, Any]) -> None:
+    """
+    Print one result line.
+    
+    Args:
+        result: The result dictionary
+    """
+    settings = f"c={result['complexity'] or '-'} v={result['vocabulary_level'] or '-'}"
+    if "error" in result:
+        print(f"{result['stage']:<12} {format_size(result['size']):>6} {settings:<8} FAILED: {result['error']}")
+        sys.stdout.flush()
+        return
+    line = (f"{result['stage']:<12} {format_size(result['size']):>6} {settings:<8} "
+            f"{result['mb_per_second']:>9.2f} MB/s  {result['seconds']:>8.3f} s  "
+            f"peak RSS {result['peak_rss_kb'] / 1024:>8.1f} MB")
+    if "peak_traced_bytes" in result:
+        line += f"  traced {result['peak_traced_bytes'] / 1_000_000:>8.1f} MB"
+    print(line)
+    sys.stdout.flush()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command-line entry point.
+    
+    Args:
+        argv: Command-line arguments (defaults to sys.argv)
+    
+    Returns:
+        Exit code: 1 if a measurement failed or a regression against the baseline was found, else 0
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the AutoType humanizer")
+    parser.add_argument("--sizes", default=",".join(format_size(size) for size in CORPUS_SIZES),
+                        help="Comma-separated corpus sizes, e.g. 1KB,10MB")
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma-separated stages to run")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Baseline results file")
+    parser.add_argument("--save", action="store_true", help="Save the results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="Compare the results against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative throughput drop")
+    parser.add_argument("--allocations", action="store_true", help="Trace Python allocations (slower)")
+    parser.add_argument("--no-isolate", action="store_true", help="Run all measurements in this process")
+    args = parser.parse_args(argv)
+    
+    sizes = [parse_size(size) for size in args.sizes.split(",")]
+    stages = [stage.strip() for stage in args.stages.split(",")]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(unknown)}")
+    
+    # Load the previous baseline before a save overwrites it
+    baseline = load_results(args.baseline) if args.compare else None
+    
+    results = run_benchmarks(sizes, stages, args.allocations, not args.no_isolate)
+    failures = [result for result in results if "error" in result]
+    results = [result for result in results if "error" not in result]
+    
+    exit_code = 1 if failures else 0
+    if failures:
+        print(f"{len(failures)} measurement(s) failed")
+    if args.compare:
+        if baseline is None:
+            print(f"No baseline found at {args.baseline}")
+        else:
+            regressions = compare_results(baseline["results"], results, KEY_FIELDS,
+                                          "mb_per_second", args.tolerance)
+            print(f"Compared against version {baseline['version']}: {len(regressions)} regression(s)")
+            for regression in regressions:
+                print(f"  {regression['key']}: {regression['baseline']:.2f} -> {regression['current']:.2f} MB/s")
+            exit_code = 1 if regressions or failures else 0
+    
+    if args.save:
+        print(f"Saved baseline to {save_results(args.baseline, 'humanizer', results)}")
+    
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Plagiarism collusion benchmark module for AutoType.
+This module checks that batch collusion checks scale well below quadratically.
+
+Usage:
+    python -m benchmarks.bench_plagiarism_collusion [--min_submissions 1250] [--steps 3]
+                                                    [--class_size 100] [--workers N] [--save]
+
+Essays are generated as in benchmarks.bench_plagiarism_tfidf, all opening with
+the same assignment prompt, and one essay in COPIED_SHARE gets a passage copied
+from another. Batches of growing size are checked for collusion with the prompt
+as template. The run reports the time, the candidate pairs aligned and how many
+of the planted pairs were found, and the scaling exponent of the time against
+the number of submissions; it fails if the exponent exceeds the limit or the
+largest batch takes longer than allowed.
+
+A batch the size of a class is checked first. Its buckets all hold fewer than
+MAX_BUCKET_SIZE submissions, so the prompt alone would make every pair a
+candidate; the run also fails if more than MAX_CLASS_CANDIDATE_SHARE of its pairs
+are aligned.
+"""
+
+import argparse
+import os
+import random
+import sys
+from typing import Any, Dict, List, Optional
+
+from benchmarks.bench_plagiarism_tfidf import generate_documents
+from benchmarks.common import fit_exponent, get_release_version, save_results
+from plagiarism.collusion import DEFAULT_MIN_SIMILARITY, find_collusion
+
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "plagiarism_collusion")
+
+# Batch sizes grow by this factor from the smallest size
+DEFAULT_MIN_SUBMISSIONS = 1_250
+DEFAULT_STEPS = 3
+DEFAULT_GROWTH = 2
+
+# Comparing every pair would give an exponent of 2
+DEFAULT_MAX_EXPONENT = 1.5
+
+# Seconds the largest batch may take
+DEFAULT_MAX_SECONDS = 300.0
+
+# Submissions of a class, and the share of its pairs that may be aligned
+DEFAULT_CLASS_SIZE = 100
+MAX_CLASS_CANDIDATE_SHARE = 0.05
+
+# One essay in this many copies a passage from another
+COPIED_SHARE = 50
+
+# Words of a copied passage
+COPIED_WORDS = (60, 200)
+
+PROMPT = ("Write an essay about the causes of the industrial revolution and discuss its effects on society "
+          "in at least five hundred words.")
+
+
+def plant_copies(texts: List[str], rng: random.Random) -> List[Dict[str, Any]]:
+    """
+    Copy passages between random essays and prepend the prompt to each.
+    
+    Args:
+        texts: The essays
+        rng: Random number generator
+    
+    Returns:
+        The submissions, with the planted (source, copy) pairs under "copiedFrom"
+    """
+    texts = list(texts)
+    copied_from: Dict[int, List[int]] = {}
+    for _ in range(len(texts) // COPIED_SHARE):
+        source, copy = rng.sample(range(len(texts)), 2)
+        source_words = texts[source].split(" ")
+        length = rng.randint(*COPIED_WORDS)
+        start = rng.randrange(max(1, len(source_words) - length))
+        copy_words = texts[copy].split(" ")
+        position = rng.randrange(len(copy_words))
+        texts[copy] = " ".join(copy_words[:position] + source_words[start:start + length] + copy_words[position:])
+        copied_from.setdefault(copy, []).append(source)
+    return [{"id": str(number), "text": f"{PROMPT}\n\n{text}", "copiedFrom": copied_from.get(number, [])}
+            for number, text in enumerate(texts)]
+
+
+def run_size(texts: List[str], workers: int) -> Dict[str, Any]:
+    """
+    Check a batch of essays for collusion.
+    
+    Args:
+        texts: The essays
+        workers: Number of worker processes
+    
+    Returns:
+        Result dictionary with time, candidate pairs, pairs found and recall
+    """
+    submissions = plant_copies(texts, random.Random(len(texts)))
+    planted = {(min(source, number), max(source, number))
+               for number, submission in enumerate(submissions) for source in submission["copiedFrom"]}
+    
+    result = find_collusion(submissions, DEFAULT_MIN_SIMILARITY, template=PROMPT, workers=workers)
+    found = {(min(int(pair["first"]), int(pair["second"])), max(int(pair["first"]), int(pair["second"])))
+             for pair in result["pairs"]}
+    
+    size_result = {
+        "submissions": len(texts),
+        "workers": workers,
+        "seconds": result["seconds"],
+        "candidate_pairs": result["candidatePairs"],
+        "pairs": len(result["pairs"]),
+        "recall": len(found & planted) / max(len(planted), 1),
+    }
+    print(f"{len(texts):>7} submissions  {result['seconds']:7.2f} s  {result['candidatePairs']:>8} candidate pairs  "
+          f"{len(result['pairs']):>5} pairs  recall {size_result['recall']:.2f}")
+    sys.stdout.flush()
+    return size_result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command-line entry point.
+    
+    Args:
+        argv: Command-line arguments (defaults to sys.argv)
+    
+    Returns:
+        Exit code: 1 if the time grew faster or took longer than allowed, or a
+        class had too many candidate pairs, else 0
+    """
+    parser = argparse.ArgumentParser(description="Check how batch collusion checks scale with the number of submissions")
+    parser.add_argument("--min_submissions", type=int, default=DEFAULT_MIN_SUBMISSIONS, help="Smallest batch size")
+    parser.add_argument("--steps", type=int, default=DEFAULT_STEPS, help="Number of batch sizes")
+    parser.add_argument("--growth", type=int, default=DEFAULT_GROWTH, help="Factor between batch sizes")
+    parser.add_argument("--class_size", type=int, default=DEFAULT_CLASS_SIZE, help="Submissions of a class")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("--max_exponent", type=float, default=DEFAULT_MAX_EXPONENT, help="Allowed scaling exponent")
+    parser.add_argument("--max_seconds", type=float, default=DEFAULT_MAX_SECONDS,
+                        help="Seconds the largest batch may take")
+    parser.add_argument("--results_dir", default=DEFAULT_RESULTS_DIR, help="Directory of per-release results")
+    parser.add_argument("--save", action="store_true", help="Save the results for the current release")
+    args = parser.parse_args(argv)
+    
+    if args.steps < 2:
+        parser.error("At least two batch sizes are needed to fit an exponent")
+    
+    sizes = [args.min_submissions * args.growth ** step for step in range(args.steps)]
+    texts = generate_documents(max(sizes[-1], args.class_size))
+    class_result = run_size(texts[:args.class_size], args.workers)
+    class_pairs = args.class_size * (args.class_size - 1) // 2
+    print(f"Class candidate pairs {class_result['candidate_pairs']} of {class_pairs} "
+          f"(limit {MAX_CLASS_CANDIDATE_SHARE:.0%})")
+    
+    results = [run_size(texts[:size], args.workers) for size in sizes]
+    exponent = fit_exponent([result["submissions"] for result in results], [result["seconds"] for result in results])
+    print(f"Time scaling exponent {exponent:.2f} (limit {args.max_exponent})")
+    
+    if args.save:
+        path = os.path.join(args.results_dir, f"{get_release_version()}.json")
+        print(f"Saved results to {save_results(path, 'plagiarism_collusion', [class_result] + results)}")
+    
+    return 1 if (exponent > args.max_exponent or results[-1]["seconds"] > args.max_seconds
+                 or class_result["candidate_pairs"] > MAX_CLASS_CANDIDATE_SHARE * class_pairs) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
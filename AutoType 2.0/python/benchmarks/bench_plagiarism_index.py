@@ -0,0 +1,156 @@
+"""
+Plagiarism index benchmark module for AutoType.
+This module checks that plagiarism queries stay sublinear as the reference corpus grows.
+
+Usage:
+    python -m benchmarks.bench_plagiarism_index [--min_documents 2000] [--steps 3]
+                                                [--bands 20] [--rows 3] [--save]
+
+An index of generated documents is built for each corpus size, and queried with
+passages copied from random documents with every few words replaced. The run
+reports the mean query time, how often the copied document was found, and the
+scaling exponent of the query time against the number of documents; it fails if
+the exponent exceeds the limit.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.common import fit_exponent, get_release_version, save_results
+from benchmarks.corpus import generate_text
+from plagiarism.index import build_index, ReferenceIndex
+from plagiarism.minhash import DEFAULT_BANDS, DEFAULT_ROWS
+
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "plagiarism_index")
+
+# Corpus sizes grow by this factor from the smallest size
+DEFAULT_MIN_DOCUMENTS = 2_000
+DEFAULT_STEPS = 3
+DEFAULT_GROWTH = 4
+
+# Characters per generated document
+DOCUMENT_SIZE = 3_000
+
+# Queries per corpus size, and the slice of the source document each copies
+DEFAULT_QUERIES = 100
+QUERY_SLICE = (200, 1_500)
+
+# One word in this many is replaced in each query
+DEFAULT_EDIT_EVERY = 5
+REPLACEMENT_WORDS = ["banana", "zebra", "quartz", "velvet"]
+
+# Query time must grow slower than the corpus
+DEFAULT_MAX_EXPONENT = 0.5
+
+
+def edit_passage(text: str, every: int, rng: random.Random) -> str:
+    """
+    Replace every few words of a passage, as a light rewrite would.
+    
+    Args:
+        text: The passage
+        every: One word in this many is replaced
+        rng: Random number generator
+    
+    Returns:
+        The edited passage
+    """
+    words = text.split(" ")
+    return " ".join(rng.choice(REPLACEMENT_WORDS) if index % every == every - 1 else word
+                    for index, word in enumerate(words))
+
+
+def run_size(documents: int, queries: int, edit_every: int, bands: int, rows: int) -> Dict[str, Any]:
+    """
+    Build an index of generated documents and time queries against it.
+    
+    Args:
+        documents: Number of documents in the corpus
+        queries: Number of queries
+        edit_every: One query word in this many is replaced
+        bands: Number of MinHash bands
+        rows: Rows per MinHash band
+    
+    Returns:
+        Result dictionary with build and mean query time and recall
+    """
+    texts = [generate_text(DOCUMENT_SIZE, seed=seed) for seed in range(documents)]
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "index")
+        start = time.perf_counter()
+        build_index(({"id": str(number), "text": text} for number, text in enumerate(texts)), path,
+                    bands=bands, rows=rows)
+        build_seconds = time.perf_counter() - start
+        
+        index = ReferenceIndex(path)
+        rng = random.Random(documents)
+        found = 0
+        query_seconds = 0.0
+        for _ in range(queries):
+            source = rng.randrange(documents)
+            text = edit_passage(texts[source][QUERY_SLICE[0]:QUERY_SLICE[1]], edit_every, rng)
+            start = time.perf_counter()
+            results = index.search(text)
+            query_seconds += time.perf_counter() - start
+            found += any(result["document"] == source for result in results)
+        del index
+    
+    result = {
+        "documents": documents,
+        "build_seconds": build_seconds,
+        "query_ms": query_seconds / queries * 1000,
+        "recall": found / queries,
+    }
+    print(f"{documents:>10} documents  build {build_seconds:7.1f} s  query {result['query_ms']:6.2f} ms  "
+          f"recall {result['recall']:.2f}")
+    sys.stdout.flush()
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command-line entry point.
+    
+    Args:
+        argv: Command-line arguments (defaults to sys.argv)
+    
+    Returns:
+        Exit code: 1 if query time grew faster than allowed, else 0
+    """
+    parser = argparse.ArgumentParser(description="Check how plagiarism queries scale with the corpus")
+    parser.add_argument("--min_documents", type=int, default=DEFAULT_MIN_DOCUMENTS, help="Smallest corpus size")
+    parser.add_argument("--steps", type=int, default=DEFAULT_STEPS, help="Number of corpus sizes")
+    parser.add_argument("--growth", type=int, default=DEFAULT_GROWTH, help="Factor between corpus sizes")
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES, help="Queries per corpus size")
+    parser.add_argument("--edit_every", type=int, default=DEFAULT_EDIT_EVERY, help="Replace one query word in this many")
+    parser.add_argument("--bands", type=int, default=DEFAULT_BANDS, help="Number of MinHash bands")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Rows per MinHash band")
+    parser.add_argument("--max_exponent", type=float, default=DEFAULT_MAX_EXPONENT, help="Allowed scaling exponent")
+    parser.add_argument("--results_dir", default=DEFAULT_RESULTS_DIR, help="Directory of per-release results")
+    parser.add_argument("--save", action="store_true", help="Save the results for the current release")
+    args = parser.parse_args(argv)
+    
+    if args.steps < 2:
+        parser.error("At least two sizes are needed to fit an exponent")
+    
+    sizes = [args.min_documents * args.growth ** step for step in range(args.steps)]
+    results = [run_size(size, args.queries, args.edit_every, args.bands, args.rows) for size in sizes]
+    exponent = fit_exponent(sizes, [result["query_ms"] for result in results])
+    print(f"Query time scaling exponent {exponent:.2f} (limit {args.max_exponent})")
+    
+    if args.save:
+        path = os.path.join(args.results_dir, f"{get_release_version()}.json")
+        print(f"Saved results to {save_results(path, 'plagiarism_index', results)}")
+    
+    return 1 if exponent > args.max_exponent else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
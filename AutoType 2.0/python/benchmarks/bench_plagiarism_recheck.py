@@ -0,0 +1,143 @@
+"""
+Plagiarism recheck benchmark module for AutoType.
+This module checks that rechecking an edited text only pays for the fragments that changed.
+
+Usage:
+    python -m benchmarks.bench_plagiarism_recheck [--documents 2000] [--paragraphs 12]
+                                                  [--rechecks 20] [--min_speedup 3] [--save]
+
+An index of generated documents is built with paraphrase search (see
+benchmarks.bench_plagiarism_tfidf), and an essay is assembled from paragraphs
+copied from random documents and paragraphs of new text. The essay is checked
+once, then edited one paragraph at a time and rechecked after each edit, as a
+student revising it would. The run reports the time of the first check, of a
+check without the fragment cache and of the rechecks, and how many rechecks
+found another result than uncached checks. Both search the text fragment by
+fragment, so their results must be identical. The run fails if rechecks are not
+at least min_speedup times faster than uncached checks or if a result differs.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.bench_plagiarism_tfidf import generate_documents
+from benchmarks.common import get_release_version, save_results
+from plagiarism.checker import check_plagiarism
+from plagiarism.index import build_index
+
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "plagiarism_recheck")
+
+DEFAULT_DOCUMENTS = 2_000
+DEFAULT_PARAGRAPHS = 12
+DEFAULT_RECHECKS = 20
+
+# Rechecks must be this many times faster than uncached checks
+DEFAULT_MIN_SPEEDUP = 3.0
+
+# Words per essay paragraph
+PARAGRAPH_WORDS = 80
+
+
+def run(documents: int, paragraphs: int, rechecks: int) -> Dict[str, Any]:
+    """
+    Build an index of generated documents and time rechecks of an edited essay.
+    
+    Args:
+        documents: Number of documents in the corpus
+        paragraphs: Paragraphs of the essay
+        rechecks: Number of edits, each followed by a recheck
+    
+    Returns:
+        Result dictionary with the time of each kind of check and the speedup
+    """
+    texts = generate_documents(documents + paragraphs)
+    # Documents past the indexed ones provide the essay's new text
+    own = texts[documents:]
+    rng = random.Random(documents)
+    
+    essay = []
+    for number in range(paragraphs):
+        source = own[number] if number % 2 else texts[rng.randrange(documents)]
+        words = source.split(" ")
+        start = rng.randrange(len(words) - PARAGRAPH_WORDS)
+        essay.append(" ".join(words[start:start + PARAGRAPH_WORDS]))
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "index")
+        build_index(({"id": str(number), "text": text} for number, text in enumerate(texts[:documents])), path,
+                    paraphrases=True)
+        
+        start = time.perf_counter()
+        check_plagiarism("\n\n".join(essay), path)
+        first_seconds = time.perf_counter() - start
+        
+        uncached_seconds = 0.0
+        recheck_seconds = 0.0
+        mismatches = 0
+        for edit in range(rechecks):
+            paragraph = rng.randrange(paragraphs)
+            essay[paragraph] = f"{essay[paragraph]} Revision {edit} adds a sentence here."
+            text = "\n\n".join(essay)
+            
+            start = time.perf_counter()
+            cached = check_plagiarism(text, path)
+            recheck_seconds += time.perf_counter() - start
+            
+            start = time.perf_counter()
+            uncached = check_plagiarism(text, path, use_cache=False)
+            uncached_seconds += time.perf_counter() - start
+            mismatches += cached != uncached
+    
+    result = {
+        "documents": documents,
+        "paragraphs": paragraphs,
+        "first_ms": first_seconds * 1000,
+        "uncached_ms": uncached_seconds / rechecks * 1000,
+        "recheck_ms": recheck_seconds / rechecks * 1000,
+        "speedup": uncached_seconds / recheck_seconds,
+        "mismatches": mismatches,
+    }
+    print(f"{documents:>8} documents  first check {result['first_ms']:8.1f} ms  uncached {result['uncached_ms']:8.1f} ms  "
+          f"recheck {result['recheck_ms']:8.1f} ms  speedup {result['speedup']:5.1f}x  "
+          f"mismatches {mismatches}")
+    sys.stdout.flush()
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command-line entry point.
+    
+    Args:
+        argv: Command-line arguments (defaults to sys.argv)
+    
+    Returns:
+        Exit code: 1 if rechecks were too slow or found other scores, else 0
+    """
+    parser = argparse.ArgumentParser(description="Check that plagiarism rechecks only search changed fragments")
+    parser.add_argument("--documents", type=int, default=DEFAULT_DOCUMENTS, help="Number of documents")
+    parser.add_argument("--paragraphs", type=int, default=DEFAULT_PARAGRAPHS, help="Paragraphs of the essay")
+    parser.add_argument("--rechecks", type=int, default=DEFAULT_RECHECKS, help="Number of edits and rechecks")
+    parser.add_argument("--min_speedup", type=float, default=DEFAULT_MIN_SPEEDUP,
+                        help="Rechecks must be this many times faster than uncached checks")
+    parser.add_argument("--results_dir", default=DEFAULT_RESULTS_DIR, help="Directory of per-release results")
+    parser.add_argument("--save", action="store_true", help="Save the results for the current release")
+    args = parser.parse_args(argv)
+    
+    result = run(args.documents, args.paragraphs, args.rechecks)
+    
+    if args.save:
+        path = os.path.join(args.results_dir, f"{get_release_version()}.json")
+        print(f"Saved results to {save_results(path, 'plagiarism_recheck', [result])}")
+    
+    return 1 if result["speedup"] < args.min_speedup or result["mismatches"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
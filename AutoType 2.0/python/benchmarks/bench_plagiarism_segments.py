@@ -0,0 +1,144 @@
+"""
+Plagiarism segments benchmark module for AutoType.
+This module checks that plagiarism queries stay flat as an index is split into more segments.
+
+Usage:
+    python -m benchmarks.bench_plagiarism_segments [--documents 8000] [--min_segments 1] [--steps 4]
+                                                   [--workers N] [--save]
+
+The same generated documents are indexed as one segment, then as more and more
+segments, and each index is queried with edited passages copied from random
+documents. The run reports the mean query time, the share of segments skipped
+through their bloom filters, and the scaling exponent of the query time against
+the number of segments; it fails if the exponent exceeds the limit.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.bench_plagiarism_index import DEFAULT_EDIT_EVERY, DOCUMENT_SIZE, QUERY_SLICE, edit_passage
+from benchmarks.common import fit_exponent, get_release_version, save_results
+from benchmarks.corpus import generate_text
+from plagiarism.fingerprint import fingerprint
+from plagiarism.index import (DEFAULT_QUERY_WORKERS, ReferenceIndex, create_index, new_segment_writer, publish_segment,
+                              segment_parameters)
+from plagiarism.segment import prepare_document, prepare_query
+
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "plagiarism_segments")
+
+DEFAULT_DOCUMENTS = 8_000
+
+# Segment counts grow by this factor from the smallest count
+DEFAULT_MIN_SEGMENTS = 1
+DEFAULT_STEPS = 4
+DEFAULT_GROWTH = 4
+
+DEFAULT_QUERIES = 100
+
+# Query time may grow only slightly with the number of segments
+DEFAULT_MAX_EXPONENT = 0.25
+
+
+def run_segments(texts: List[str], segments: int, queries: int, workers: int) -> Dict[str, Any]:
+    """
+    Index documents as a number of segments and time queries against it.
+    
+    Args:
+        texts: The document texts
+        segments: Number of segments to split them into
+        queries: Number of queries
+        workers: Threads searching segments in parallel
+    
+    Returns:
+        Result dictionary with mean query time, recall and share of segments skipped
+    """
+    per_segment = -(-len(texts) // segments)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "index")
+        manifest = create_index(path)
+        parameters = segment_parameters(manifest)
+        for first in range(0, len(texts), per_segment):
+            writer = new_segment_writer(path, manifest)
+            for number in range(first, min(first + per_segment, len(texts))):
+                writer.add(prepare_document({"id": str(number), "text": texts[number]}, parameters))
+            manifest = publish_segment(path, writer)
+        
+        index = ReferenceIndex(path, workers=workers)
+        # The same queries for every segment count
+        rng = random.Random(len(texts))
+        found = 0
+        skipped = 0
+        query_seconds = 0.0
+        for _ in range(queries):
+            source = rng.randrange(len(texts))
+            text = edit_passage(texts[source][QUERY_SLICE[0]:QUERY_SLICE[1]], DEFAULT_EDIT_EVERY, rng)
+            start = time.perf_counter()
+            results = index.search(text)
+            query_seconds += time.perf_counter() - start
+            found += any(result["document"] == source for result in results)
+            
+            query = prepare_query(text, fingerprint(text, index.k, index.window), index.hasher)
+            skipped += sum(not segment.might_match(query) for segment in index.segments)
+        del index
+    
+    result = {
+        "segments": len(manifest["segments"]),
+        "documents": len(texts),
+        "workers": workers,
+        "query_ms": query_seconds / queries * 1000,
+        "recall": found / queries,
+        "skipped": skipped / (queries * len(manifest["segments"])),
+    }
+    print(f"{result['segments']:>6} segments  query {result['query_ms']:6.2f} ms  recall {result['recall']:.2f}  "
+          f"skipped {result['skipped']:.0%}")
+    sys.stdout.flush()
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command-line entry point.
+    
+    Args:
+        argv: Command-line arguments (defaults to sys.argv)
+    
+    Returns:
+        Exit code: 1 if query time grew faster than allowed, else 0
+    """
+    parser = argparse.ArgumentParser(description="Check how plagiarism queries scale with the number of segments")
+    parser.add_argument("--documents", type=int, default=DEFAULT_DOCUMENTS, help="Number of documents")
+    parser.add_argument("--min_segments", type=int, default=DEFAULT_MIN_SEGMENTS, help="Smallest number of segments")
+    parser.add_argument("--steps", type=int, default=DEFAULT_STEPS, help="Number of segment counts")
+    parser.add_argument("--growth", type=int, default=DEFAULT_GROWTH, help="Factor between segment counts")
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES, help="Queries per segment count")
+    parser.add_argument("--workers", type=int, default=DEFAULT_QUERY_WORKERS, help="Threads searching segments")
+    parser.add_argument("--max_exponent", type=float, default=DEFAULT_MAX_EXPONENT, help="Allowed scaling exponent")
+    parser.add_argument("--results_dir", default=DEFAULT_RESULTS_DIR, help="Directory of per-release results")
+    parser.add_argument("--save", action="store_true", help="Save the results for the current release")
+    args = parser.parse_args(argv)
+    
+    if args.steps < 2:
+        parser.error("At least two segment counts are needed to fit an exponent")
+    
+    texts = [generate_text(DOCUMENT_SIZE, seed=seed) for seed in range(args.documents)]
+    counts = [args.min_segments * args.growth ** step for step in range(args.steps)]
+    results = [run_segments(texts, count, args.queries, args.workers) for count in counts]
+    exponent = fit_exponent([result["segments"] for result in results], [result["query_ms"] for result in results])
+    print(f"Query time scaling exponent {exponent:.2f} (limit {args.max_exponent})")
+    
+    if args.save:
+        path = os.path.join(args.results_dir, f"{get_release_version()}.json")
+        print(f"Saved results to {save_results(path, 'plagiarism_segments', results)}")
+    
+    return 1 if exponent > args.max_exponent else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
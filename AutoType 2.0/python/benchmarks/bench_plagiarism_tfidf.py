@@ -0,0 +1,186 @@
+"""
+Plagiarism TF-IDF benchmark module for AutoType.
+This module checks the throughput and recall of the paraphrase search.
+
+Usage:
+    python -m benchmarks.bench_plagiarism_tfidf [--documents 4000] [--queries 50]
+                                                [--min_throughput 1000000] [--save]
+
+Documents are generated from a large vocabulary with Zipf-distributed word
+frequencies, as in natural text, since TF-IDF relies on rare words standing out
+(the small vocabulary of benchmarks.corpus makes every passage alike). An index
+of them is built with paraphrase search, and queried with paragraphs copied
+from random documents and reworded: sentences are shuffled, every third word is
+dropped and others are inflected, so few runs of words survive intact. The run
+reports the size of the TF-IDF files, how many reference passages the index
+holds per second of query time and how often the copied document is among the
+reported sources; it fails if the throughput is below the limit.
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.bench_plagiarism_index import QUERY_SLICE
+from benchmarks.common import get_release_version, save_results
+from plagiarism.index import ReferenceIndex, build_index
+from plagiarism.tfidf import DEFAULT_MIN_SIMILARITY
+
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "plagiarism_tfidf")
+
+DEFAULT_DOCUMENTS = 4_000
+DEFAULT_QUERIES = 50
+
+# Reference passages scored per second, at least
+DEFAULT_MIN_THROUGHPUT = 1_000_000
+
+# Words per generated document, and distinct words of the generated language
+DOCUMENT_WORDS = 500
+VOCABULARY_SIZE = 50_000
+
+# Exponent of the Zipf distribution of word frequencies
+ZIPF_EXPONENT = 1.1
+
+# Words are spelled with English letter frequencies (per mille), so character
+# n-grams are about as common as in English
+LETTERS = "etaoinshrdlcumwfgypbvkjxqz"
+LETTER_FREQUENCIES = [127, 91, 82, 75, 70, 67, 63, 61, 60, 43, 40, 28, 28, 24, 24, 22, 20, 20, 19, 15, 10, 8, 2, 2, 1, 1]
+
+SENTENCE_END_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+
+def generate_documents(documents: int, seed: int = 0) -> List[str]:
+    """
+    Generate documents in a language with a natural distribution of word frequencies.
+    
+    Args:
+        documents: Number of documents
+        seed: Random seed
+    
+    Returns:
+        The document texts
+    """
+    rng = random.Random(seed)
+    vocabulary = sorted({"".join(rng.choices(LETTERS, LETTER_FREQUENCIES, k=rng.randint(2, 10)))
+                         for _ in range(VOCABULARY_SIZE)})
+    rng.shuffle(vocabulary)
+    weights = [1.0 / rank ** ZIPF_EXPONENT for rank in range(1, len(vocabulary) + 1)]
+    
+    texts = []
+    for _ in range(documents):
+        words = rng.choices(vocabulary, weights, k=DOCUMENT_WORDS)
+        sentences = []
+        position = 0
+        while position < len(words):
+            length = rng.randint(6, 24)
+            sentence = " ".join(words[position:position + length])
+            sentences.append(sentence[0].upper() + sentence[1:] + ".")
+            position += length
+        texts.append(" ".join(sentences))
+    return texts
+
+
+def reword_passage(text: str, rng: random.Random) -> str:
+    """
+    Reword a passage: shuffle its sentences, drop every third word and inflect others.
+    
+    Args:
+        text: The passage
+        rng: Random number generator
+    
+    Returns:
+        The reworded passage
+    """
+    sentences = SENTENCE_END_PATTERN.split(text)
+    rng.shuffle(sentences)
+    words = " ".join(sentences).split()
+    return " ".join(word + "s" if index % 3 == 1 and word.isalpha() else word
+                    for index, word in enumerate(words) if index % 3 != 2)
+
+
+def run(documents: int, queries: int, min_similarity: float) -> Dict[str, Any]:
+    """
+    Build an index of generated documents and time paraphrase searches against it.
+    
+    Args:
+        documents: Number of documents in the corpus
+        queries: Number of queries
+        min_similarity: Lowest similarity reported
+    
+    Returns:
+        Result dictionary with passages, TF-IDF size, query time, throughput and recall
+    """
+    texts = generate_documents(documents)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "index")
+        build_index(({"id": str(number), "text": text} for number, text in enumerate(texts)), path, paraphrases=True)
+        index = ReferenceIndex(path)
+        passages = sum(len(segment.tfidf) for segment in index.segments)
+        tfidf_bytes = sum(os.path.getsize(os.path.join(segment_path, name))
+                          for segment_path, _, names in os.walk(path) for name in names if name.startswith("tfidf_"))
+        
+        rng = random.Random(documents)
+        found = 0
+        query_seconds = 0.0
+        for _ in range(queries):
+            source = rng.randrange(documents)
+            text = reword_passage(texts[source][QUERY_SLICE[0]:QUERY_SLICE[1]], rng)
+            start = time.perf_counter()
+            results = index.paraphrases(text, min_similarity=min_similarity)
+            query_seconds += time.perf_counter() - start
+            found += any(match["document"] == source for result in results for match in result["matches"])
+        del index
+    
+    result = {
+        "documents": documents,
+        "passages": passages,
+        "tfidf_mb": tfidf_bytes / 2 ** 20,
+        "query_ms": query_seconds / queries * 1000,
+        "passages_per_second": passages * queries / query_seconds,
+        "recall": found / queries,
+    }
+    print(f"{documents:>10} documents  {passages:>9} passages  {result['tfidf_mb']:7.1f} MB  query {result['query_ms']:7.2f} ms  "
+          f"{result['passages_per_second']:>10.0f} passages/s  recall {result['recall']:.2f}")
+    sys.stdout.flush()
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command-line entry point.
+    
+    Args:
+        argv: Command-line arguments (defaults to sys.argv)
+    
+    Returns:
+        Exit code: 1 if fewer passages than allowed were scored per second, else 0
+    """
+    parser = argparse.ArgumentParser(description="Check the throughput and recall of the paraphrase search")
+    parser.add_argument("--documents", type=int, default=DEFAULT_DOCUMENTS, help="Number of documents")
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES, help="Number of queries")
+    parser.add_argument("--min_similarity", type=float, default=DEFAULT_MIN_SIMILARITY,
+                        help="Lowest similarity reported")
+    parser.add_argument("--min_throughput", type=float, default=DEFAULT_MIN_THROUGHPUT,
+                        help="Passages scored per second, at least")
+    parser.add_argument("--results_dir", default=DEFAULT_RESULTS_DIR, help="Directory of per-release results")
+    parser.add_argument("--save", action="store_true", help="Save the results for the current release")
+    args = parser.parse_args(argv)
+    
+    result = run(args.documents, args.queries, args.min_similarity)
+    
+    if args.save:
+        path = os.path.join(args.results_dir, f"{get_release_version()}.json")
+        print(f"Saved results to {save_results(path, 'plagiarism_tfidf', [result])}")
+    
+    return 1 if result["passages_per_second"] < args.min_throughput else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
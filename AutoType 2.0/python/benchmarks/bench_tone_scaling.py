@@ -0,0 +1,186 @@
+"""
+Tone scaling benchmark module for AutoType.
+This module checks that the tone functions scale linearly with input size.
+
+Usage:
+    python -m benchmarks.bench_tone_scaling [--functions analyze_tone,adjust_formality]
+                                            [--inputs prose,unbroken] [--margin 0.25] [--save]
+
+Each function is timed on inputs that grow by a constant factor, for ordinary prose
+and for pathological shapes (near-matches of multi-word rules, one unbroken run,
+punctuation only). The scaling exponent is the slope of log(time) against
+log(size); the run fails if any exponent exceeds 1 by more than the margin.
+Results can be saved per release.
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.common import fit_exponent, get_release_version, save_results
+from benchmarks.corpus import format_size, generate_text
+from tone.analyzer import adjust_formality, adjust_technical_level, analyze_tone
+
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "tone_scaling")
+
+# Input sizes grow by this factor from the smallest size
+DEFAULT_MIN_SIZE = 8_000
+DEFAULT_STEPS = 5
+DEFAULT_GROWTH = 4
+
+# Allowed excess of the scaling exponent over 1 (linear)
+DEFAULT_MARGIN = 0.25
+
+# Each measurement is the fastest of this many runs
+DEFAULT_REPEATS = 3
+
+# Function name -> function of the text
+FUNCTIONS: Dict[str, Callable[[str], Any]] = {
+    "analyze_tone": analyze_tone,
+    "adjust_formality_up": lambda text: adjust_formality(text, 1.0),
+    "adjust_formality_down": lambda text: adjust_formality(text, -1.0),
+    "adjust_technical_up": lambda text: adjust_technical_level(text, 1.0),
+    "adjust_technical_down": lambda text: adjust_technical_level(text, -1.0),
+}
+
+
+def _repeat_to_size(unit: str, size: int) -> str:
+    """Repeat unit until the text has size characters."""
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+# Input shape -> function of the size returning the text
+INPUTS: Dict[str, Callable[[int], str]] = {
+    "prose": lambda size: generate_text(size, seed=7),
+    # Every word starts a multi-word rule ("look at", "exception handling") that never completes
+    "near_matches": lambda size: _repeat_to_size("look exception performance ", size),
+    # No word boundaries or sentence endings at all
+    "unbroken": lambda size: "a" * size,
+    # Sentence endings and nothing else
+    "punctuation": lambda size: _repeat_to_size(". ", size),
+    # One sentence with no line breaks, made of indicator words
+    "indicators": lambda size: _repeat_to_size("you algorithm stuff thus interface ", size),
+}
+
+
+def time_call(func: Callable[[str], Any], text: str, repeats: int) -> float:
+    """
+    Time a call.
+    
+    Args:
+        func: The function to time
+        text: Its argument
+        repeats: Number of runs
+    
+    Returns:
+        Seconds taken by the fastest run
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmarks(functions: List[str], inputs: List[str], sizes: List[int],
+                   repeats: int = DEFAULT_REPEATS, margin: float = DEFAULT_MARGIN) -> List[Dict[str, Any]]:
+    """
+    Time every function on every input shape and fit the scaling exponents.
+    
+    Args:
+        functions: Names of the functions to run (keys of FUNCTIONS)
+        inputs: Names of the input shapes (keys of INPUTS)
+        sizes: Input sizes in characters, in increasing order
+        repeats: Number of runs per measurement
+        margin: Allowed excess of the exponent over 1
+    
+    Returns:
+        One result dictionary per (function, input)
+    """
+    results = []
+    
+    for input_name in inputs:
+        texts = [INPUTS[input_name](size) for size in sizes]
+        
+        for function_name in functions:
+            func = FUNCTIONS[function_name]
+            seconds = [time_call(func, text, repeats) for text in texts]
+            exponent = fit_exponent(sizes, seconds)
+            result = {
+                "function": function_name,
+                "input": input_name,
+                "sizes": sizes,
+                "seconds": seconds,
+                "exponent": exponent,
+                "linear": exponent <= 1.0 + margin,
+            }
+            results.append(result)
+            print_result(result)
+    
+    return results
+
+
+def print_result(result: Dict[str, Any]) -> None:
+    """
+    Print one result line.
+    
+    Args:
+        result: The result dictionary
+    """
+    largest = f"{format_size(result['sizes'][-1])} in {result['seconds'][-1]:.3f} s"
+    status = "ok" if result["linear"] else "SUPERLINEAR"
+    print(f"{result['function']:<22} {result['input']:<13} exponent {result['exponent']:>5.2f}  "
+          f"{largest:<20} {status}")
+    sys.stdout.flush()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command-line entry point.
+    
+    Args:
+        argv: Command-line arguments (defaults to sys.argv)
+    
+    Returns:
+        Exit code: 1 if a function scaled worse than linear by more than the margin, else 0
+    """
+    parser = argparse.ArgumentParser(description="Check how the AutoType tone functions scale")
+    parser.add_argument("--functions", default=",".join(FUNCTIONS), help="Comma-separated functions to run")
+    parser.add_argument("--inputs", default=",".join(INPUTS), help="Comma-separated input shapes")
+    parser.add_argument("--min_size", type=int, default=DEFAULT_MIN_SIZE, help="Smallest input size in characters")
+    parser.add_argument("--steps", type=int, default=DEFAULT_STEPS, help="Number of input sizes")
+    parser.add_argument("--growth", type=int, default=DEFAULT_GROWTH, help="Factor between input sizes")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Runs per measurement")
+    parser.add_argument("--margin", type=float, default=DEFAULT_MARGIN, help="Allowed excess of the exponent over 1")
+    parser.add_argument("--results_dir", default=DEFAULT_RESULTS_DIR, help="Directory of per-release results")
+    parser.add_argument("--save", action="store_true", help="Save the results for the current release")
+    args = parser.parse_args(argv)
+    
+    functions = [name.strip() for name in args.functions.split(",")]
+    inputs = [name.strip() for name in args.inputs.split(",")]
+    unknown = [name for name in functions if name not in FUNCTIONS] + [name for name in inputs if name not in INPUTS]
+    if unknown:
+        parser.error(f"Unknown functions or inputs: {', '.join(unknown)}")
+    if args.steps < 2:
+        parser.error("At least two sizes are needed to fit an exponent")
+    
+    sizes = [args.min_size * args.growth ** step for step in range(args.steps)]
+    results = run_benchmarks(functions, inputs, sizes, args.repeats, args.margin)
+    
+    if args.save:
+        path = os.path.join(args.results_dir, f"{get_release_version()}.json")
+        print(f"Saved results to {save_results(path, 'tone_scaling', results)}")
+    
+    superlinear = [result for result in results if not result["linear"]]
+    if superlinear:
+        print(f"{len(superlinear)} function/input pair(s) scale worse than linear by more than {args.margin}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""
+Web fetch benchmark module for AutoType.
+This module checks that fetching candidate source pages overlaps network waits and never downloads a page twice.
+
+Usage:
+    python -m benchmarks.bench_web_fetch [--pages 48] [--hosts 2] [--latency_ms 100]
+                                         [--per_host 4] [--min_speedup 4] [--save]
+
+Local stand-in servers play the web: each serves generated HTML pages after a
+fixed latency, with an ETag and a Last-Modified header, answers conditional
+requests for unchanged pages with 304, and fails the first request for one page
+in FLAKY_SHARE with 503. The servers count the requests, bodies and connections
+they serve and the most requests they serve at once.
+
+The candidate URLs list every page twice, once with a fragment, as a check
+finding the same source through several passages would. They are fetched with
+an empty cache, then again with a new fetcher and the cache filled. The run
+reports the time of both fetches and the speedup of the first over fetching one
+page after another; it fails if the speedup is below min_speedup, a page was
+downloaded twice or not at all, a host got more than per_host requests at once,
+or the second fetch downloaded a body instead of revalidating it.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from benchmarks.bench_plagiarism_tfidf import generate_documents
+from benchmarks.common import get_release_version, save_results
+from plagiarism.web import fetch_pages
+
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "web_fetch")
+
+DEFAULT_PAGES = 48
+DEFAULT_HOSTS = 2
+DEFAULT_LATENCY_MS = 100.0
+DEFAULT_PER_HOST = 4
+
+# The cold fetch must be this many times faster than fetching pages one by one
+DEFAULT_MIN_SPEEDUP = 4.0
+
+# One page in this many fails its first request
+FLAKY_SHARE = 8
+
+# Last-Modified of every page
+LAST_MODIFIED = "Mon, 05 Oct 2026 08:00:00 GMT"
+
+
+class StandInServer:
+    """A local HTTP server standing in for a web host, counting what it serves."""
+    
+    def __init__(self, pages: List[str], latency: float):
+        """
+        Args:
+            pages: Text of the pages, served at /page/<number>
+            latency: Seconds each request waits before it is answered
+        """
+        self.pages = pages
+        self.latency = latency
+        self.counts = {"requests": 0, "bodies": 0, "notModified": 0, "errors": 0, "connections": 0, "maxActive": 0}
+        self._active = 0
+        self._failed = set()
+        self._lock = threading.Lock()
+        
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            # Keep connections open, so the client can reuse them
+            protocol_version = "HTTP/1.1"
+            
+            def setup(self):
+                super().setup()
+                server._count("connections")
+            
+            def do_GET(self):
+                server._serve(self)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+    
+    @property
+    def url(self) -> str:
+        """Base URL of the server."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+    
+    def _serve(self, handler: BaseHTTPRequestHandler) -> None:
+        """Answer one request after the latency."""
+        with self._lock:
+            self.counts["requests"] += 1
+            self._active += 1
+            self.counts["maxActive"] = max(self.counts["maxActive"], self._active)
+        try:
+            time.sleep(self.latency)
+            self._respond(handler)
+        finally:
+            with self._lock:
+                self._active -= 1
+    
+    def _respond(self, handler: BaseHTTPRequestHandler) -> None:
+        """Send the page, a 304, a 503 or a 404."""
+        parts = handler.path.strip("/").split("/")
+        number = int(parts[1]) if len(parts) == 2 and parts[0] == "page" and parts[1].isdigit() else -1
+        if not 0 <= number < len(self.pages):
+            self._send(handler, 404, {}, b"")
+            return
+        
+        with self._lock:
+            flaky = number % FLAKY_SHARE == 0 and number not in self._failed
+            self._failed.add(number)
+        if flaky:
+            self._count("errors")
+            self._send(handler, 503, {"Retry-After": "0"}, b"")
+            return
+        
+        etag = f'"page-{number}"'
+        if handler.headers.get("If-None-Match") == etag or handler.headers.get("If-Modified-Since") == LAST_MODIFIED:
+            self._count("notModified")
+            self._send(handler, 304, {"ETag": etag, "Last-Modified": LAST_MODIFIED}, b"")
+            return
+        
+        self._count("bodies")
+        body = (f"<html><head><title>Page {number}</title></head>"
+                f"<body><p>{self.pages[number]}</p></body></html>").encode("utf-8")
+        self._send(handler, 200, {"Content-Type": "text/html; charset=utf-8", "ETag": etag,
+                                  "Last-Modified": LAST_MODIFIED}, body)
+    
+    @staticmethod
+    def _send(handler: BaseHTTPRequestHandler, status: int, headers: Dict[str, str], body: bytes) -> None:
+        handler.send_response(status)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        if status != 304:
+            handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+    
+    def __enter__(self) -> "StandInServer":
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def run(pages: int, hosts: int, latency: float, per_host: int) -> Dict[str, Any]:
+    """
+    Fetch the pages of stand-in servers twice, with an empty and a filled cache.
+    
+    Args:
+        pages: Pages per host
+        hosts: Number of stand-in servers
+        latency: Seconds each request waits before it is answered
+        per_host: Requests in flight to a single host
+    
+    Returns:
+        Result dictionary with the time of both fetches, the speedup and the server counts
+    """
+    texts = generate_documents(pages)
+    servers = [StandInServer(texts, latency) for _ in range(hosts)]
+    for server in servers:
+        server.__enter__()
+    try:
+        urls = [f"{server.url}/page/{number}" for server in servers for number in range(pages)]
+        # Every page is a candidate twice, the second time through a passage anchor
+        candidates = urls + [f"{url}#passage" for url in reversed(urls)]
+        
+        with tempfile.TemporaryDirectory() as directory:
+            cold = fetch_pages(candidates, directory, concurrency=hosts * per_host, per_host=per_host)
+            cold_counts = [dict(server.counts) for server in servers]
+            warm = fetch_pages(candidates, directory, concurrency=hosts * per_host, per_host=per_host)
+    finally:
+        for server in servers:
+            server.__exit__()
+    
+    # Flaky pages take a second request, after the retry backoff
+    serial_seconds = len(urls) * latency + sum(server.counts["errors"] for server in servers) * latency
+    failures = sum(page["error"] is not None or not page["text"] for page in cold["pages"] + warm["pages"])
+    result = {
+        "pages": len(urls),
+        "candidates": len(candidates),
+        "latency_ms": latency * 1000,
+        "per_host": per_host,
+        "cold_ms": cold["seconds"] * 1000,
+        "warm_ms": warm["seconds"] * 1000,
+        "speedup": serial_seconds / cold["seconds"],
+        "cold_bodies": sum(counts["bodies"] for counts in cold_counts),
+        "warm_bodies": sum(server.counts["bodies"] for server in servers) - sum(counts["bodies"] for counts in cold_counts),
+        "not_modified": sum(server.counts["notModified"] for server in servers),
+        "connections": sum(server.counts["connections"] for server in servers),
+        "max_active": max(server.counts["maxActive"] for server in servers),
+        "retries": cold["stats"].get("retries", 0),
+        "failures": failures,
+    }
+    print(f"{len(urls):>5} pages  {len(candidates):>5} candidates  cold {result['cold_ms']:7.1f} ms  "
+          f"warm {result['warm_ms']:7.1f} ms  speedup {result['speedup']:5.1f}x  "
+          f"bodies {result['cold_bodies']} + {result['warm_bodies']}  304s {result['not_modified']}  "
+          f"connections {result['connections']}  max per host {result['max_active']}  "
+          f"retries {result['retries']}  failures {failures}")
+    sys.stdout.flush()
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command-line entry point.
+    
+    Args:
+        argv: Command-line arguments (defaults to sys.argv)
+    
+    Returns:
+        Exit code: 1 if the fetch was too slow, downloaded a page twice or
+        exceeded the per-host limit, else 0
+    """
+    parser = argparse.ArgumentParser(description="Check that web fetches overlap network waits and reuse pages")
+    parser.add_argument("--pages", type=int, default=DEFAULT_PAGES, help="Pages per host")
+    parser.add_argument("--hosts", type=int, default=DEFAULT_HOSTS, help="Number of stand-in servers")
+    parser.add_argument("--latency_ms", type=float, default=DEFAULT_LATENCY_MS, help="Latency of each request")
+    parser.add_argument("--per_host", type=int, default=DEFAULT_PER_HOST, help="Requests in flight to a single host")
+    parser.add_argument("--min_speedup", type=float, default=DEFAULT_MIN_SPEEDUP,
+                        help="The cold fetch must be this many times faster than fetching pages one by one")
+    parser.add_argument("--results_dir", default=DEFAULT_RESULTS_DIR, help="Directory of per-release results")
+    parser.add_argument("--save", action="store_true", help="Save the results for the current release")
+    args = parser.parse_args(argv)
+    
+    result = run(args.pages, args.hosts, args.latency_ms / 1000, args.per_host)
+    
+    if args.save:
+        path = os.path.join(args.results_dir, f"{get_release_version()}.json")
+        print(f"Saved results to {save_results(path, 'web_fetch', [result])}")
+    
+    failed = (result["speedup"] < args.min_speedup or result["cold_bodies"] != result["pages"]
+              or result["warm_bodies"] or result["max_active"] > args.per_host or result["failures"])
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
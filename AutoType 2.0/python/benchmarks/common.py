@@ -0,0 +1,230 @@
+"""
+Shared helpers for AutoType benchmarks.
+This module handles isolated measurements and machine-readable result files.
+"""
+
+import json
+import math
+import multiprocessing
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is reported as 0 there
+    resource = None
+
+
+# package.json of the application, which holds the release version
+PACKAGE_JSON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "package.json")
+
+
+def get_release_version() -> str:
+    """
+    Get the release version of the application.
+    
+    Returns:
+        The version from package.json, or 'unknown'
+    """
+    try:
+        with open(PACKAGE_JSON_PATH, "r", encoding="utf-8") as f:
+            return json.load(f).get("version", "unknown")
+    except (OSError, ValueError):
+        return "unknown"
+
+
+def _peak_rss_kb() -> int:
+    """Peak resident set size of this process in KB."""
+    if resource is None:
+        return 0
+    
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports KB
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _measure(func: Callable, args: Tuple, trace_allocations: bool) -> Dict[str, Any]:
+    """Run func(*args) once and measure it in the current process."""
+    rss_before = _peak_rss_kb()
+    blocks_before = sys.getallocatedblocks()
+    
+    if trace_allocations:
+        tracemalloc.start()
+    
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    
+    measurement = {
+        "seconds": elapsed,
+        "peak_rss_kb": _peak_rss_kb(),
+        "peak_rss_growth_kb": _peak_rss_kb() - rss_before,
+        "net_allocated_blocks": sys.getallocatedblocks() - blocks_before,
+    }
+    
+    if trace_allocations:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        measurement["peak_traced_bytes"] = peak
+    
+    return measurement
+
+
+def _measure_in_child(connection, func: Callable, args: Tuple, trace_allocations: bool) -> None:
+    """Entry point of the measurement process."""
+    try:
+        connection.send(_measure(func, args, trace_allocations))
+    except Exception as e:
+        connection.send({"error": str(e)})
+    finally:
+        connection.close()
+
+
+def measure(func: Callable, args: Tuple, trace_allocations: bool = False,
+            isolate: bool = True) -> Dict[str, Any]:
+    """
+    Measure one call of a function.
+    
+    With isolate=True the call runs in a fresh process, so the peak RSS reflects
+    only this call and not earlier measurements.
+    
+    Args:
+        func: The function to measure (must be picklable when not using fork)
+        args: Positional arguments for the function
+        trace_allocations: Whether to trace Python allocations with tracemalloc (slower)
+        isolate: Whether to run the call in its own process
+    
+    Returns:
+        Dictionary with seconds, peak RSS and allocation figures
+    
+    Raises:
+        RuntimeError: If the measured call failed, or its process died (e.g.
+            killed when out of memory) before reporting; the message then holds
+            the process's exit code
+    """
+    if not isolate:
+        return _measure(func, args, trace_allocations)
+    
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+    parent, child = context.Pipe(duplex=False)
+    process = context.Process(target=_measure_in_child, args=(child, func, args, trace_allocations))
+    process.start()
+    child.close()
+    
+    try:
+        result = parent.recv()
+    except EOFError:
+        # The process died without sending anything
+        process.join()
+        reason = f"killed by signal {-process.exitcode}" if process.exitcode < 0 else f"exit code {process.exitcode}"
+        raise RuntimeError(f"Measurement process died ({reason})")
+    finally:
+        parent.close()
+    process.join()
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    
+    return result
+
+
+def save_results(path: str, suite: str, results: List[Dict[str, Any]]) -> str:
+    """
+    Save benchmark results as JSON.
+    
+    Args:
+        path: Path of the results file
+        suite: Name of the benchmark suite
+        results: One dictionary per measurement
+    
+    Returns:
+        The absolute path to the saved file
+    """
+    document = {
+        "suite": suite,
+        "version": get_release_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    
+    return os.path.abspath(path)
+
+
+def load_results(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Load a results file saved by save_results.
+    
+    Args:
+        path: Path of the results file
+    
+    Returns:
+        The results document, or None if the file does not exist
+    """
+    if not os.path.exists(path):
+        return None
+    
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_results(baseline: List[Dict[str, Any]], current: List[Dict[str, Any]],
+                    key_fields: Tuple[str, ...], metric: str,
+                    tolerance: float) -> List[Dict[str, Any]]:
+    """
+    Find measurements whose metric dropped by more than the tolerance.
+    
+    Args:
+        baseline: Results of the previous release
+        current: Results of the current run
+        key_fields: Fields that identify the same measurement in both lists
+        metric: Field to compare (higher is better)
+        tolerance: Allowed relative drop, e.g. 0.2 for 20%
+    
+    Returns:
+        One dictionary per regression with the key, baseline and current values
+    """
+    previous = {tuple(result[field] for field in key_fields): result[metric] for result in baseline}
+    
+    regressions = []
+    for result in current:
+        key = tuple(result[field] for field in key_fields)
+        if key in previous and result[metric] < previous[key] * (1.0 - tolerance):
+            regressions.append({
+                "key": dict(zip(key_fields, key)),
+                "baseline": previous[key],
+                "current": result[metric],
+            })
+    
+    return regressions
+
+
+def fit_exponent(sizes: List[int], seconds: List[float]) -> float:
+    """
+    Fit time = c * size ** exponent by least squares on a log-log scale.
+    
+    Args:
+        sizes: Input sizes
+        seconds: Time taken for each size
+    
+    Returns:
+        The fitted exponent (1 for linear scaling)
+    """
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(elapsed, 1e-9)) for elapsed in seconds]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    if variance == 0:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
@@ -0,0 +1,102 @@
+"""
+Corpus fixtures module for AutoType benchmarks.
+This module generates deterministic text corpora of a given size.
+"""
+
+import os
+import random
+import tempfile
+from typing import List
+
+
+# Sizes used by the benchmark suites, from 1 KB to 100 MB
+CORPUS_SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000]
+
+# Generated corpora are cached here, keyed by size and seed
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "autotype-benchmark-corpora")
+
+# Vocabulary mixes plain words with words the humanizer and tone modules react to
+COMMON_WORDS = [
+    "the", "a", "of", "to", "and", "in", "that", "it", "for", "on", "with", "as", "this",
+    "was", "by", "from", "at", "an", "be", "have", "results", "data", "team", "report",
+    "system", "process", "project", "people", "time", "work", "study", "example",
+]
+REACTIVE_WORDS = [
+    "use", "utilize", "get", "obtain", "start", "commence", "end", "terminate", "show",
+    "demonstrate", "help", "facilitate", "approximately", "about", "find out", "focus on",
+    "I", "you", "we", "stuff", "thing", "cool", "thus", "therefore", "consequently",
+    "algorithm", "implementation", "interface", "module", "architecture", "asynchronous",
+    "look at", "don't", "can't",
+]
+SENTENCE_ENDINGS = [".", ".", ".", "!", "?"]
+
+
+def generate_text(size: int, seed: int = 0) -> str:
+    """
+    Generate English-like text of roughly the given size.
+    
+    Args:
+        size: Target size in characters
+        seed: Random seed, so the same arguments always give the same text
+    
+    Returns:
+        The generated text, truncated to size characters
+    """
+    rng = random.Random(seed)
+    paragraphs: List[str] = []
+    length = 0
+    
+    while length < size:
+        sentences = []
+        for _ in range(rng.randint(3, 8)):
+            words = [rng.choice(REACTIVE_WORDS) if rng.random() < 0.15 else rng.choice(COMMON_WORDS)
+                     for _ in range(rng.randint(6, 24))]
+            sentence = " ".join(words)
+            sentences.append(sentence[0].upper() + sentence[1:] + rng.choice(SENTENCE_ENDINGS))
+        
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    
+    return "\n\n".join(paragraphs)[:max(size, 1)]
+
+
+def get_corpus(size: int, seed: int = 0, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    """
+    Get a corpus of the given size, generating and caching it on first use.
+    
+    Args:
+        size: Target size in characters
+        seed: Random seed
+        cache_dir: Directory where generated corpora are kept
+    
+    Returns:
+        The corpus text
+    """
+    path = os.path.join(cache_dir, f"corpus-{size}-{seed}.txt")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    
+    text = generate_text(size, seed)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    
+    return text
+
+
+def format_size(size: int) -> str:
+    """
+    Format a corpus size for display.
+    
+    Args:
+        size: Size in characters
+    
+    Returns:
+        Human-readable size such as '10KB'
+    """
+    for unit, factor in (("MB", 1_000_000), ("KB", 1_000)):
+        if size >= factor:
+            return f"{size // factor}{unit}"
+    return f"{size}B"
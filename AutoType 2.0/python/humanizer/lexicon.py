@@ -0,0 +1,253 @@
+"""
+Lexicon module for AutoType's text humanization.
+This module builds and reads the compact on-disk synonym table used for vocabulary adjustment.
+
+The lexicon file is an open-addressing hash table of fixed-size slots followed by
+a blob of UTF-8 strings. It is memory-mapped at runtime, so opening it costs no
+parse time, lookups touch one or two slots, and every process that opens the same
+file shares its pages.
+
+File layout (little-endian):
+    header:  magic (4s), version (I), slot count (I), entry count (I), strings offset (Q)
+    slots:   key hash (Q), flags (H), rank (I),
+             key offset (I), key length (H),
+             simpler offset (I), simpler length (H),
+             harder offset (I), harder length (H)
+    strings: concatenated UTF-8 words
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+MAGIC = b"ATLX"
+VERSION = 1
+
+HEADER = struct.Struct("<4sIIIQ")
+SLOT = struct.Struct("<QHIIHIHIH")
+
+# Slot flag: the word starts a multi-word key (e.g. "find" for "find out")
+FLAG_PHRASE_PREFIX = 1
+
+# Maximum fraction of slots in use; keeps linear probe chains short
+LOAD_FACTOR = 0.7
+
+# Default location of the built lexicon
+DEFAULT_LEXICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "lexicon.bin")
+
+
+class LexiconEntry(NamedTuple):
+    """A lexicon record: simpler and harder alternatives and the word's frequency rank."""
+    simpler: str
+    harder: str
+    rank: int
+    flags: int
+
+
+def word_hash(word: str) -> int:
+    """
+    Hash a word with a hash that is stable across processes and platforms.
+    
+    Args:
+        word: The lowercased word
+    
+    Returns:
+        64-bit hash of the word
+    """
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def encode_lexicon(entries: Iterable[Tuple[str, str, str, int]]) -> bytes:
+    """
+    Encode lexicon entries into the on-disk format.
+    
+    Args:
+        entries: Tuples of (word, simpler, harder, rank); simpler or harder may be empty
+    
+    Returns:
+        The encoded lexicon
+    """
+    # Merge duplicate words, keeping the first non-empty alternative of each kind
+    table: Dict[str, List] = {}
+    for word, simpler, harder, rank in entries:
+        word = word.strip().lower()
+        if not word:
+            continue
+        record = table.setdefault(word, ["", "", rank, 0])
+        record[0] = record[0] or simpler
+        record[1] = record[1] or harder
+        record[2] = min(record[2], rank)
+    
+    # Multi-word keys need their first word flagged so lookups know to try the phrase
+    for word in [word for word in table if " " in word]:
+        prefix = word.split(" ", 1)[0]
+        record = table.setdefault(prefix, ["", "", sys.maxsize, 0])
+        record[3] |= FLAG_PHRASE_PREFIX
+    
+    slot_count = 1
+    while slot_count * LOAD_FACTOR < max(len(table), 1):
+        slot_count *= 2
+    
+    strings = bytearray()
+    string_offsets: Dict[str, Tuple[int, int]] = {}
+    
+    def add_string(value: str) -> Tuple[int, int]:
+        if value not in string_offsets:
+            data = value.encode("utf-8")
+            string_offsets[value] = (len(strings), len(data))
+            strings.extend(data)
+        return string_offsets[value]
+    
+    slots = bytearray(SLOT.size * slot_count)
+    mask = slot_count - 1
+    for word, (simpler, harder, rank, flags) in table.items():
+        key_hash = word_hash(word)
+        index = key_hash & mask
+        while SLOT.unpack_from(slots, index * SLOT.size)[4]:
+            index = (index + 1) & mask
+        
+        key_ref = add_string(word)
+        simpler_ref = add_string(simpler)
+        harder_ref = add_string(harder)
+        SLOT.pack_into(slots, index * SLOT.size, key_hash, flags, min(rank, 0xFFFFFFFF),
+                       *key_ref, *simpler_ref, *harder_ref)
+    
+    strings_offset = HEADER.size + len(slots)
+    header = HEADER.pack(MAGIC, VERSION, slot_count, len(table), strings_offset)
+    return header + bytes(slots) + bytes(strings)
+
+
+def build_lexicon(entries: Iterable[Tuple[str, str, str, int]], output_path: str) -> str:
+    """
+    Build a lexicon file from entries.
+    
+    Args:
+        entries: Tuples of (word, simpler, harder, rank)
+        output_path: Path to write the lexicon to
+    
+    Returns:
+        The absolute path to the written lexicon
+    """
+    data = encode_lexicon(entries)
+    
+    # Write to a temporary file first so processes mapping the old file are unaffected
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    temp_path = output_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, output_path)
+    
+    return os.path.abspath(output_path)
+
+
+def read_tsv_entries(path: str) -> Iterable[Tuple[str, str, str, int]]:
+    """
+    Read lexicon source entries from a tab-separated file.
+    
+    Each line is "word<TAB>simpler<TAB>harder<TAB>rank"; lines starting with '#' are skipped.
+    
+    Args:
+        path: Path to the TSV file
+    
+    Yields:
+        Tuples of (word, simpler, harder, rank)
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            fields = line.rstrip("\n").split("\t")
+            fields += [""] * (4 - len(fields))
+            word, simpler, harder, rank = fields[:4]
+            yield word, simpler, harder, int(rank) if rank else sys.maxsize
+
+
+class Lexicon:
+    """Read-only view of an encoded lexicon, backed by a memory map or a bytes buffer."""
+    
+    def __init__(self, buffer, source: Optional[str] = None):
+        """
+        Args:
+            buffer: The encoded lexicon (mmap, bytes or memoryview)
+            source: Path the lexicon was loaded from, if any
+        
+        Raises:
+            ValueError: If the buffer is not a lexicon of a supported version
+        """
+        magic, version, slot_count, entry_count, strings_offset = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a version {VERSION} lexicon: {source or 'buffer'}")
+        
+        self._buffer = buffer
+        self._mask = slot_count - 1
+        self._strings_offset = strings_offset
+        self.entry_count = entry_count
+        self.source = source
+    
+    def __len__(self) -> int:
+        return self.entry_count
+    
+    def lookup(self, word: str) -> Optional[LexiconEntry]:
+        """
+        Look up a word or phrase.
+        
+        Args:
+            word: The lowercased word or phrase
+        
+        Returns:
+            The entry, or None if the word is not in the lexicon
+        """
+        key = word.encode("utf-8")
+        key_hash = word_hash(word)
+        index = key_hash & self._mask
+        buffer = self._buffer
+        base = self._strings_offset
+        
+        while True:
+            (slot_hash, flags, rank, key_offset, key_length,
+             simpler_offset, simpler_length, harder_offset, harder_length) = SLOT.unpack_from(
+                buffer, HEADER.size + index * SLOT.size)
+            
+            # An empty slot ends the probe chain
+            if not key_length:
+                return None
+            
+            if slot_hash == key_hash and buffer[base + key_offset:base + key_offset + key_length] == key:
+                return LexiconEntry(
+                    bytes(buffer[base + simpler_offset:base + simpler_offset + simpler_length]).decode("utf-8"),
+                    bytes(buffer[base + harder_offset:base + harder_offset + harder_length]).decode("utf-8"),
+                    rank,
+                    flags,
+                )
+            
+            index = (index + 1) & self._mask
+
+
+def open_lexicon(path: str) -> Lexicon:
+    """
+    Memory-map a lexicon file.
+    
+    Args:
+        path: Path to the lexicon file
+    
+    Returns:
+        The mapped lexicon
+    """
+    with open(path, "rb") as f:
+        # The map stays valid after the file object is closed
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return Lexicon(mapped, source=os.path.abspath(path))
+
+
+if __name__ == "__main__":
+    # Usage: python -m humanizer.lexicon <source.tsv> [<output.bin>]
+    if len(sys.argv) < 2:
+        print("Usage: python -m humanizer.lexicon <source.tsv> [<output.bin>]")
+        sys.exit(1)
+    
+    output = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_LEXICON_PATH
+    print(build_lexicon(read_tsv_entries(sys.argv[1]), output))
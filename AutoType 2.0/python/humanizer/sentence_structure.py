@@ -5,10 +5,24 @@ This module handles restructuring sentences to appear more human-like.
 
 import random
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Tuple, Optional
 
+from nlp.model_service import parse_if_available
+from .spans import EditSpan, record_edit
 
-def restructure_sentences(text: str, complexity: int = 3, vary_beginnings: bool = True) -> str:
+
+# Whitespace that follows sentence-ending punctuation
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+TRANSITION_WORDS = [
+    "However,", "Moreover,", "Furthermore,", "Additionally,", "Consequently,",
+    "In contrast,", "Similarly,", "Nevertheless,", "Therefore,", "Indeed,",
+    "On the other hand,", "For instance,", "In fact,", "In summary,", "As a result,"
+]
+
+
+def restructure_sentences(text: str, complexity: int = 3, vary_beginnings: bool = True,
+                          use_nlp: bool = False, changes: Optional[List[EditSpan]] = None) -> str:
     """
     Restructure sentences to appear more human-like.
     
@@ -16,6 +30,8 @@ def restructure_sentences(text: str, complexity: int = 3, vary_beginnings: bool
         text: The text to restructure
         complexity: Complexity level from 1 (simple) to 5 (complex)
         vary_beginnings: Whether to vary sentence beginnings
+        use_nlp: Whether to parse sentences with the shared spaCy pipeline
+        changes: Optional list that receives an edit span for every change made
     
     Returns:
         The restructured text
@@ -23,16 +39,19 @@ def restructure_sentences(text: str, complexity: int = 3, vary_beginnings: bool
     # Split the text into sentences
     sentences = split_into_sentences(text)
     
+    # Parse all sentences in one batched call, if NLP is requested and available
+    docs = parse_if_available(sentences, "humanizer") if use_nlp else [None] * len(sentences)
+    
     # Process each sentence
     restructured_sentences = []
-    for sentence in sentences:
+    for sentence, doc in zip(sentences, docs):
         # Skip empty sentences
         if not sentence.strip():
             restructured_sentences.append(sentence)
             continue
         
         # Restructure the sentence
-        restructured = process_sentence(sentence, complexity)
+        restructured = process_sentence(sentence, complexity, doc)
         
         # Add to the list
         restructured_sentences.append(restructured)
@@ -44,6 +63,19 @@ def restructure_sentences(text: str, complexity: int = 3, vary_beginnings: bool
     # Join the sentences back together
     result = ' '.join(restructured_sentences)
     
+    # Record the changed part of each sentence and each separator replaced by the join
+    if changes is not None:
+        source_offset = target_offset = 0
+        for (sentence, separator), restructured in zip(iter_sentences(text), restructured_sentences):
+            record_edit(changes, sentence, restructured, source_offset, target_offset)
+            source_offset += len(sentence)
+            target_offset += len(restructured)
+            
+            if separator:
+                record_edit(changes, separator, ' ', source_offset, target_offset)
+                source_offset += len(separator)
+                target_offset += 1
+    
     return result
 
 
@@ -59,19 +91,41 @@ def split_into_sentences(text: str) -> List[str]:
     """
     # Simple sentence splitter using regex
     # This would be more sophisticated in a real implementation
-    sentence_pattern = r'(?<=[.!?])\s+'
-    sentences = re.split(sentence_pattern, text)
+    sentences = SENTENCE_BOUNDARY.split(text)
     
     return sentences
 
 
-def process_sentence(sentence: str, complexity: int) -> str:
+def iter_sentences(text: str) -> Iterator[Tuple[str, str]]:
+    """
+    Lazily split text into sentences.
+    
+    Unlike split_into_sentences, no list is built, so the first sentence is
+    available immediately regardless of the length of the text.
+    
+    Args:
+        text: The text to split
+    
+    Yields:
+        Tuples of (sentence, separator), where separator is the whitespace that
+        followed the sentence in the original text ('' for the last sentence)
+    """
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        yield text[start:match.start()], match.group()
+        start = match.end()
+    
+    yield text[start:], ''
+
+
+def process_sentence(sentence: str, complexity: int, doc: Optional[Any] = None) -> str:
     """
     Process a single sentence to adjust its complexity.
     
     Args:
         sentence: The sentence to process
         complexity: Complexity level from 1 (simple) to 5 (complex)
+        doc: Optional spaCy Doc of the sentence from the shared model service
     
     Returns:
         The processed sentence
@@ -81,6 +135,8 @@ def process_sentence(sentence: str, complexity: int) -> str:
     
     if complexity == 1:
         # Simplify the sentence for lowest complexity
+        if doc is not None:
+            return split_compound_sentence(doc)
         return simplify_sentence(sentence)
     elif complexity == 2:
         # Slightly more complex but still straightforward
@@ -111,6 +167,43 @@ def simplify_sentence(sentence: str) -> str:
     return sentence
 
 
+def split_compound_sentence(doc: Any) -> str:
+    """
+    Split a compound sentence into two sentences using its dependency parse.
+    
+    A sentence is split at a coordinating conjunction that joins two clauses
+    with their own subjects, e.g. "We tested it, and it worked." becomes
+    "We tested it. It worked."
+    
+    Args:
+        doc: Parsed spaCy Doc of the sentence
+    
+    Returns:
+        The sentence, split in two where possible
+    """
+    for token in doc:
+        # Look for "cc" attached to the root, followed by a conjoined clause
+        if token.dep_ != "cc" or token.head.dep_ != "ROOT":
+            continue
+        
+        clause = next((child for child in token.head.children
+                       if child.dep_ == "conj" and child.i > token.i), None)
+        if clause is None or not any(child.dep_ in ("nsubj", "nsubjpass") for child in clause.children):
+            continue
+        
+        first = doc[:token.i].text.rstrip(" ,;")
+        second = doc[token.i + 1:].text.lstrip()
+        if not first or not second:
+            continue
+        
+        # Carry the original end punctuation over to the first part
+        end = doc.text.rstrip()[-1:]
+        end = end if end in ".!?" else "."
+        return f"{first}{end} {second[0].upper()}{second[1:]}"
+    
+    return doc.text
+
+
 def add_complexity(sentence: str, moderate: bool = True) -> str:
     """
     Add complexity to a sentence.
@@ -149,34 +242,37 @@ def vary_sentence_beginnings(sentences: List[str]) -> List[str]:
     Returns:
         List of sentences with varied beginnings
     """
+    return [vary_sentence_beginning(sentence, i) for i, sentence in enumerate(sentences)]
+
+
+def vary_sentence_beginning(sentence: str, index: int) -> str:
+    """
+    Possibly prepend a transition word to a single sentence.
+    
+    Args:
+        sentence: The sentence to process
+        index: Position of the sentence in the text
+    
+    Returns:
+        The sentence, with a transition word added to some of them
+    """
     # This is a placeholder that would contain actual sentence beginning variation logic
     # For now, just add some transition words to a few sentences
     
-    transition_words = [
-        "However,", "Moreover,", "Furthermore,", "Additionally,", "Consequently,",
-        "In contrast,", "Similarly,", "Nevertheless,", "Therefore,", "Indeed,",
-        "On the other hand,", "For instance,", "In fact,", "In summary,", "As a result,"
-    ]
-    
-    result = []
-    for i, sentence in enumerate(sentences):
-        # Don't modify the first sentence
-        if i == 0:
-            result.append(sentence)
-            continue
+    # Don't modify the first sentence
+    if index == 0:
+        return sentence
+    
+    # Only modify some sentences
+    if random.random() < 0.3:
+        # Choose a random transition word
+        transition = random.choice(TRANSITION_WORDS)
         
-        # Only modify some sentences
-        if random.random() < 0.3:
-            # Choose a random transition word
-            transition = random.choice(transition_words)
-            
-            # Add it to the beginning of the sentence
-            # Make sure to lowercase the first letter of the original sentence
-            if sentence and sentence[0].isupper():
-                sentence = sentence[0].lower() + sentence[1:]
-            
-            sentence = transition + " " + sentence
+        # Add it to the beginning of the sentence
+        # Make sure to lowercase the first letter of the original sentence
+        if sentence and sentence[0].isupper():
+            sentence = sentence[0].lower() + sentence[1:]
         
-        result.append(sentence)
+        sentence = transition + " " + sentence
     
-    return result 
\ No newline at end of file
+    return sentence
@@ -0,0 +1,114 @@
+"""
+Edit span module for AutoType's text humanization.
+This module records where the humanizer changed the text, so the UI can highlight edits without diffing.
+
+An edit span is a tuple (source_start, source_end, target_start, target_end): the
+characters source_start:source_end of the input were replaced by the characters
+target_start:target_end of the output. Span lists are sorted and non-overlapping.
+"""
+
+from typing import List, Optional, Tuple
+
+
+EditSpan = Tuple[int, int, int, int]
+
+
+def record_edit(changes: Optional[List[EditSpan]], source: str, target: str,
+                source_offset: int, target_offset: int) -> None:
+    """
+    Record the edit that turned one piece of text into another.
+    
+    The common prefix and suffix are trimmed so only the changed part is recorded.
+    This is linear in the length of the piece, unlike a full diff.
+    
+    Args:
+        changes: List to append the span to (nothing is recorded if None)
+        source: The original piece of text
+        target: The replacement piece of text
+        source_offset: Offset of the piece in the source text
+        target_offset: Offset of the piece in the target text
+    """
+    if changes is None or source == target:
+        return
+    
+    limit = min(len(source), len(target))
+    prefix = 0
+    while prefix < limit and source[prefix] == target[prefix]:
+        prefix += 1
+    
+    suffix = 0
+    while suffix < limit - prefix and source[-1 - suffix] == target[-1 - suffix]:
+        suffix += 1
+    
+    changes.append((source_offset + prefix, source_offset + len(source) - suffix,
+                    target_offset + prefix, target_offset + len(target) - suffix))
+
+
+def shift_spans(spans: List[EditSpan], source_offset: int, target_offset: int) -> List[EditSpan]:
+    """
+    Move spans by fixed source and target offsets.
+    
+    Args:
+        spans: The spans to move
+        source_offset: Amount to add to source positions
+        target_offset: Amount to add to target positions
+    
+    Returns:
+        The moved spans
+    """
+    return [(s0 + source_offset, s1 + source_offset, t0 + target_offset, t1 + target_offset)
+            for s0, s1, t0, t1 in spans]
+
+
+def compose_spans(first: List[EditSpan], second: List[EditSpan]) -> List[EditSpan]:
+    """
+    Combine the spans of two consecutive edits of a text.
+    
+    If first describes A -> B and second describes B -> C, the result describes
+    A -> C. Overlapping or touching edits are merged. Runs in linear time.
+    
+    Args:
+        first: Spans from A to B
+        second: Spans from B to C
+    
+    Returns:
+        Spans from A to C
+    """
+    # Ranges in B touched by either edit, in order
+    ranges = []
+    i = j = 0
+    while i < len(first) or j < len(second):
+        if j >= len(second) or (i < len(first) and first[i][2] <= second[j][0]):
+            ranges.append((first[i][2], first[i][3]))
+            i += 1
+        else:
+            ranges.append((second[j][0], second[j][1]))
+            j += 1
+    
+    # Merge overlapping or touching ranges into clusters
+    clusters = []
+    for start, end in ranges:
+        if clusters and start <= clusters[-1][1]:
+            clusters[-1][1] = max(clusters[-1][1], end)
+        else:
+            clusters.append([start, end])
+    
+    # Map each cluster back to A and forward to C. Every edit lies in exactly one
+    # cluster, so the length change of the edits consumed so far gives the offset
+    result = []
+    i = j = 0
+    first_shift = second_shift = 0
+    for start, end in clusters:
+        source_start = start - first_shift
+        target_start = start + second_shift
+        
+        while i < len(first) and first[i][2] <= end:
+            first_shift += (first[i][3] - first[i][2]) - (first[i][1] - first[i][0])
+            i += 1
+        while j < len(second) and second[j][0] <= end:
+            second_shift += (second[j][3] - second[j][2]) - (second[j][1] - second[j][0])
+            j += 1
+        
+        result.append((source_start, end - first_shift, target_start, end + second_shift))
+    
+    return result
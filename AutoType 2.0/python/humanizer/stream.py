@@ -0,0 +1,126 @@
+"""
+Streaming module for AutoType's text humanization.
+This module runs the humanization pipeline incrementally so output can be shown as soon as it is ready.
+"""
+
+import itertools
+from typing import Iterator, List, Optional, Tuple
+
+from nlp.model_service import get_model_service
+from .sentence_structure import iter_sentences, process_sentence, vary_sentence_beginning
+from .spans import EditSpan, compose_spans, record_edit, shift_spans
+from .vocabulary import adjust_vocabulary
+
+
+# Default number of characters to collect before a batch is yielded
+DEFAULT_BATCH_SIZE = 2000
+
+
+def humanize_stream(text: str, complexity: int = 3, vocabulary_level: int = 3,
+                    add_fillers: bool = False, vary_beginnings: bool = True,
+                    batch_size: int = DEFAULT_BATCH_SIZE, use_nlp: bool = False) -> Iterator[str]:
+    """
+    Humanize text incrementally, yielding output batches as soon as they are ready.
+    
+    Sentences are processed one at a time and collected into batches of roughly
+    batch_size characters. A batch is also closed at every paragraph break, so the
+    UI receives whole paragraphs. Concatenating the yielded batches gives the full
+    humanized text; the whitespace between sentences is kept as in the original.
+    
+    Args:
+        text: The text to humanize
+        complexity: Sentence complexity level from 1 (simple) to 5 (complex)
+        vocabulary_level: Vocabulary level from 1 (simple) to 5 (complex)
+        add_fillers: Whether to add filler words
+        vary_beginnings: Whether to vary sentence beginnings
+        batch_size: Approximate number of characters per batch (1 yields every sentence)
+        use_nlp: Whether to parse sentences with the shared spaCy pipeline
+    
+    Yields:
+        Consecutive chunks of humanized text
+    """
+    for chunk, _ in _humanize_batches(text, complexity, vocabulary_level, add_fillers,
+                                      vary_beginnings, batch_size, use_nlp, track_changes=False):
+        yield chunk
+
+
+def humanize_stream_with_changes(text: str, complexity: int = 3, vocabulary_level: int = 3,
+                                 add_fillers: bool = False, vary_beginnings: bool = True,
+                                 batch_size: int = DEFAULT_BATCH_SIZE,
+                                 use_nlp: bool = False) -> Iterator[Tuple[str, List[EditSpan]]]:
+    """
+    Humanize text incrementally, yielding each batch with the edits made in it.
+    
+    Takes the same arguments as humanize_stream.
+    
+    Yields:
+        Tuples of (chunk, spans), where spans are edit spans in absolute offsets of
+        the input text and of the concatenated output
+    """
+    yield from _humanize_batches(text, complexity, vocabulary_level, add_fillers,
+                                 vary_beginnings, batch_size, use_nlp, track_changes=True)
+
+
+def _humanize_batches(text: str, complexity: int, vocabulary_level: int, add_fillers: bool,
+                      vary_beginnings: bool, batch_size: int, use_nlp: bool,
+                      track_changes: bool) -> Iterator[Tuple[str, Optional[List[EditSpan]]]]:
+    """Run the humanization pipeline batch by batch, optionally recording edit spans."""
+    sentences = iter_sentences(text)
+    
+    # Parse sentences lazily in nlp.pipe batches; tee only buffers one batch
+    service = get_model_service()
+    if use_nlp and service.is_available():
+        sentences, to_parse = itertools.tee(sentences)
+        docs = service.parse((sentence for sentence, _ in to_parse), "humanizer")
+    else:
+        docs = itertools.repeat(None)
+    
+    batch = []
+    batch_length = 0
+    batch_source_length = 0
+    sentence_changes = [] if track_changes else None
+    
+    # Offsets of the current batch in the input and the output
+    source_offset = target_offset = 0
+    
+    def finish_batch() -> Tuple[str, Optional[List[EditSpan]]]:
+        vocabulary_changes = [] if track_changes else None
+        chunk = adjust_vocabulary(''.join(batch), vocabulary_level, add_fillers, vocabulary_changes)
+        if not track_changes:
+            return chunk, None
+        
+        spans = compose_spans(sentence_changes, vocabulary_changes)
+        return chunk, shift_spans(spans, source_offset, target_offset)
+    
+    for index, ((sentence, separator), doc) in enumerate(zip(sentences, docs)):
+        original = sentence
+        
+        # Restructure the sentence, skipping empty ones
+        if sentence.strip():
+            sentence = process_sentence(sentence, complexity, doc)
+        
+        if vary_beginnings:
+            sentence = vary_sentence_beginning(sentence, index)
+        
+        # Separators are kept as they are, so only the sentence itself can change
+        record_edit(sentence_changes, original, sentence, batch_source_length, batch_length)
+        
+        batch.append(sentence)
+        batch.append(separator)
+        batch_length += len(sentence) + len(separator)
+        batch_source_length += len(original) + len(separator)
+        
+        # Flush on paragraph breaks or once the batch is large enough
+        if batch_length >= batch_size or '\n' in separator:
+            chunk, spans = finish_batch()
+            yield chunk, spans
+            
+            source_offset += batch_source_length
+            target_offset += len(chunk)
+            batch = []
+            batch_length = 0
+            batch_source_length = 0
+            sentence_changes = [] if track_changes else None
+    
+    if batch_length:
+        yield finish_batch()
@@ -3,12 +3,100 @@ Vocabulary module for AutoType's text humanization.
 This module handles adjusting vocabulary complexity and adding filler words.
 """
 
+import os
 import random
 import re
-from typing import List, Dict, Tuple, Optional
+import sys
+from typing import Callable, List, Dict, Tuple, Optional
 
+from .lexicon import (DEFAULT_LEXICON_PATH, FLAG_PHRASE_PREFIX, Lexicon, LexiconEntry,
+                      encode_lexicon, open_lexicon)
+from .spans import EditSpan, compose_spans
 
-def adjust_vocabulary(text: str, level: int = 3, add_fillers: bool = False) -> str:
+
+# Words and hyphenated or apostrophized compounds
+WORD_PATTERN = re.compile(r"[A-Za-z]+(?:['-][A-Za-z]+)*")
+
+# Whitespace-separated words, where fillers can be inserted
+FILLER_WORD_PATTERN = re.compile(r'\S+')
+
+# Frequency ranks: degree 1 simplification only replaces words at or above
+# SIMPLIFY_RANK_THRESHOLD, degree 1 enhancement only those at or below ENHANCE_RANK_THRESHOLD
+SIMPLIFY_RANK_THRESHOLD = 10000
+ENHANCE_RANK_THRESHOLD = 1000
+
+# Ranks assigned to the built-in replacement tables
+VERY_COMMON_WORD_RANK = 500
+COMMON_WORD_RANK = 3000
+UNCOMMON_WORD_RANK = 6000
+RARE_WORD_RANK = 15000
+
+SIMPLIFICATION_REPLACEMENTS = {
+    'utilize': 'use',
+    'implement': 'use',
+    'obtain': 'get',
+    'acquire': 'get',
+    'sufficient': 'enough',
+    'commence': 'start',
+    'terminate': 'end',
+    'additional': 'more',
+    'subsequently': 'later',
+    'nevertheless': 'still',
+    'facilitate': 'help',
+    'demonstrate': 'show',
+    'ascertain': 'find out',
+    'constitutes': 'is',
+    'endeavor': 'try',
+}
+
+ADDITIONAL_SIMPLIFICATION_REPLACEMENTS = {
+    'approximately': 'about',
+    'excessive': 'too much',
+    'inquire': 'ask',
+    'perceive': 'see',
+    'comprehend': 'understand',
+    'encountered': 'met',
+    'prioritize': 'focus on',
+    'conclusion': 'end',
+    'initiate': 'start',
+    'illustrate': 'show',
+}
+
+ENHANCEMENT_REPLACEMENTS = {
+    'use': 'utilize',
+    'get': 'acquire',
+    'enough': 'sufficient',
+    'start': 'commence',
+    'end': 'terminate',
+    'more': 'additional',
+    'later': 'subsequently',
+    'still': 'nevertheless',
+    'help': 'facilitate',
+    'show': 'demonstrate',
+    'find out': 'ascertain',
+    'is': 'constitutes',
+    'try': 'endeavor',
+}
+
+ADDITIONAL_ENHANCEMENT_REPLACEMENTS = {
+    'about': 'approximately',
+    'too much': 'excessive',
+    'ask': 'inquire',
+    'see': 'perceive',
+    'understand': 'comprehend',
+    'met': 'encountered',
+    'focus on': 'prioritize',
+    'end': 'conclusion',
+    'start': 'initiate',
+    'show': 'illustrate',
+}
+
+# Lexicon shared by all calls, see get_lexicon
+_lexicon: Optional[Lexicon] = None
+
+
+def adjust_vocabulary(text: str, level: int = 3, add_fillers: bool = False,
+                      changes: Optional[List[EditSpan]] = None) -> str:
     """
     Adjust the vocabulary complexity of the text.
     
@@ -16,81 +104,133 @@ def adjust_vocabulary(text: str, level: int = 3, add_fillers: bool = False) -> s
         text: The text to adjust
         level: Complexity level from 1 (simple) to 5 (complex)
         add_fillers: Whether to add filler words
+        changes: Optional list that receives an edit span for every change made
     
     Returns:
         The adjusted text
     """
+    vocabulary_changes = [] if changes is not None else None
+    
     # Process the text
     if level < 3:
-        text = simplify_vocabulary(text, 3 - level)
+        text = simplify_vocabulary(text, 3 - level, vocabulary_changes)
     elif level > 3:
-        text = enhance_vocabulary(text, level - 3)
+        text = enhance_vocabulary(text, level - 3, vocabulary_changes)
     
     # Add filler words if requested
     if add_fillers:
-        text = add_filler_words(text)
+        filler_changes = [] if changes is not None else None
+        text = add_filler_words(text, filler_changes)
+        
+        # Filler offsets refer to the adjusted text; map them back to the input
+        if changes is not None:
+            vocabulary_changes = compose_spans(vocabulary_changes, filler_changes)
+    
+    if changes is not None:
+        changes.extend(vocabulary_changes)
     
     return text
 
 
-def simplify_vocabulary(text: str, degree: int = 1) -> str:
+def simplify_vocabulary(text: str, degree: int = 1, changes: Optional[List[EditSpan]] = None) -> str:
     """
     Simplify the vocabulary in the text.
     
     Args:
         text: The text to simplify
         degree: Degree of simplification (1 or 2)
+        changes: Optional list that receives an edit span for every replacement
     
     Returns:
         The simplified text
     """
-    # This is a placeholder that would contain actual vocabulary simplification logic
-    # For now, just do some basic replacements
-    
-    # Define word replacements based on simplification degree
-    replacements = get_simplification_replacements(degree)
+    # Degree 1 only replaces rare words, degree 2 every word with a simpler alternative
+    max_common_rank = SIMPLIFY_RANK_THRESHOLD if degree <= 1 else 0
     
-    # Apply replacements
-    for complex_word, simple_word in replacements.items():
-        # Use word boundary regex to only replace whole words
-        pattern = r'\b' + re.escape(complex_word) + r'\b'
-        text = re.sub(pattern, simple_word, text, flags=re.IGNORECASE)
-    
-    return text
+    return replace_words(text, lambda entry: entry.simpler if entry.rank >= max_common_rank else "", changes)
 
 
-def enhance_vocabulary(text: str, degree: int = 1) -> str:
+def enhance_vocabulary(text: str, degree: int = 1, changes: Optional[List[EditSpan]] = None) -> str:
     """
     Enhance the vocabulary in the text to be more complex.
     
     Args:
         text: The text to enhance
         degree: Degree of enhancement (1 or 2)
+        changes: Optional list that receives an edit span for every replacement
     
     Returns:
         The enhanced text
     """
-    # This is a placeholder that would contain actual vocabulary enhancement logic
-    # For now, just do some basic replacements
+    # Degree 1 only replaces very common words, degree 2 every word with a harder alternative
+    max_rank = ENHANCE_RANK_THRESHOLD if degree <= 1 else sys.maxsize
     
-    # Define word replacements based on enhancement degree
-    replacements = get_enhancement_replacements(degree)
+    return replace_words(text, lambda entry: entry.harder if entry.rank <= max_rank else "", changes)
+
+
+def replace_words(text: str, choose: Callable[[LexiconEntry], str],
+                  changes: Optional[List[EditSpan]] = None) -> str:
+    """
+    Replace words and two-word phrases using the lexicon, in a single pass.
     
-    # Apply replacements
-    for simple_word, complex_word in replacements.items():
-        # Use word boundary regex to only replace whole words
-        pattern = r'\b' + re.escape(simple_word) + r'\b'
-        text = re.sub(pattern, complex_word, text, flags=re.IGNORECASE)
+    Args:
+        text: The text to process
+        choose: Function returning the replacement for a lexicon entry ('' to keep the word)
+        changes: Optional list that receives an edit span for every replacement
     
-    return text
+    Returns:
+        The text with replacements applied
+    """
+    lexicon = get_lexicon()
+    pieces = []
+    position = 0
+    output_length = 0
+    words = WORD_PATTERN.finditer(text)
+    
+    for match in words:
+        word = match.group().lower()
+        entry = lexicon.lookup(word)
+        if entry is None:
+            continue
+        end = match.end()
+        
+        # Prefer a two-word phrase such as "find out" over its first word
+        if entry.flags & FLAG_PHRASE_PREFIX:
+            following = WORD_PATTERN.match(text, end + 1) if text[end:end + 1] == " " else None
+            phrase_entry = lexicon.lookup(word + " " + following.group().lower()) if following else None
+            if phrase_entry is not None and choose(phrase_entry):
+                entry = phrase_entry
+                end = following.end()
+                # Skip the second word of the phrase
+                next(words, None)
+        
+        replacement = choose(entry)
+        if not replacement:
+            continue
+        
+        # Keep the capitalization of the first letter
+        if match.group()[0].isupper():
+            replacement = replacement[0].upper() + replacement[1:]
+        
+        pieces.append(text[position:match.start()])
+        pieces.append(replacement)
+        output_length += match.start() - position
+        if changes is not None:
+            changes.append((match.start(), end, output_length, output_length + len(replacement)))
+        output_length += len(replacement)
+        position = end
+    
+    pieces.append(text[position:])
+    return ''.join(pieces)
 
 
-def add_filler_words(text: str) -> str:
+def add_filler_words(text: str, changes: Optional[List[EditSpan]] = None) -> str:
     """
     Add filler words to the text to make it more human-like.
     
     Args:
         text: The text to modify
+        changes: Optional list that receives an edit span for every inserted filler
     
     Returns:
         The text with filler words added
@@ -98,29 +238,44 @@ def add_filler_words(text: str) -> str:
     # This is a placeholder that would contain actual filler word logic
     # For now, just add some basic fillers
     
-    # Split the text into sentences
-    sentences = text.split('. ')
+    pieces = []
+    position = 0
+    output_length = 0
+    sentence_start = 0
     
-    # Process each sentence
-    for i in range(len(sentences)):
+    # Process each sentence (sentences are separated by '. ')
+    while sentence_start <= len(text):
+        sentence_end = text.find('. ', sentence_start)
+        if sentence_end == -1:
+            sentence_end = len(text)
+        
         # Only add fillers to some sentences
         if random.random() < 0.3:
             # Choose a filler to add
             filler = random.choice(get_filler_words())
             
             # Add it at the beginning or middle of the sentence
-            words = sentences[i].split()
+            words = list(FILLER_WORD_PATTERN.finditer(text, sentence_start, sentence_end))
             if len(words) > 3 and random.random() < 0.5:
-                # Add in the middle
-                insert_pos = random.randint(1, len(words) - 1)
-                words.insert(insert_pos, filler)
-                sentences[i] = ' '.join(words)
+                # Add in the middle, before a randomly chosen word
+                insert_at = words[random.randint(1, len(words) - 1)].start()
             else:
                 # Add at the beginning
-                sentences[i] = filler + ' ' + sentences[i]
+                insert_at = sentence_start
+            
+            insertion = filler + ' '
+            pieces.append(text[position:insert_at])
+            pieces.append(insertion)
+            output_length += insert_at - position
+            if changes is not None:
+                changes.append((insert_at, insert_at, output_length, output_length + len(insertion)))
+            output_length += len(insertion)
+            position = insert_at
+        
+        sentence_start = sentence_end + 2
     
-    # Join the sentences back together
-    return '. '.join(sentences)
+    pieces.append(text[position:])
+    return ''.join(pieces)
 
 
 def get_simplification_replacements(degree: int) -> Dict[str, str]:
@@ -133,40 +288,11 @@ def get_simplification_replacements(degree: int) -> Dict[str, str]:
     Returns:
         Dictionary of complex words to simple words
     """
-    # Basic replacements
-    replacements = {
-        'utilize': 'use',
-        'implement': 'use',
-        'obtain': 'get',
-        'acquire': 'get',
-        'sufficient': 'enough',
-        'commence': 'start',
-        'terminate': 'end',
-        'additional': 'more',
-        'subsequently': 'later',
-        'nevertheless': 'still',
-        'facilitate': 'help',
-        'demonstrate': 'show',
-        'ascertain': 'find out',
-        'constitutes': 'is',
-        'endeavor': 'try',
-    }
+    replacements = dict(SIMPLIFICATION_REPLACEMENTS)
     
     # Add more aggressive replacements for higher degree
     if degree > 1:
-        additional = {
-            'approximately': 'about',
-            'excessive': 'too much',
-            'inquire': 'ask',
-            'perceive': 'see',
-            'comprehend': 'understand',
-            'encountered': 'met',
-            'prioritize': 'focus on',
-            'conclusion': 'end',
-            'initiate': 'start',
-            'illustrate': 'show',
-        }
-        replacements.update(additional)
+        replacements.update(ADDITIONAL_SIMPLIFICATION_REPLACEMENTS)
     
     return replacements
 
@@ -181,42 +307,57 @@ def get_enhancement_replacements(degree: int) -> Dict[str, str]:
     Returns:
         Dictionary of simple words to complex words
     """
-    # Basic replacements
-    replacements = {
-        'use': 'utilize',
-        'get': 'acquire',
-        'enough': 'sufficient',
-        'start': 'commence',
-        'end': 'terminate',
-        'more': 'additional',
-        'later': 'subsequently',
-        'still': 'nevertheless',
-        'help': 'facilitate',
-        'show': 'demonstrate',
-        'find out': 'ascertain',
-        'is': 'constitutes',
-        'try': 'endeavor',
-    }
+    replacements = dict(ENHANCEMENT_REPLACEMENTS)
     
     # Add more aggressive replacements for higher degree
     if degree > 1:
-        additional = {
-            'about': 'approximately',
-            'too much': 'excessive',
-            'ask': 'inquire',
-            'see': 'perceive',
-            'understand': 'comprehend',
-            'met': 'encountered',
-            'focus on': 'prioritize',
-            'end': 'conclusion',
-            'start': 'initiate',
-            'show': 'illustrate',
-        }
-        replacements.update(additional)
+        replacements.update(ADDITIONAL_ENHANCEMENT_REPLACEMENTS)
     
     return replacements
 
 
+def get_builtin_lexicon_entries() -> List[Tuple[str, str, str, int]]:
+    """
+    Get the lexicon entries built from the replacement tables above.
+    
+    Used when no lexicon file has been built, and as a seed for building one.
+    
+    Returns:
+        List of (word, simpler, harder, rank) tuples
+    """
+    # The additional tables come first: encode_lexicon keeps the first alternative
+    # of a word, and degree 2 used to apply them over the basic tables
+    entries = []
+    for replacements, rank in ((ADDITIONAL_SIMPLIFICATION_REPLACEMENTS, UNCOMMON_WORD_RANK),
+                               (SIMPLIFICATION_REPLACEMENTS, RARE_WORD_RANK)):
+        entries.extend((word, simpler, "", rank) for word, simpler in replacements.items())
+    
+    for replacements, rank in ((ADDITIONAL_ENHANCEMENT_REPLACEMENTS, COMMON_WORD_RANK),
+                               (ENHANCEMENT_REPLACEMENTS, VERY_COMMON_WORD_RANK)):
+        entries.extend((word, "", harder, rank) for word, harder in replacements.items())
+    
+    return entries
+
+
+def get_lexicon() -> Lexicon:
+    """
+    Get the lexicon used for vocabulary adjustment, loading it on first use.
+    
+    The built lexicon file is memory-mapped if it exists; otherwise a lexicon is
+    encoded in memory from the built-in replacement tables.
+    
+    Returns:
+        The lexicon
+    """
+    global _lexicon
+    if _lexicon is None:
+        if os.path.exists(DEFAULT_LEXICON_PATH):
+            _lexicon = open_lexicon(DEFAULT_LEXICON_PATH)
+        else:
+            _lexicon = Lexicon(encode_lexicon(get_builtin_lexicon_entries()))
+    return _lexicon
+
+
 def get_filler_words() -> List[str]:
     """
     Get a list of filler words.
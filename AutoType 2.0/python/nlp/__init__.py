@@ -0,0 +1,4 @@
+"""
+NLP module for the AutoType application.
+This module handles loading and sharing spaCy pipelines between the other modules.
+"""
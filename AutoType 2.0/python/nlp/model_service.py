@@ -0,0 +1,222 @@
+"""
+NLP model service module for AutoType.
+This module loads spaCy pipelines once, keeps them warm and batches text through them.
+"""
+
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import spacy
+except ImportError:
+    # spaCy is optional; callers fall back to the rule-based behaviour without it
+    spacy = None
+
+
+# Default spaCy model used by all features
+DEFAULT_MODEL = "en_core_web_sm"
+
+# Components each feature needs; the pipeline holds those of every feature, and
+# the ones a feature does not need are disabled while parsing for it
+FEATURE_COMPONENTS = {
+    "humanizer": ("tok2vec", "tagger", "attribute_ruler", "parser"),
+    "tone": ("tok2vec", "tagger", "attribute_ruler"),
+}
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_WORKERS = 1
+
+
+class ModelService:
+    """
+    Keeps one loaded spaCy pipeline shared by all features.
+    
+    Loading a pipeline takes seconds, so it is loaded on first use and then
+    reused for the lifetime of the process. Components that no feature needs are
+    excluded at load time, so their weights are never loaded; those that only
+    some features need are disabled while parsing for the others, which saves
+    per-token work without loading the model twice.
+    """
+    
+    def __init__(self, model: str = DEFAULT_MODEL, batch_size: int = DEFAULT_BATCH_SIZE,
+                 workers: int = DEFAULT_WORKERS):
+        """
+        Args:
+            model: Name or path of the spaCy model to load
+            batch_size: Number of texts per nlp.pipe batch
+            workers: Number of processes used by nlp.pipe
+        """
+        self.model = model
+        self.batch_size = batch_size
+        self.workers = workers
+        self._nlp: Any = None
+        self._unavailable = spacy is None
+    
+    def is_available(self) -> bool:
+        """
+        Check whether spaCy and the configured model can be used, without loading it.
+        
+        Returns:
+            True if the pipeline can be loaded
+        """
+        if self._unavailable:
+            return False
+        
+        if self._nlp is None and not (spacy.util.is_package(self.model) or Path(self.model).exists()):
+            # The model package is not installed
+            self._unavailable = True
+        
+        return not self._unavailable
+    
+    def get_pipeline(self, feature: str) -> Any:
+        """
+        Get the warm pipeline, loading it on first use.
+        
+        The pipeline is shared by all features; parse() disables the components
+        a feature does not need.
+        
+        Args:
+            feature: Feature name (a key of FEATURE_COMPONENTS)
+        
+        Returns:
+            The loaded spaCy Language object
+        
+        Raises:
+            RuntimeError: If spaCy is not installed
+            ValueError: If the feature is unknown
+        """
+        if feature not in FEATURE_COMPONENTS:
+            raise ValueError(f"Unknown NLP feature: {feature}")
+        
+        if self._nlp is not None:
+            return self._nlp
+        
+        if spacy is None:
+            raise RuntimeError("spaCy is not installed")
+        
+        # Exclude components no feature needs so their weights are never loaded
+        needed = {name for components in FEATURE_COMPONENTS.values() for name in components}
+        component_names = self._component_names()
+        if component_names is not None:
+            excluded = [name for name in component_names if name not in needed]
+            nlp = spacy.load(self.model, exclude=excluded)
+        else:
+            nlp = spacy.load(self.model)
+            for name in nlp.pipe_names:
+                if name not in needed:
+                    nlp.disable_pipe(name)
+        
+        self._nlp = nlp
+        return nlp
+    
+    def parse(self, texts: Iterable[str], feature: str,
+              batch_size: Optional[int] = None, workers: Optional[int] = None) -> Iterator[Any]:
+        """
+        Parse texts in batches with the pipeline for a feature.
+        
+        Args:
+            texts: Texts to parse, consumed lazily
+            feature: Feature name (a key of FEATURE_COMPONENTS)
+            batch_size: Override for the configured batch size
+            workers: Override for the configured number of worker processes
+        
+        Yields:
+            One spaCy Doc per input text, in order
+        """
+        nlp = self.get_pipeline(feature)
+        # Disabling per call leaves the shared pipeline untouched for other features
+        disabled = [name for name in nlp.pipe_names if name not in FEATURE_COMPONENTS[feature]]
+        yield from nlp.pipe(
+            texts,
+            batch_size=batch_size or self.batch_size,
+            disable=disabled,
+            n_process=workers or self.workers,
+        )
+    
+    def warm_up(self, features: Tuple[str, ...] = tuple(FEATURE_COMPONENTS)) -> List[str]:
+        """
+        Load the pipeline ahead of the first request.
+        
+        Args:
+            features: Features that will be used
+        
+        Returns:
+            List of features that can parse with the loaded pipeline
+        """
+        if not self.is_available() or not features:
+            return []
+        
+        try:
+            self.get_pipeline(features[0])
+        except OSError:
+            # The model is installed but cannot be loaded
+            self._unavailable = True
+            return []
+        
+        return list(features)
+    
+    def _component_names(self) -> Optional[List[str]]:
+        """Read the model's component names from its meta data without loading it."""
+        if spacy.util.is_package(self.model):
+            meta_path = spacy.util.get_package_path(self.model) / "meta.json"
+        else:
+            meta_path = Path(self.model) / "meta.json"
+        
+        if not meta_path.exists():
+            return None
+        
+        meta = spacy.util.load_meta(meta_path)
+        return meta.get("components") or meta.get("pipeline")
+
+
+# Process-wide service shared by the humanizer and tone modules
+_service: Optional[ModelService] = None
+
+
+def get_model_service() -> ModelService:
+    """
+    Get the process-wide model service, creating it on first use.
+    
+    Returns:
+        The shared ModelService
+    """
+    global _service
+    if _service is None:
+        _service = ModelService()
+    return _service
+
+
+def configure_model_service(model: str = DEFAULT_MODEL, batch_size: int = DEFAULT_BATCH_SIZE,
+                            workers: int = DEFAULT_WORKERS) -> ModelService:
+    """
+    Replace the process-wide model service with a new configuration.
+    
+    Args:
+        model: Name or path of the spaCy model to load
+        batch_size: Number of texts per nlp.pipe batch
+        workers: Number of processes used by nlp.pipe
+    
+    Returns:
+        The new shared ModelService
+    """
+    global _service
+    _service = ModelService(model, batch_size, workers)
+    return _service
+
+
+def parse_if_available(texts: List[str], feature: str) -> List[Optional[Any]]:
+    """
+    Parse texts with the shared service, or return no docs if NLP is unavailable.
+    
+    Args:
+        texts: Texts to parse
+        feature: Feature name (a key of FEATURE_COMPONENTS)
+    
+    Returns:
+        One Doc per text, or a list of None if spaCy or the model is missing
+    """
+    service = get_model_service()
+    if not service.is_available():
+        return [None] * len(texts)
+    
+    return list(service.parse(texts, feature))
@@ -0,0 +1,222 @@
+"""
+Alignment module for AutoType.
+This module finds the exact passages a text shares with a source document.
+
+The source is turned into a suffix automaton over its lowercased words, and the
+text is streamed through it. At every word of the text this gives the longest
+run of words ending there that also occurs somewhere in the source, and where.
+Runs that cannot be extended are the longest common substrings of the two texts;
+those of at least MIN_MATCH_WORDS words are mapped back to character offsets and
+merged. Building and streaming are both linear in the number of words.
+"""
+
+from typing import Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
+
+from .fingerprint import tokenize
+
+
+# Shortest shared run of words reported as a match
+MIN_MATCH_WORDS = 4
+
+# (text start, text end, source start, source end) character offsets
+Match = Tuple[int, int, int, int]
+
+
+class SuffixAutomaton:
+    """Suffix automaton of a sequence of tokens."""
+    
+    def __init__(self, tokens: Sequence[Hashable]):
+        """
+        Args:
+            tokens: The sequence, e.g. lowercased words
+        """
+        # Per state: transitions, suffix link, length of its longest string, and
+        # the token position where that string first ends
+        self.transitions: List[Dict[Hashable, int]] = [{}]
+        self.links = [-1]
+        self.lengths = [0]
+        self.ends = [-1]
+        
+        last = 0
+        for position, token in enumerate(tokens):
+            current = self._add_state({}, 0, self.lengths[last] + 1, position)
+            state = last
+            while state != -1 and token not in self.transitions[state]:
+                self.transitions[state][token] = current
+                state = self.links[state]
+            
+            if state != -1:
+                target = self.transitions[state][token]
+                if self.lengths[state] + 1 == self.lengths[target]:
+                    self.links[current] = target
+                else:
+                    clone = self._add_state(dict(self.transitions[target]), self.links[target],
+                                            self.lengths[state] + 1, self.ends[target])
+                    while state != -1 and self.transitions[state].get(token) == target:
+                        self.transitions[state][token] = clone
+                        state = self.links[state]
+                    self.links[target] = clone
+                    self.links[current] = clone
+            
+            last = current
+    
+    def _add_state(self, transitions: Dict[Hashable, int], link: int, length: int, end: int) -> int:
+        """Append a state and return its number."""
+        self.transitions.append(transitions)
+        self.links.append(link)
+        self.lengths.append(length)
+        self.ends.append(end)
+        return len(self.lengths) - 1
+    
+    def matching_statistics(self, tokens: Sequence[Hashable]) -> Iterator[Tuple[int, int]]:
+        """
+        Stream another sequence through the automaton.
+        
+        Args:
+            tokens: The other sequence
+        
+        Yields:
+            For each position, the length of the longest run of tokens ending there
+            that occurs in the automaton's sequence, and the position where one
+            occurrence of it ends (-1 when the length is 0)
+        """
+        state = 0
+        length = 0
+        for token in tokens:
+            while state and token not in self.transitions[state]:
+                state = self.links[state]
+                length = self.lengths[state]
+            
+            target = self.transitions[state].get(token)
+            if target is None:
+                length = 0
+            else:
+                state = target
+                length += 1
+            yield length, self.ends[state]
+
+
+def common_runs(tokens: Sequence[Hashable], automaton: SuffixAutomaton,
+                min_length: int = MIN_MATCH_WORDS) -> List[Tuple[int, int, int, int]]:
+    """
+    Find the runs of tokens shared with the automaton's sequence that cannot be extended.
+    
+    Args:
+        tokens: The sequence to align
+        automaton: Suffix automaton of the other sequence
+        min_length: Shortest run reported
+    
+    Returns:
+        List of (start, end, other start, other end) token positions, ends exclusive
+    """
+    runs = []
+    previous_length = 0
+    previous_end = -1
+    position = -1
+    for position, (length, other_end) in enumerate(automaton.matching_statistics(tokens)):
+        # The previous run ended if this position does not extend it
+        if previous_length >= min_length and length != previous_length + 1:
+            runs.append((position - previous_length, position, previous_end - previous_length + 1, previous_end + 1))
+        previous_length = length
+        previous_end = other_end
+    
+    if previous_length >= min_length:
+        end = position + 1
+        runs.append((end - previous_length, end, previous_end - previous_length + 1, previous_end + 1))
+    return runs
+
+
+def merge_matches(matches: List[Match]) -> List[Match]:
+    """
+    Merge matches that overlap in both the text and the source.
+    
+    Args:
+        matches: Character offset matches, in any order
+    
+    Returns:
+        Merged matches, by text start
+    """
+    merged: List[List[int]] = []
+    for start, end, source_start, source_end in sorted(matches):
+        if merged:
+            last = merged[-1]
+            if start <= last[1] and last[2] <= source_start <= last[3]:
+                last[1] = max(last[1], end)
+                last[3] = max(last[3], source_end)
+                continue
+        merged.append([start, end, source_start, source_end])
+    return [(start, end, source_start, source_end) for start, end, source_start, source_end in merged]
+
+
+def merge_intervals(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    Merge overlapping or touching character intervals.
+    
+    Sorting dominates, so this takes O(n log n) for n intervals.
+    
+    Args:
+        intervals: (start, end) intervals, in any order
+    
+    Returns:
+        Disjoint intervals, sorted
+    """
+    merged: List[List[int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def covered_length(intervals: List[Tuple[int, int]]) -> int:
+    """
+    Count the characters covered by disjoint intervals.
+    
+    Args:
+        intervals: Disjoint (start, end) intervals, e.g. from merge_intervals
+    
+    Returns:
+        Number of characters covered
+    """
+    return sum(end - start for start, end in intervals)
+
+
+class TextAligner:
+    """Aligns one text against many source documents."""
+    
+    def __init__(self, text: str, min_words: int = MIN_MATCH_WORDS):
+        """
+        Args:
+            text: The text to check
+            min_words: Shortest shared run of words reported
+        """
+        self.text = text
+        self.min_words = min_words
+        self._matches = tokenize(text)
+        self._words = [match.group().lower() for match in self._matches]
+    
+    def align(self, source: str, automaton: Optional[SuffixAutomaton] = None) -> List[Match]:
+        """
+        Find the passages the text shares with a source.
+        
+        Args:
+            source: The source document text
+            automaton: Suffix automaton of the source's lowercased words, if already built
+        
+        Returns:
+            Merged (text start, text end, source start, source end) character offsets
+        """
+        if len(self._words) < self.min_words:
+            return []
+        
+        source_matches = tokenize(source)
+        if automaton is None:
+            automaton = SuffixAutomaton([match.group().lower() for match in source_matches])
+        
+        matches = [
+            (self._matches[start].start(), self._matches[end - 1].end(),
+             source_matches[source_start].start(), source_matches[source_end - 1].end())
+            for start, end, source_start, source_end in common_runs(self._words, automaton, self.min_words)
+        ]
+        return merge_matches(matches)
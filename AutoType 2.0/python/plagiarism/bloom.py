@@ -0,0 +1,166 @@
+"""
+Bloom filter module for AutoType.
+This module tells quickly that an index segment holds none of a query's hashes.
+
+Each segment stores a bloom filter of its fingerprint hashes and MinHash band
+keys. A query first tests its own hashes against the filter, and skips the
+segment when none of them can be present, without touching the segment's hash
+tables. The filter never misses a hash that is present; it wrongly reports an
+absent hash with probability about FALSE_POSITIVE_RATE, which must be low because
+a query tests hundreds of hashes and any one of them keeps the segment.
+
+The HASHES bit positions of a hash are derived from two 32-bit halves of it
+(double hashing) and scaled to the filter size with a multiply and a shift, so a
+query hashes its values once and reuses them for every segment's filter.
+"""
+
+import math
+import os
+from typing import Dict, NamedTuple
+
+import numpy as np
+
+
+BLOOM_NAME = "bloom.npy"
+
+# Chance that an absent hash is reported present, and the number of hash
+# functions that minimizes the filter size for it
+FALSE_POSITIVE_RATE = 1e-4
+HASHES = round(-math.log2(FALSE_POSITIVE_RATE))
+
+# Bit positions are 32-bit values scaled to the filter size, so larger filters
+# would leave bits unused
+MAX_BITS = 1 << 32
+
+# Hashes added per step, bounding the memory used while building
+BUILD_CHUNK_SIZE = 1 << 20
+
+# Constants of the splitmix64 finalizer, which spreads the bits of a hash
+MIX_MULTIPLIERS = (np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB))
+MIX_OFFSET = np.uint64(0x9E3779B97F4A7C15)
+
+LOW_BITS = np.uint64(0xFFFFFFFF)
+SHIFT = np.uint64(32)
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """Scramble uint64 values (splitmix64), wrapping on overflow."""
+    values = values + MIX_OFFSET
+    values = (values ^ (values >> np.uint64(30))) * MIX_MULTIPLIERS[0]
+    values = (values ^ (values >> np.uint64(27))) * MIX_MULTIPLIERS[1]
+    return values ^ (values >> np.uint64(31))
+
+
+class BloomProbe(NamedTuple):
+    """Hashes prepared once to be tested against many filters."""
+    hashes: np.ndarray   # uint64 array of shape (values, HASHES) holding 32-bit hashes
+
+
+def probe(values: np.ndarray) -> BloomProbe:
+    """
+    Prepare hashes to be tested against filters.
+    
+    Args:
+        values: uint64 hashes
+    
+    Returns:
+        The probe
+    """
+    mixed = _mix(np.asarray(values, dtype=np.uint64))
+    first = mixed & LOW_BITS
+    step = (mixed >> SHIFT) | np.uint64(1)
+    rounds = np.arange(HASHES, dtype=np.uint64)
+    return BloomProbe((first[:, None] + step[:, None] * rounds) & LOW_BITS)
+
+
+def bloom_size(items: int) -> int:
+    """
+    Get the number of bits of a filter for a number of hashes.
+    
+    Args:
+        items: Number of hashes to add
+    
+    Returns:
+        Number of bits, a multiple of 8
+    """
+    bits = math.ceil(max(items, 1) * HASHES / math.log(2))
+    return min(max(64, (bits + 7) // 8 * 8), MAX_BITS)
+
+
+class BloomFilter:
+    """A bloom filter over uint64 hashes, stored as a packed bit array."""
+    
+    def __init__(self, bits: np.ndarray, hashes: int = HASHES):
+        """
+        Args:
+            bits: uint8 array of the filter's bits, least significant bit first
+            hashes: Number of hash functions, at most HASHES
+        """
+        # A plain view, since indexing a memmap is several times slower
+        self.bits = bits.view(np.ndarray)
+        self.size = np.uint64(len(bits) * 8)
+        self.hashes = hashes
+    
+    def _positions(self, hashes: BloomProbe) -> np.ndarray:
+        """Get the bit positions of prepared hashes, one column per hash function."""
+        return ((hashes.hashes[:, :self.hashes] * self.size) >> SHIFT).astype(np.intp)
+    
+    @classmethod
+    def build(cls, values: np.ndarray) -> "BloomFilter":
+        """
+        Build a filter holding some hashes.
+        
+        Args:
+            values: uint64 hashes; duplicates are fine
+        
+        Returns:
+            The filter
+        """
+        bloom = cls(np.zeros(bloom_size(len(values)) // 8, dtype=np.uint8))
+        for start in range(0, len(values), BUILD_CHUNK_SIZE):
+            positions = bloom._positions(probe(values[start:start + BUILD_CHUNK_SIZE])).ravel()
+            masks = np.left_shift(1, positions & 7).astype(np.uint8)
+            # Unbuffered, so bits falling in the same byte are all kept
+            np.bitwise_or.at(bloom.bits, positions >> 3, masks)
+        return bloom
+    
+    def contains(self, hashes: BloomProbe) -> np.ndarray:
+        """
+        Test many hashes at once.
+        
+        Args:
+            hashes: The hashes, from probe()
+        
+        Returns:
+            Boolean array, False where a hash is certainly absent
+        """
+        positions = self._positions(hashes)
+        found = (self.bits[positions >> 3] >> (positions & 7).astype(np.uint8)) & 1
+        return found.all(axis=1)
+    
+    def header(self) -> Dict[str, int]:
+        """Parameters stored with a segment, to load the filter again."""
+        return {"bits": int(self.size), "hashes": self.hashes}
+    
+    def save(self, path: str) -> None:
+        """
+        Write the filter's bits into a segment.
+        
+        Args:
+            path: Segment directory
+        """
+        np.save(os.path.join(path, BLOOM_NAME), self.bits)
+    
+    @classmethod
+    def load(cls, path: str, header: Dict[str, int]) -> "BloomFilter":
+        """
+        Memory-map the filter of a segment.
+        
+        Args:
+            path: Segment directory
+            header: Parameters from header()
+        
+        Returns:
+            The filter
+        """
+        return cls(np.load(os.path.join(path, BLOOM_NAME), mmap_mode="r"), header["hashes"])
@@ -0,0 +1,485 @@
+"""
+Fragment cache module for AutoType.
+This module remembers the search results of text fragments, so a recheck only searches what changed.
+
+Text is split into fragments: paragraphs, with long paragraphs cut into runs of
+whole sentences. A cut follows a sentence whose hash falls on a fixed residue, so
+the cuts depend on the sentences around them and not on their position; editing
+one sentence changes its own fragment and at most its neighbour, never the rest
+of the paragraph. Fragments are keyed by a hash of their lowercased words, so
+changes to whitespace, punctuation or case keep their results, which are stored
+as word positions in the fragment.
+
+A check looks every fragment up, searches the missing ones for copied passages
+one by one, each for up to max_sources sources as if it were checked alone, and
+for paraphrases together as one text, with a break between them that no passage
+can match across, and stores their results. Checks with a deadline or a similarity threshold search the missing
+fragments one at a time instead, the most promising first, and stop early.
+
+Results are kept in an SQLite database next to the index, and are only valid for
+one version of the index: the whole cache is dropped when the version changes.
+Once the stored results exceed the size limit, the least recently used ones are
+evicted.
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .alignment import covered_length, merge_intervals, merge_matches
+from .fingerprint import fingerprint, tokenize
+from .index import DEFAULT_MAX_SOURCES, ReferenceIndex
+from .tfidf import PARAGRAPH_BREAK_PATTERN
+
+
+CACHE_NAME = "fragment_cache.sqlite"
+
+# Stored with the cache; results of another format are dropped
+CACHE_FORMAT = 1
+
+# Bytes of stored results kept, and the share evicted at once when over the limit
+DEFAULT_MAX_BYTES = 64 << 20
+EVICTION_SHARE = 0.2
+
+# Paragraphs longer than MAX_FRAGMENT_WORDS are cut into fragments of at least
+# MIN_FRAGMENT_WORDS, after about one sentence in CUT_SENTENCES
+MIN_FRAGMENT_WORDS = 40
+MAX_FRAGMENT_WORDS = 200
+CUT_SENTENCES = 3
+
+# Whitespace after sentence-ending punctuation
+SENTENCE_BREAK_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+# Joins the fragments searched together; its word occurs in no reference text,
+# so matches end at it, and it forms a paragraph too short to be vectorized
+FRAGMENT_BREAK = "\n\n_fragment_break_\n\n"
+
+# Seconds to wait for another process writing to the cache
+SQLITE_TIMEOUT = 5.0
+
+# Reference passages scored per second by a paraphrase search, to plan searches
+# with a deadline before one has been timed
+PARAPHRASE_PASSAGES_PER_SECOND = 2_000_000
+
+
+def _words_hash(words: List[str]) -> bytes:
+    """Hash a sequence of lowercase words."""
+    return hashlib.blake2b("\x1f".join(words).encode("utf-8"), digest_size=16).digest()
+
+
+def split_fragments(text: str) -> List[Tuple[int, int]]:
+    """
+    Split text into the fragments whose results are cached.
+    
+    Args:
+        text: The text
+    
+    Returns:
+        (start, end) character offsets of the fragments holding words, in order
+    """
+    fragments = []
+    position = 0
+    for paragraph in PARAGRAPH_BREAK_PATTERN.split(text):
+        start = text.index(paragraph, position)
+        position = start + len(paragraph)
+        paragraph_words = len(tokenize(paragraph))
+        if paragraph_words <= MAX_FRAGMENT_WORDS:
+            if paragraph_words:
+                fragments.append((start, position))
+            continue
+        
+        fragment_start: Optional[int] = None
+        words = 0
+        offset = 0
+        for sentence in SENTENCE_BREAK_PATTERN.split(paragraph):
+            offset = paragraph.index(sentence, offset)
+            if fragment_start is None:
+                fragment_start = start + offset
+            offset += len(sentence)
+            sentence_words = [match.group().lower() for match in tokenize(sentence)]
+            words += len(sentence_words)
+            if words >= MAX_FRAGMENT_WORDS or (
+                    words >= MIN_FRAGMENT_WORDS and _words_hash(sentence_words)[0] % CUT_SENTENCES == 0):
+                fragments.append((fragment_start, start + offset))
+                fragment_start = None
+                words = 0
+        if words:
+            fragments.append((fragment_start, position))
+    return fragments
+
+
+class FragmentCache:
+    """Search results of text fragments, stored in an SQLite database."""
+    
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            path: Database file, created if missing
+            max_bytes: Bytes of stored results kept
+        
+        Raises:
+            sqlite3.Error: If the database cannot be opened
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=SQLITE_TIMEOUT, check_same_thread=False)
+        with self._lock:
+            # Readers in other processes do not block writers, and a crash can
+            # lose the latest results but never corrupt the database
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS fragments "
+                                     "(key BLOB PRIMARY KEY, value TEXT, size INTEGER, used REAL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS fragments_used ON fragments (used)")
+    
+    def _validate(self, version: str) -> None:
+        """Drop every result if they were stored for another index version or format."""
+        expected = f"{CACHE_FORMAT}:{version}"
+        row = self._connection.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+        if row is None or row[0] != expected:
+            with self._connection:
+                self._connection.execute("DELETE FROM fragments")
+                self._connection.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (expected,))
+    
+    def get_many(self, version: str, keys: List[bytes]) -> Dict[bytes, Any]:
+        """
+        Look up the results of fragments.
+        
+        Args:
+            version: Version of the index searched
+            keys: Fragment keys, from fragment_key()
+        
+        Returns:
+            The stored results by key, for the keys found
+        """
+        with self._lock:
+            self._validate(version)
+            found = {}
+            for key in set(keys):
+                row = self._connection.execute("SELECT value FROM fragments WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    found[key] = json.loads(row[0])
+            if found:
+                now = time.time()
+                with self._connection:
+                    self._connection.executemany("UPDATE fragments SET used = ? WHERE key = ?",
+                                                 [(now, key) for key in found])
+            return found
+    
+    def put_many(self, version: str, results: Dict[bytes, Any]) -> None:
+        """
+        Store the results of fragments, evicting old ones if over the size limit.
+        
+        Args:
+            version: Version of the index searched
+            results: Results by fragment key; they must be JSON-serializable
+        """
+        now = time.time()
+        rows = []
+        for key, result in results.items():
+            value = json.dumps(result, separators=(",", ":"))
+            rows.append((key, value, len(key) + len(value), now))
+        
+        with self._lock:
+            self._validate(version)
+            with self._connection:
+                self._connection.executemany("INSERT OR REPLACE INTO fragments VALUES (?, ?, ?, ?)", rows)
+            self._evict()
+    
+    def _evict(self) -> None:
+        """Remove the least recently used results until well under the size limit."""
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM fragments").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        
+        excess = total - self.max_bytes * (1.0 - EVICTION_SHARE)
+        evicted = []
+        for key, size in self._connection.execute("SELECT key, size FROM fragments ORDER BY used"):
+            evicted.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        with self._connection:
+            self._connection.executemany("DELETE FROM fragments WHERE key = ?", evicted)
+    
+    def size(self) -> int:
+        """Get the bytes of stored results."""
+        with self._lock:
+            return self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM fragments").fetchone()[0]
+    
+    def clear(self) -> None:
+        """Drop every stored result."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM fragments")
+    
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._connection.close()
+
+
+# Database path -> open cache
+_fragment_caches: Dict[str, FragmentCache] = {}
+
+# Index directory -> seconds its last paraphrase search took
+_paraphrase_seconds: Dict[str, float] = {}
+
+
+def get_fragment_cache(index: ReferenceIndex) -> Optional[FragmentCache]:
+    """
+    Get the fragment cache of an index.
+    
+    Args:
+        index: The reference index
+    
+    Returns:
+        The cache, kept in the index directory, or None if it cannot be opened
+        there (e.g. the directory is read-only)
+    """
+    path = os.path.join(index.path, CACHE_NAME)
+    cache = _fragment_caches.get(path)
+    if cache is None:
+        try:
+            cache = FragmentCache(path)
+        except sqlite3.Error:
+            return None
+        _fragment_caches[path] = cache
+    return cache
+
+
+def fragment_key(words: List[str], max_sources: int, bands: int) -> bytes:
+    """
+    Get the cache key of a fragment.
+    
+    Args:
+        words: The fragment's lowercase words
+        max_sources: Maximum number of sources searched
+        bands: Number of MinHash bands probed
+    
+    Returns:
+        Key covering the words and the search parameters
+    """
+    return _words_hash([f"{max_sources}:{bands}"] + words)
+
+
+def _search_missing(texts: List[str], index: ReferenceIndex, max_sources: int, bands: int,
+                    search_sources: bool = True, search_paraphrases: bool = True) -> List[Dict[str, List[List[Any]]]]:
+    """
+    Search fragments for copied passages one by one, and for paraphrases together.
+    
+    Each fragment gets its own max_sources sources: a search of the fragments
+    joined together would share them, and the sources of the fragments with
+    fewer copied characters would be cut and stored as no match.
+    
+    Args:
+        texts: The fragment texts
+        index: The reference index
+        max_sources: Maximum number of sources to report per fragment
+        bands: Number of MinHash bands to probe
+        search_sources: Whether to search for copied passages
+        search_paraphrases: Whether to search for reworded paragraphs
+    
+    Returns:
+        Per fragment, its "sources" as [document, [[start word, end word,
+        source start, source end], ...]] and its "paraphrases" as [start word,
+        end word, [[document, similarity, source start, source end], ...]]
+    """
+    offsets = []
+    word_starts = []
+    word_ends = []
+    position = 0
+    for text in texts:
+        offsets.append(position)
+        matches = tokenize(text)
+        word_starts.append([match.start() + position for match in matches])
+        word_ends.append([match.end() + position for match in matches])
+        position += len(text) + len(FRAGMENT_BREAK)
+    combined = FRAGMENT_BREAK.join(texts)
+    
+    def locate(start: int, end: int) -> Tuple[int, int, int]:
+        """Map a character span of the combined text to a fragment and its words."""
+        number = bisect.bisect_right(offsets, start) - 1
+        first = bisect.bisect_left(word_starts[number], start)
+        last = bisect.bisect_left(word_ends[number], end) + 1
+        return number, first, min(last, len(word_ends[number]))
+    
+    results: List[Dict[str, List[List[Any]]]] = [{"sources": [], "paraphrases": []} for _ in texts]
+    for number, text in enumerate(texts) if search_sources else []:
+        for result in index.search(text, max_sources, bands=bands):
+            results[number]["sources"].append([result["document"], [
+                list(locate(start + offsets[number], end + offsets[number])[1:]) + [source_start, source_end]
+                for start, end, source_start, source_end in result["matches"]
+            ]])
+    
+    if not search_paraphrases:
+        return results
+    start_time = time.perf_counter()
+    paragraphs = index.paraphrases(combined)
+    _paraphrase_seconds[index.path] = time.perf_counter() - start_time
+    for paragraph in paragraphs:
+        number, first, last = locate(paragraph["start"], paragraph["end"])
+        results[number]["paraphrases"].append([first, last, [
+            [match["document"], match["similarity"], match["sourceStart"], match["sourceEnd"]]
+            for match in paragraph["matches"]
+        ]])
+    return results
+
+
+class FragmentSearch(NamedTuple):
+    """Results of a text searched fragment by fragment."""
+    sources: List[Dict[str, Any]]       # as from ReferenceIndex.search(), without a limit, most covered first
+    paraphrases: List[Dict[str, Any]]   # as from ReferenceIndex.paraphrases()
+    complete: bool                      # whether every fragment was searched for both
+    checked: float                      # share of the text's words searched for copied passages
+
+
+def _estimate_paraphrase_seconds(index: ReferenceIndex) -> float:
+    """Estimate how long a paraphrase search of the index takes, from the last one if any."""
+    if index.path in _paraphrase_seconds:
+        return _paraphrase_seconds[index.path]
+    return sum(len(segment.tfidf) for segment in index.segments if segment.tfidf is not None) / PARAPHRASE_PASSAGES_PER_SECOND
+
+
+def _fragment_covered(words: List[re.Match], result: Dict[str, List[List[Any]]]) -> int:
+    """Count the characters of a fragment covered by its stored matches."""
+    return covered_length(merge_intervals([(words[first].start(), words[last - 1].end())
+                                           for _, matches in result["sources"] for first, last, _, _ in matches]))
+
+
+def _by_yield(text: str, index: ReferenceIndex, fragments: Dict[bytes, List[re.Match]]) -> List[bytes]:
+    """
+    Order fragments by the share of their fingerprints found in the index, highest first.
+    
+    Looking fingerprints up without their postings is a few binary searches, far
+    cheaper than searching a fragment, and fragments copied from a reference
+    document have most of their fingerprints in the index.
+    """
+    prints = fingerprint(text, index.k, index.window)
+    hit_starts = np.sort(prints.starts[index.fingerprint_hits(prints.hashes)])
+    
+    def density(key: bytes) -> float:
+        words = fragments[key]
+        hits = (np.searchsorted(hit_starts, words[-1].end()) - np.searchsorted(hit_starts, words[0].start()))
+        return hits / len(words)
+    
+    return sorted(fragments, key=density, reverse=True)
+
+
+def search_fragments(text: str, index: ReferenceIndex, cache: Optional[FragmentCache] = None,
+                     max_sources: int = DEFAULT_MAX_SOURCES, bands: int = 0, deadline: Optional[float] = None,
+                     stop_above: Optional[float] = None) -> FragmentSearch:
+    """
+    Search a text fragment by fragment, reusing the stored results of fragments seen before.
+    
+    Without a deadline or threshold, the fragments not in the cache are searched
+    together. Otherwise they are searched for copied passages one at a time,
+    those with the most fingerprints in the index first, until the deadline
+    passes or the characters covered reach the threshold; covered characters
+    only grow as fragments are searched, so a partial score at or above the
+    threshold is final. Paraphrases are then searched for all fragments at once,
+    as a paraphrase search costs about as much for one paragraph as for many,
+    if every fragment was searched, the threshold was not reached, and the
+    search is expected to end before the deadline. Only fragments searched for
+    both are cached.
+    
+    Args:
+        text: The text to check
+        index: The reference index
+        cache: The fragment cache of the index, if any
+        max_sources: Maximum number of sources searched per fragment
+        bands: Number of MinHash bands to probe (0 for all)
+        deadline: time.perf_counter() value after which no fragment is started
+        stop_above: Share of the text's characters which, once covered, stops the search
+    
+    Returns:
+        The search results
+    """
+    matches = tokenize(text)
+    starts = [match.start() for match in matches]
+    fragments = []
+    for start, end in split_fragments(text):
+        first = bisect.bisect_left(starts, start)
+        words = matches[first:bisect.bisect_left(starts, end)]
+        fragments.append((words, fragment_key([word.group().lower() for word in words], max_sources, bands)))
+    
+    version = index.version
+    stored = cache.get_many(version, [key for _, key in fragments]) if cache is not None else {}
+    missing: Dict[bytes, List[re.Match]] = {}
+    for words, key in fragments:
+        if key not in stored and key not in missing:
+            missing[key] = words
+    
+    def fragment_text(key: bytes) -> str:
+        words = missing[key]
+        return text[words[0].start():words[-1].end()]
+    
+    found: Dict[bytes, Dict[str, List[List[Any]]]] = {}
+    paraphrased = True
+    if missing and deadline is None and stop_above is None:
+        found = dict(zip(missing, _search_missing([fragment_text(key) for key in missing], index, max_sources, bands)))
+    elif missing:
+        occurrences = Counter(key for _, key in fragments)
+        covered = sum(_fragment_covered(words, stored[key]) for words, key in fragments if key in stored)
+        exceeded = stop_above is not None and covered >= stop_above * len(text)
+        for key in _by_yield(text, index, missing):
+            if exceeded or (deadline is not None and time.perf_counter() >= deadline):
+                break
+            found[key] = _search_missing([fragment_text(key)], index, max_sources, bands, search_paraphrases=False)[0]
+            covered += _fragment_covered(missing[key], found[key]) * occurrences[key]
+            exceeded = stop_above is not None and covered >= stop_above * len(text)
+        
+        paraphrased = len(found) == len(missing) and not exceeded and (
+            deadline is None or deadline - time.perf_counter() >= _estimate_paraphrase_seconds(index))
+        if paraphrased:
+            paraphrases = _search_missing([fragment_text(key) for key in found], index, max_sources, bands,
+                                          search_sources=False)
+            for result, paraphrase_result in zip(found.values(), paraphrases):
+                result["paraphrases"] = paraphrase_result["paraphrases"]
+    
+    if cache is not None and found and paraphrased:
+        cache.put_many(version, found)
+    stored.update(found)
+    
+    sources: Dict[int, List[Tuple[int, int, int, int]]] = {}
+    paraphrases = []
+    checked_words = 0
+    for words, key in fragments:
+        result = stored.get(key)
+        if result is None:
+            continue
+        checked_words += len(words)
+        for document, document_matches in result["sources"]:
+            sources.setdefault(document, []).extend(
+                (words[first].start(), words[last - 1].end(), source_start, source_end)
+                for first, last, source_start, source_end in document_matches)
+        for first, last, paraphrase_matches in result["paraphrases"]:
+            paraphrases.append({
+                "start": words[first].start(),
+                "end": words[last - 1].end(),
+                "matches": [
+                    {"document": document, "similarity": similarity, "sourceStart": source_start,
+                     "sourceEnd": source_end}
+                    for document, similarity, source_start, source_end in paraphrase_matches
+                ]
+            })
+    
+    results = []
+    for document, document_matches in sources.items():
+        document_matches = merge_matches(document_matches)
+        results.append({"document": document, "matches": document_matches,
+                        "covered": covered_length(merge_intervals([match[:2] for match in document_matches]))})
+    results.sort(key=lambda result: (-result["covered"], result["document"]))
+    total_words = sum(len(words) for words, _ in fragments)
+    return FragmentSearch(results, paraphrases, len(missing) == len(found) and paraphrased,
+                          checked_words / total_words if total_words else 1.0)
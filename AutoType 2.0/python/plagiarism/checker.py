@@ -1,30 +1,194 @@
 """
 Plagiarism checker module for AutoType.
 This module handles the detection of potentially plagiarized content.
+
+Text is checked against the local reference index (see plagiarism.index), both
+for copied passages and for paragraphs that reword a reference passage. The text
+is always searched fragment by fragment (see plagiarism.cache), so it scores the
+same with or without the cache; with it, the results of each fragment are
+stored, and a recheck after small edits only searches the fragments that changed. Callers with
+a time budget pass a deadline, and callers that only need to know whether the
+score exceeds a threshold pass it as stop_above; the fragments most likely to be
+copied are then searched first, and the check returns what it has found, marked
+incomplete, once the deadline passes or the threshold is reached. When no index
+has been built, the check falls back to a simulation.
 """
 
+import html
+import os
 import re
 import random
-from typing import Dict, List, Any, Tuple
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+from .alignment import covered_length, merge_intervals
+from .cache import FragmentCache, get_fragment_cache, search_fragments
+from .index import DEFAULT_INDEX_PATH, DEFAULT_MAX_SOURCES, MANIFEST_NAME, ReferenceIndex
+
+
+# Whitespace after sentence-ending punctuation
+SENTENCE_BREAK_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+# Index directory -> (modification time of its manifest, opened index)
+_reference_indexes: Dict[str, Tuple[int, ReferenceIndex]] = {}
+
+
+def get_reference_index(path: Optional[str] = None) -> Optional[ReferenceIndex]:
+    """
+    Get the reference index, reopening it when its segments change.
+    
+    Args:
+        path: Index directory (defaults to the bundled index location)
+    
+    Returns:
+        The index, or None if no index has been built at the default location
+    
+    Raises:
+        ValueError: If an explicitly given path does not hold an index
+    """
+    index_path = os.path.abspath(path or DEFAULT_INDEX_PATH)
+    try:
+        modified = os.stat(os.path.join(index_path, MANIFEST_NAME)).st_mtime_ns
+    except OSError:
+        if path:
+            raise ValueError(f"No plagiarism index at {path}")
+        return None
+    
+    cached = _reference_indexes.get(index_path)
+    if cached is None or cached[0] != modified:
+        # Segments are immutable, so those still live are reused
+        cached = (modified, ReferenceIndex(index_path, cached[1] if cached else None))
+        _reference_indexes[index_path] = cached
+    return cached[1]
 
 
-def check_plagiarism(text: str) -> Dict[str, Any]:
+def check_plagiarism(text: str, index_path: Optional[str] = None,
+                     max_sources: int = DEFAULT_MAX_SOURCES, bands: int = 0, use_cache: bool = True,
+                     deadline_ms: Optional[float] = None, stop_above: Optional[float] = None) -> Dict[str, Any]:
     """
     Check text for potential plagiarism.
     
     Args:
         text: The text to check
+        index_path: Reference index directory (defaults to the bundled index location)
+        max_sources: Maximum number of sources to report
+        bands: Number of MinHash bands to probe for edited copies (0 for all)
+        use_cache: Whether to reuse and store the results of the text's fragments
+        deadline_ms: Time budget in milliseconds, after which no more fragments are searched
+        stop_above: Similarity score at which to stop searching, as the text is
+            known to exceed it
     
     Returns:
         Dictionary with plagiarism check results
     """
-    # This is a placeholder that would contain actual plagiarism checking logic
-    # In a real implementation, this would use APIs or databases to check against online sources
+    deadline = time.perf_counter() + deadline_ms / 1000 if deadline_ms is not None else None
+    index = get_reference_index(index_path)
+    if index is None:
+        # No reference corpus available, so only simulate finding plagiarism
+        return simulate_plagiarism_check(text)
+    
+    return check_against_index(text, index, max_sources, bands, get_fragment_cache(index) if use_cache else None,
+                               deadline, stop_above)
+
+
+def check_against_index(text: str, index: ReferenceIndex, max_sources: int = DEFAULT_MAX_SOURCES,
+                        bands: int = 0, cache: Optional[FragmentCache] = None, deadline: Optional[float] = None,
+                        stop_above: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Check text against a reference index.
+    
+    Args:
+        text: The text to check
+        index: The reference index
+        max_sources: Maximum number of sources to report
+        bands: Number of MinHash bands to probe (0 for all)
+        cache: Fragment cache of the index, to search only the fragments not seen before
+        deadline: time.perf_counter() value after which no more fragments are searched
+        stop_above: Similarity score at which to stop searching
+    
+    Returns:
+        Dictionary with the similarity score (share of the text's characters
+        covered by a passage found in any source), the sources with their
+        matching passages, the highlighted text, the paraphrases (the
+        paragraphs whose wording is close to a reference passage, with the
+        most similar sources of each), whether the whole text was searched
+        ("complete"; if not, the score is a lower bound) and the share of its
+        words that were ("checked")
+    """
+    results, paragraphs, complete, checked = search_fragments(text, index, cache, max_sources, bands, deadline,
+                                                              stop_above)
+    
+    sources = []
+    covered: List[Tuple[int, int]] = []
+    # Every source counts towards the score, but only the first max_sources are listed
+    for result in results:
+        covered.extend(match[:2] for match in result["matches"])
+    
+    for rank, result in enumerate(results[:max_sources], 1):
+        info = index.document(result["document"])
+        matches = result["matches"]
+        longest = max(matches, key=lambda match: match[1] - match[0])
+        
+        sources.append({
+            "id": rank,
+            "documentId": info["id"],
+            "url": info["url"],
+            "title": info["title"],
+            "similarity": result["covered"] / len(text),
+            "matchedText": text[longest[0]:longest[1]],
+            "matches": [
+                {"start": start, "end": end, "sourceStart": source_start, "sourceEnd": source_end}
+                for start, end, source_start, source_end in matches
+            ]
+        })
+    
+    covered = merge_intervals(covered)
     
-    # For demonstration, simulate finding plagiarism in certain phrases
-    results = simulate_plagiarism_check(text)
+    paraphrases = []
+    for paragraph in paragraphs:
+        paraphrase_sources = []
+        for match in paragraph["matches"]:
+            info = index.document(match["document"])
+            paraphrase_sources.append({
+                "documentId": info["id"],
+                "url": info["url"],
+                "title": info["title"],
+                "similarity": match["similarity"],
+                "sourceStart": match["sourceStart"],
+                "sourceEnd": match["sourceEnd"]
+            })
+        paraphrases.append({"start": paragraph["start"], "end": paragraph["end"], "sources": paraphrase_sources})
     
-    return results
+    return {
+        "similarityScore": covered_length(covered) / len(text) if text else 0.0,
+        "sources": sources,
+        "highlightedText": highlight_intervals(text, covered),
+        "paraphrases": paraphrases,
+        "complete": complete,
+        "checked": checked
+    }
+
+
+def highlight_intervals(text: str, intervals: List[Tuple[int, int]]) -> str:
+    """
+    Generate HTML text with character intervals highlighted.
+    
+    Args:
+        text: The checked text
+        intervals: Disjoint, sorted (start, end) intervals to highlight
+    
+    Returns:
+        HTML string with the intervals highlighted
+    """
+    parts = ["<p>"]
+    position = 0
+    for start, end in intervals:
+        parts.append(html.escape(text[position:start]))
+        parts.append(f'<span class="plagiarism-highlight">{html.escape(text[start:end])}</span>')
+        position = end
+    parts.append(html.escape(text[position:]))
+    parts.append("</p>")
+    return "".join(parts)
 
 
 def simulate_plagiarism_check(text: str) -> Dict[str, Any]:
@@ -37,8 +201,8 @@ def simulate_plagiarism_check(text: str) -> Dict[str, Any]:
     Returns:
         Dictionary with simulated plagiarism check results
     """
-    # Split the text into sentences
-    sentences = re.split(r'(?<=[.!?])\s+', text)
+    # Split the text into sentences, keeping their offsets
+    sentences = sentence_spans(text)
     
     # Randomly mark some sentences as potentially plagiarized
     sources = []
@@ -60,7 +224,9 @@ def simulate_plagiarism_check(text: str) -> Dict[str, Any]:
     ]
     
     # Check each sentence
-    for i, sentence in enumerate(sentences):
+    for start, end in sentences:
+        sentence = text[start:end]
+        
         # Convert to lowercase for checking
         sentence_lower = sentence.lower()
         
@@ -85,7 +251,7 @@ def simulate_plagiarism_check(text: str) -> Dict[str, Any]:
                     }
                     
                     sources.append(source)
-                    plagiarized_segments.append((i, similarity))
+                    plagiarized_segments.append((start, end, similarity))
                     
                     # Increase the total similarity score
                     total_similarity_score += (similarity * len(sentence)) / len(text)
@@ -94,7 +260,7 @@ def simulate_plagiarism_check(text: str) -> Dict[str, Any]:
                     break
     
     # Generate highlighted text
-    highlighted_text = generate_highlighted_text(sentences, plagiarized_segments)
+    highlighted_text = highlight_intervals(text, [(start, end) for start, end, _ in plagiarized_segments])
     
     # Ensure the similarity score is between 0 and 1
     total_similarity_score = min(0.95, total_similarity_score)
@@ -102,68 +268,27 @@ def simulate_plagiarism_check(text: str) -> Dict[str, Any]:
     return {
         "similarityScore": total_similarity_score,
         "sources": sources,
-        "highlightedText": highlighted_text
+        "highlightedText": highlighted_text,
+        "paraphrases": [],
+        "complete": True,
+        "checked": 1.0
     }
 
 
-def generate_highlighted_text(sentences: List[str], plagiarized_segments: List[Tuple[int, float]]) -> str:
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
     """
-    Generate HTML text with plagiarized segments highlighted.
+    Split text into sentences.
     
     Args:
-        sentences: List of sentences in the text
-        plagiarized_segments: List of tuples with (sentence_index, similarity)
+        text: The text to split
     
     Returns:
-        HTML string with highlighted plagiarized segments
+        List of (start, end) character offsets of the sentences
     """
-    # Convert plagiarized segments to a set for quick lookup
-    plagiarized_indices = {index for index, _ in plagiarized_segments}
-    
-    # Build the HTML
-    html = "<p>"
-    
-    for i, sentence in enumerate(sentences):
-        if i in plagiarized_indices:
-            # Highlight the plagiarized sentence
-            html += f'<span class="plagiarism-highlight">{sentence}</span> '
-        else:
-            # Regular sentence
-            html += f'{sentence} '
-    
-    html += "</p>"
-    
-    return html
-
-
-def get_matched_sources(text: str, plagiarized_segments: List[Tuple[int, float]]) -> List[Dict[str, Any]]:
-    """
-    Get information about matched sources for plagiarized segments.
-    
-    Args:
-        text: The original text
-        plagiarized_segments: List of tuples with (sentence_index, similarity)
-    
-    Returns:
-        List of source information dictionaries
-    """
-    # This is a placeholder that would contain actual source retrieval logic
-    # For now, just generate fake sources
-    
-    sources = []
-    for i, (segment_index, similarity) in enumerate(plagiarized_segments):
-        source_id = i + 1
-        domain = random.choice(["example.com", "academia.edu", "scholar.org", "papers.edu", "research.net"])
-        path = random.choice(["article", "paper", "research", "publication", "journal"]) + str(random.randint(1, 1000))
-        
-        source = {
-            "id": source_id,
-            "url": f"https://www.{domain}/{path}",
-            "title": f"Publication on {path.capitalize()}",
-            "similarity": similarity,
-            "matchedText": text.split('.')[segment_index] if segment_index < len(text.split('.')) else ""
-        }
-        
-        sources.append(source)
-    
-    return sources 
\ No newline at end of file
+    spans = []
+    start = 0
+    for match in SENTENCE_BREAK_PATTERN.finditer(text):
+        spans.append((start, match.start()))
+        start = match.end()
+    spans.append((start, len(text)))
+    return spans
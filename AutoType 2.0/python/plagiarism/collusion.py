@@ -0,0 +1,386 @@
+"""
+Collusion module for AutoType.
+This module finds the submissions of a batch that share passages with each other.
+
+Usage:
+    python -m plagiarism.collusion <documents>... [--template FILE] [--output FILE]
+                                   [--min_similarity 0.1] [--workers N]
+
+Comparing every pair of N submissions takes N ** 2 / 2 alignments, hours for a
+few thousand essays. Instead each submission is hashed once, into the MinHash
+band keys of its passages and its winnowed fingerprints, and submissions sharing
+a band key or a fingerprint land in the same bucket. Only pairs that share at
+least MIN_CANDIDATE_HITS buckets are aligned word by word; buckets holding more
+than MAX_BUCKET_SIZE submissions are common phrases and are ignored. Alignment
+runs on a process pool, one suffix automaton per submission.
+
+The result is a similarity graph: one edge per pair sharing at least
+min_similarity of either text, and its connected components as clusters. Text
+given to every student, such as the assignment prompt, can be passed as a
+template and is not counted. Its band keys and k-gram hashes are removed from
+the submissions' before bucketing, so it makes no pair a candidate either.
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+from functools import lru_cache
+from multiprocessing import Pool
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .alignment import SuffixAutomaton, common_runs, covered_length, merge_intervals, merge_matches
+from .documents import iter_documents
+from .fingerprint import K_GRAM, WINDOW, fingerprint, kgram_hashes, tokenize
+from .ingest import map_bounded
+from .minhash import DEFAULT_BANDS, DEFAULT_ROWS, MAX_BUCKET_SIZE, MinHasher
+from .segment import band_items
+
+
+# Shortest shared run of words counted; shorter runs are common phrasing
+DEFAULT_MIN_WORDS = 8
+
+# Share of either text that must be shared for a pair to be reported
+DEFAULT_MIN_SIMILARITY = 0.1
+
+# Shared buckets (band keys plus fingerprints) needed before a pair is aligned
+MIN_CANDIDATE_HITS = 2
+
+# Pairs generated from buckets per step, bounding memory on large batches
+PAIR_CHUNK_SIZE = 1 << 20
+
+# Submissions hashed per worker task, and alignment tasks queued per worker
+HASH_BATCH_SIZE = 64
+PENDING_TASKS_PER_WORKER = 4
+
+# (first number, second number, share of the first, share of the second,
+# merged (first start, first end, second start, second end) character matches)
+Edge = Tuple[int, int, float, float, List[Tuple[int, int, int, int]]]
+
+# (submission number, its text, (number, text) of the submissions to align it
+# with, shortest shared run of words counted)
+AlignTask = Tuple[int, str, List[Tuple[int, str]], int]
+
+# Suffix automaton of the template, set in each worker process
+_template_automaton: Optional[SuffixAutomaton] = None
+
+
+@lru_cache(maxsize=None)
+def _get_hasher(bands: int, rows: int) -> MinHasher:
+    """Get the MinHasher for some parameters, built once per process."""
+    return MinHasher(bands, rows)
+
+
+def _hash_submissions(texts: List[str]) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Get the distinct band items and fingerprint hashes of each text."""
+    hasher = _get_hasher(DEFAULT_BANDS, DEFAULT_ROWS)
+    hashed = []
+    for text in texts:
+        keys = hasher.band_keys(hasher.signatures(text))
+        hashed.append((np.unique(band_items(keys.T)), np.unique(fingerprint(text, K_GRAM, WINDOW).hashes)))
+    return hashed
+
+
+def _hash_template(template: str) -> np.ndarray:
+    """
+    Get the bucket hashes a submission can share with the template.
+    
+    Every k-gram of the template is taken, not only its winnowed ones, since a
+    submission holding the template winnows its words in other windows.
+    """
+    bands, _ = _hash_submissions([template])[0]
+    return np.union1d(bands, kgram_hashes([match.group().lower() for match in tokenize(template)], K_GRAM))
+
+
+def _bucket_pairs(items: List[np.ndarray], max_bucket_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Count the buckets each pair of submissions shares.
+    
+    Args:
+        items: Distinct uint64 hashes of each submission
+        max_bucket_size: Buckets with more submissions than this are ignored
+    
+    Returns:
+        Pair keys (first * submissions + second, first < second) and the number
+        of shared buckets of each
+    """
+    if not items:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    owners = np.repeat(np.arange(len(items), dtype=np.int64), [len(hashes) for hashes in items])
+    values = np.concatenate(items)
+    order = np.argsort(values, kind="stable")
+    values = values[order]
+    owners = owners[order]
+    
+    boundaries = np.flatnonzero(values[1:] != values[:-1]) + 1
+    starts = np.concatenate(([0], boundaries))
+    sizes = np.diff(np.concatenate((starts, [len(values)])))
+    
+    keys = []
+    for size in np.unique(sizes[(sizes >= 2) & (sizes <= max_bucket_size)]):
+        firsts, seconds = np.triu_indices(size, 1)
+        bucket_starts = starts[sizes == size]
+        step = max(1, PAIR_CHUNK_SIZE // len(firsts))
+        for chunk in range(0, len(bucket_starts), step):
+            # Owners are sorted within a bucket, so firsts are the smaller numbers
+            chunk_starts = bucket_starts[chunk:chunk + step, None]
+            keys.append(owners[chunk_starts + firsts] * len(items) + owners[chunk_starts + seconds])
+    
+    if not keys:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.unique(np.concatenate([key.ravel() for key in keys]), return_counts=True)
+
+
+def candidate_pairs(texts: List[str], pool: Any = None, max_bucket_size: int = MAX_BUCKET_SIZE,
+                    template: Optional[str] = None) -> List[Tuple[int, int]]:
+    """
+    Find the pairs of submissions worth aligning.
+    
+    Args:
+        texts: The submission texts
+        pool: Optional multiprocessing pool to hash on
+        max_bucket_size: Buckets with more submissions than this are ignored
+        template: Text given to every student, whose buckets are not counted
+    
+    Returns:
+        (first, second) submission numbers, first < second, in order
+    """
+    batches = [texts[start:start + HASH_BATCH_SIZE] for start in range(0, len(texts), HASH_BATCH_SIZE)]
+    hashed = [entry for batch in (pool.imap(_hash_submissions, batches) if pool else map(_hash_submissions, batches))
+              for entry in batch]
+    # Band items and fingerprints share one bucket space; they collide only by chance
+    items = [np.union1d(bands, prints) for bands, prints in hashed]
+    if template:
+        # Batches no larger than max_bucket_size would otherwise pair every submission through it
+        shared = _hash_template(template)
+        items = [np.setdiff1d(hashes, shared, assume_unique=True) for hashes in items]
+    keys, hits = _bucket_pairs(items, max_bucket_size)
+    keys = keys[hits >= MIN_CANDIDATE_HITS]
+    return [(int(key) // len(texts), int(key) % len(texts)) for key in keys]
+
+
+def _init_worker(template: Optional[str]) -> None:
+    """Build the template's suffix automaton in a worker process."""
+    global _template_automaton
+    _template_automaton = (SuffixAutomaton([match.group().lower() for match in tokenize(template)])
+                           if template else None)
+
+
+def _template_mask(words: List[str], min_words: int) -> List[bool]:
+    """Mark the words that belong to a run shared with the template."""
+    mask = [False] * len(words)
+    if _template_automaton is not None:
+        for start, end, _, _ in common_runs(words, _template_automaton, min_words):
+            mask[start:end] = [True] * (end - start)
+    return mask
+
+
+def _align_group(task: AlignTask) -> List[Edge]:
+    """
+    Align one submission against several others.
+    
+    Args:
+        task: The submission and the others to align it with
+    
+    Returns:
+        An edge per other submission with shared passages
+    """
+    source_number, source, others, min_words = task
+    source_matches = tokenize(source)
+    source_words = [match.group().lower() for match in source_matches]
+    automaton = SuffixAutomaton(source_words)
+    source_mask = _template_mask(source_words, min_words)
+    
+    results = []
+    for number, text in others:
+        matches = tokenize(text)
+        words = [match.group().lower() for match in matches]
+        mask = _template_mask(words, min_words)
+        
+        aligned = []
+        for start, end, source_start, source_end in common_runs(words, automaton, min_words):
+            # Runs are exact copies, so both sides are trimmed alike
+            while start < end and (mask[start] or source_mask[source_start]):
+                start += 1
+                source_start += 1
+            while start < end and (mask[end - 1] or source_mask[source_end - 1]):
+                end -= 1
+                source_end -= 1
+            if end - start >= min_words:
+                aligned.append((source_matches[source_start].start(), source_matches[source_end - 1].end(),
+                                matches[start].start(), matches[end - 1].end()))
+        
+        if aligned:
+            aligned = merge_matches(aligned)
+            shared = covered_length(merge_intervals([match[:2] for match in aligned])) / len(source)
+            other_shared = covered_length(merge_intervals([match[2:] for match in aligned])) / len(text)
+            results.append((source_number, number, shared, other_shared, aligned))
+    return results
+
+
+def _iter_tasks(texts: List[str], pairs: List[Tuple[int, int]], min_words: int) -> Iterator[AlignTask]:
+    """Group candidate pairs by their first submission, so each automaton is built once."""
+    grouped: Dict[int, List[int]] = defaultdict(list)
+    for first, second in pairs:
+        grouped[first].append(second)
+    for first in sorted(grouped):
+        yield first, texts[first], [(second, texts[second]) for second in grouped[first]], min_words
+
+
+def find_clusters(count: int, edges: List[Tuple[int, int]]) -> List[List[int]]:
+    """
+    Group nodes connected by edges, with union-find.
+    
+    Args:
+        count: Number of nodes
+        edges: (node, node) edges
+    
+    Returns:
+        Components of at least two nodes, each sorted, largest first
+    """
+    parents = list(range(count))
+    
+    def root(node: int) -> int:
+        while parents[node] != node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+        return node
+    
+    for first, second in edges:
+        first_root, second_root = root(first), root(second)
+        if first_root != second_root:
+            parents[max(first_root, second_root)] = min(first_root, second_root)
+    
+    components: Dict[int, List[int]] = defaultdict(list)
+    for node in range(count):
+        components[root(node)].append(node)
+    return sorted((nodes for nodes in components.values() if len(nodes) > 1), key=lambda nodes: (-len(nodes), nodes[0]))
+
+
+def find_collusion(submissions: Iterable[Dict[str, Any]], min_similarity: float = DEFAULT_MIN_SIMILARITY,
+                   min_words: int = DEFAULT_MIN_WORDS, template: Optional[str] = None,
+                   workers: int = 1) -> Dict[str, Any]:
+    """
+    Find the pairs and clusters of submissions that share passages.
+    
+    Args:
+        submissions: Dictionaries with text and optionally id and title, e.g. from
+            plagiarism.documents.iter_documents
+        min_similarity: Share of either text that must be shared for a pair to
+            be reported
+        min_words: Shortest shared run of words counted
+        template: Text given to every student, not counted when shared
+        workers: Number of worker processes (1 to work in this process)
+    
+    Returns:
+        Dictionary with the submissions (id and title), the number of candidate
+        pairs aligned, the pairs found with their similarity (the larger share
+        of the two texts) and matching passages, most similar first, the
+        clusters of submissions connected by those pairs, and the elapsed seconds
+    """
+    start_time = time.perf_counter()
+    submissions = list(submissions)
+    texts = [submission.get("text") or "" for submission in submissions]
+    ids = [str(submission.get("id", number)) for number, submission in enumerate(submissions)]
+    
+    pool = Pool(workers, _init_worker, (template,)) if workers > 1 else None
+    if pool is None:
+        _init_worker(template)
+    try:
+        pairs = candidate_pairs(texts, pool, template=template)
+        tasks = _iter_tasks(texts, pairs, min_words)
+        groups = (map_bounded(pool, _align_group, tasks, workers * PENDING_TASKS_PER_WORKER) if pool
+                  else map(_align_group, tasks))
+        edges = [edge for group in groups for edge in group if max(edge[2], edge[3]) >= min_similarity]
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    
+    edges.sort(key=lambda edge: (-max(edge[2], edge[3]), edge[0], edge[1]))
+    components = find_clusters(len(texts), [edge[:2] for edge in edges])
+    component_of = {node: position for position, nodes in enumerate(components) for node in nodes}
+    clusters = [{"members": [ids[node] for node in nodes], "pairs": 0, "maxSimilarity": 0.0} for nodes in components]
+    for first, _, shared, other_shared, _ in edges:
+        cluster = clusters[component_of[first]]
+        cluster["pairs"] += 1
+        cluster["maxSimilarity"] = max(cluster["maxSimilarity"], shared, other_shared)
+    
+    return {
+        "submissions": [{"id": ids[number], "title": submission.get("title") or ids[number]}
+                        for number, submission in enumerate(submissions)],
+        "candidatePairs": len(pairs),
+        "pairs": [
+            {
+                "first": ids[first],
+                "second": ids[second],
+                "similarity": max(shared, other_shared),
+                "firstShared": shared,
+                "secondShared": other_shared,
+                "matches": [
+                    {"firstStart": first_start, "firstEnd": first_end,
+                     "secondStart": second_start, "secondEnd": second_end}
+                    for first_start, first_end, second_start, second_end in matches
+                ]
+            }
+            for first, second, shared, other_shared, matches in edges
+        ],
+        "clusters": clusters,
+        "seconds": time.perf_counter() - start_time
+    }
+
+
+def check_collusion(paths: List[str], template_path: Optional[str] = None,
+                    min_similarity: float = DEFAULT_MIN_SIMILARITY, workers: int = 1) -> Dict[str, Any]:
+    """
+    Find collusion among the submissions in document files or directories.
+    
+    Args:
+        paths: Document files (.txt, .html, .jsonl, optionally .gz) or directories
+        template_path: Optional file with text given to every student
+        min_similarity: Share of either text that must be shared for a pair to be reported
+        workers: Number of worker processes
+    
+    Returns:
+        The result of find_collusion()
+    """
+    template = None
+    if template_path:
+        template = "\n\n".join(document["text"] for document in iter_documents(template_path))
+    submissions = (document for path in paths for document in iter_documents(path))
+    return find_collusion(submissions, min_similarity, template=template, workers=workers)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Command-line entry point.
+    
+    Args:
+        argv: Command-line arguments (defaults to sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Find submissions that share passages with each other")
+    parser.add_argument("documents", nargs="+", help="Submission files (.txt, .html, .jsonl, optionally .gz) or directories")
+    parser.add_argument("--template", default=None, help="File with text given to every student, such as the prompt")
+    parser.add_argument("--min_similarity", type=float, default=DEFAULT_MIN_SIMILARITY,
+                        help="Share of either text that must be shared for a pair to be reported")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("--output", default=None, help="Write the similarity graph to this JSON file")
+    args = parser.parse_args(argv)
+    
+    result = check_collusion(args.documents, args.template, args.min_similarity, args.workers)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+    
+    print(f"Checked {len(result['submissions'])} submissions in {result['seconds']:.1f} s "
+          f"({result['candidatePairs']} candidate pairs aligned): "
+          f"{len(result['pairs'])} pairs in {len(result['clusters'])} clusters")
+    for cluster in result["clusters"]:
+        print(f"  {cluster['maxSimilarity']:4.0%}  {', '.join(cluster['members'])}")
+
+
+if __name__ == "__main__":
+    main()
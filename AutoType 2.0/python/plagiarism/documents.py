@@ -0,0 +1,169 @@
+"""
+Reference documents module for AutoType.
+This module reads reference documents for the plagiarism index.
+
+Documents come from .txt and .html files (one document each) or .jsonl files
+(one JSON object per line with "text" and optionally "id", "title" and "url"),
+any of them optionally gzipped, or from a directory searched recursively for
+them. Files are streamed, so dumps larger than memory can be read.
+"""
+
+import gzip
+import json
+import os
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterator, List, TextIO
+
+
+DOCUMENT_EXTENSIONS = (".txt", ".jsonl", ".html", ".htm")
+COMPRESSED_EXTENSION = ".gz"
+
+# Elements whose content is not document text
+SKIPPED_HTML_ELEMENTS = {"script", "style", "head", "noscript", "template"}
+
+# Elements that end a line of text
+BLOCK_HTML_ELEMENTS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article",
+                       "blockquote", "pre", "title"}
+
+WHITESPACE_RUN_PATTERN = re.compile(r'[ \t\r\f\v]+')
+BLANK_LINES_PATTERN = re.compile(r'\n\s*\n+')
+
+
+class _HTMLTextExtractor(HTMLParser):
+    """Collects the visible text and the title of an HTML document."""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.title = ""
+        self._skipping = 0
+        self._in_title = False
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_HTML_ELEMENTS:
+            self._skipping += 1
+        if tag == "title":
+            self._in_title = True
+        elif tag in BLOCK_HTML_ELEMENTS:
+            self.parts.append("\n")
+    
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_HTML_ELEMENTS and self._skipping:
+            self._skipping -= 1
+        if tag == "title":
+            self._in_title = False
+        elif tag in BLOCK_HTML_ELEMENTS:
+            self.parts.append("\n")
+    
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._skipping:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> Dict[str, str]:
+    """
+    Extract the visible text of an HTML document.
+    
+    Args:
+        html: The HTML source
+    
+    Returns:
+        Dictionary with the text and the title (empty if there is none)
+    """
+    extractor = _HTMLTextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    text = WHITESPACE_RUN_PATTERN.sub(" ", "".join(extractor.parts))
+    text = BLANK_LINES_PATTERN.sub("\n\n", "\n".join(line.strip() for line in text.split("\n")))
+    return {"text": text.strip(), "title": extractor.title.strip()}
+
+
+def is_document_file(name: str) -> bool:
+    """
+    Check whether a file name is that of a document file.
+    
+    Args:
+        name: The file name
+    
+    Returns:
+        True for document files, gzipped or not
+    """
+    if name.endswith(COMPRESSED_EXTENSION):
+        name = name[:-len(COMPRESSED_EXTENSION)]
+    return name.endswith(DOCUMENT_EXTENSIONS)
+
+
+def iter_documents(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream reference documents from a file or directory.
+    
+    Args:
+        path: A document file, or a directory searched recursively for them
+    
+    Yields:
+        Dictionaries with id, text, title and url
+    """
+    if os.path.isdir(path):
+        for root, directories, files in os.walk(path):
+            directories.sort()
+            for name in sorted(files):
+                if is_document_file(name):
+                    file_path = os.path.join(root, name)
+                    yield from iter_file(file_path, os.path.relpath(file_path, path))
+    else:
+        yield from iter_file(path, os.path.basename(path))
+
+
+def _open_text(path: str) -> TextIO:
+    """Open a possibly gzipped file for reading text."""
+    if path.endswith(COMPRESSED_EXTENSION):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def iter_file(path: str, name: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the documents of one file.
+    
+    Args:
+        path: Path to the file
+        name: Name used to build document IDs
+    
+    Yields:
+        Dictionaries with id, text, title and url
+    """
+    url = "file://" + os.path.abspath(path)
+    kind = path[:-len(COMPRESSED_EXTENSION)] if path.endswith(COMPRESSED_EXTENSION) else path
+    
+    if kind.endswith(".jsonl"):
+        with _open_text(path) as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                document_id = str(record.get("id", f"{name}:{line_number}"))
+                text = record.get("text", "")
+                title = record.get("title")
+                if record.get("html"):
+                    extracted = html_to_text(record["html"])
+                    text = text or extracted["text"]
+                    title = title or extracted["title"]
+                yield {
+                    "id": document_id,
+                    "text": text,
+                    "title": title or document_id,
+                    "url": record.get("url") or f"{url}#{line_number}",
+                }
+        return
+    
+    with _open_text(path) as f:
+        content = f.read()
+    
+    if kind.endswith((".html", ".htm")):
+        extracted = html_to_text(content)
+        yield {"id": name, "text": extracted["text"], "title": extracted["title"] or os.path.basename(kind), "url": url}
+    else:
+        yield {"id": name, "text": content, "title": os.path.basename(kind), "url": url}
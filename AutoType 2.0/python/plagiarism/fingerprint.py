@@ -0,0 +1,138 @@
+"""
+Fingerprint module for AutoType.
+This module turns text into winnowed k-gram hash fingerprints for plagiarism search.
+
+The text is split into words, each run of K_GRAM words is hashed, and winnowing
+keeps the smallest hash of every window of WINDOW consecutive k-grams. Any
+passage shared by two texts that is at least K_GRAM + WINDOW - 1 words long is
+guaranteed to produce a common fingerprint, while only about 2 / (WINDOW + 1) of
+the k-grams are kept. Each fingerprint remembers the character span of its
+k-gram, so matches can be mapped back onto the text.
+"""
+
+import hashlib
+import re
+from functools import lru_cache
+from typing import List, NamedTuple
+
+import numpy as np
+
+
+# Words per k-gram, and k-grams per winnowing window
+K_GRAM = 5
+WINDOW = 4
+
+# Words; case and punctuation are ignored when matching
+WORD_PATTERN = re.compile(r'\w+')
+
+# Multiplier of the rolling k-gram hash (the 64-bit FNV prime)
+HASH_BASE = np.uint64(1099511628211)
+
+# Distinct words whose hashes are kept
+WORD_HASH_CACHE_SIZE = 1 << 18
+
+
+class Fingerprints(NamedTuple):
+    """Winnowed fingerprints of a text, as parallel arrays."""
+    hashes: np.ndarray   # uint64 k-gram hashes
+    starts: np.ndarray   # uint32 character offset where each k-gram starts
+    ends: np.ndarray     # uint32 character offset where each k-gram ends
+
+
+@lru_cache(maxsize=WORD_HASH_CACHE_SIZE)
+def word_hash(word: str) -> int:
+    """
+    Get the stable 64-bit hash of a word.
+    
+    Args:
+        word: A lowercase word
+    
+    Returns:
+        The hash, the same in every process and on every run
+    """
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def tokenize(text: str) -> List[re.Match]:
+    """
+    Split text into words.
+    
+    Args:
+        text: The text to split
+    
+    Returns:
+        Word matches, with their character offsets
+    """
+    return list(WORD_PATTERN.finditer(text))
+
+
+def kgram_hashes(words: List[str], k: int = K_GRAM) -> np.ndarray:
+    """
+    Hash every run of k consecutive words.
+    
+    Args:
+        words: Lowercase words
+        k: Words per k-gram
+    
+    Returns:
+        uint64 array with one hash per k-gram (empty if there are fewer than k words)
+    """
+    count = len(words) - k + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.uint64)
+    
+    hashes = np.fromiter((word_hash(word) for word in words), dtype=np.uint64, count=len(words))
+    result = np.zeros(count, dtype=np.uint64)
+    for offset in range(k):
+        # uint64 arithmetic wraps around, which is what a rolling hash wants
+        result = result * HASH_BASE + hashes[offset:offset + count]
+    return result
+
+
+def winnow(hashes: np.ndarray, window: int = WINDOW) -> np.ndarray:
+    """
+    Select k-grams by winnowing.
+    
+    The rightmost smallest hash of each window is selected; a k-gram selected by
+    several consecutive windows is reported once.
+    
+    Args:
+        hashes: k-gram hashes
+        window: Number of k-grams per window
+    
+    Returns:
+        Sorted indices of the selected k-grams
+    """
+    if len(hashes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    if len(hashes) <= window:
+        reversed_position = int(np.argmin(hashes[::-1]))
+        return np.array([len(hashes) - 1 - reversed_position], dtype=np.int64)
+    
+    windows = np.lib.stride_tricks.sliding_window_view(hashes, window)
+    positions = np.arange(len(windows)) + (window - 1 - np.argmin(windows[:, ::-1], axis=1))
+    # Positions never decrease, so duplicates are neighbours
+    keep = np.ones(len(positions), dtype=bool)
+    keep[1:] = positions[1:] != positions[:-1]
+    return positions[keep]
+
+
+def fingerprint(text: str, k: int = K_GRAM, window: int = WINDOW) -> Fingerprints:
+    """
+    Compute the winnowed fingerprints of a text.
+    
+    Args:
+        text: The text to fingerprint
+        k: Words per k-gram
+        window: Number of k-grams per winnowing window
+    
+    Returns:
+        The fingerprints, in text order
+    """
+    matches = tokenize(text)
+    hashes = kgram_hashes([match.group().lower() for match in matches], k)
+    selected = winnow(hashes, window)
+    
+    starts = np.fromiter((match.start() for match in matches), dtype=np.uint32, count=len(matches))
+    ends = np.fromiter((match.end() for match in matches), dtype=np.uint32, count=len(matches))
+    return Fingerprints(hashes[selected], starts[selected], ends[selected + k - 1])
@@ -0,0 +1,616 @@
+"""
+Reference index module for AutoType.
+This module builds and searches the local fingerprint index of reference documents.
+
+Usage:
+    python -m plagiarism.index <documents> [<index_dir>] [--paraphrases]
+
+An index is a directory holding a manifest and immutable segments:
+
+    manifest.json           format, k-gram, window and MinHash parameters,
+                            whether paraphrases are searched, the list of live
+                            segments, and a version that changes whenever the
+                            list does
+    segments/<name>/        one segment per directory (see plagiarism.segment)
+
+Segments are written next to the live ones and only become visible when the
+manifest is replaced, which is atomic, so readers never see a partial segment and
+never wait for writers. New documents are added as new segments (see
+plagiarism.ingest); compaction merges small segments into one. Segments dropped
+from the manifest are deleted after a grace period, so queries still using them
+can finish.
+
+Looking up a fingerprint is a binary search in each segment's sorted hashes.
+Documents sharing fingerprints with the query are candidates, as are documents
+whose passages collide with the query's in the MinHash bands (see
+plagiarism.minhash), which finds lightly edited copies. Only the candidates are
+aligned with the query (see plagiarism.alignment). Indexes created with
+paraphrases=True can also find reworded passages, by comparing TF-IDF vectors of
+the query's paragraphs with those of the reference passages sharing their rarer
+features (see plagiarism.tfidf). The passage vectors take several times the
+space of the fingerprints, so they are opt-in.
+
+Segments are searched in parallel on a shared thread pool; the lookups are numpy
+binary searches over memory-mapped arrays, which release the GIL. A segment
+whose bloom filter holds none of the query's hashes is skipped, and the sorted
+candidates of each segment are merged with a heap.
+"""
+
+import bisect
+import heapq
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+import numpy as np
+
+from .alignment import TextAligner, covered_length, merge_intervals
+from .fingerprint import K_GRAM, WINDOW, Fingerprints, fingerprint
+from .minhash import DEFAULT_BANDS, DEFAULT_ROWS, MinHasher
+from .segment import Segment, SegmentWriter, prepare_document, prepare_query
+from .tfidf import DEFAULT_MIN_SIMILARITY, DEFAULT_TOP_K, vectorize_paragraphs
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; writers are not serialized there
+    fcntl = None
+
+
+INDEX_FORMAT = 3
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "index")
+
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = "manifest.lock"
+SEGMENTS_DIRECTORY = "segments"
+
+# Segments being written end with this until they are complete
+TEMPORARY_SUFFIX = ".tmp"
+
+# Sources reported per query
+DEFAULT_MAX_SOURCES = 10
+
+# Documents found only through MinHash that are aligned per query
+MAX_NEAR_CANDIDATES = 20
+
+# Compaction merges segments with fewer documents than this
+SMALL_SEGMENT_DOCUMENTS = 10_000
+
+# Seconds a segment dropped from the manifest is kept for queries still using it
+RETIRED_SEGMENT_GRACE = 600.0
+
+# Threads searching the segments of one query
+DEFAULT_QUERY_WORKERS = os.cpu_count() or 1
+
+T = TypeVar("T")
+
+# Query thread pools by number of workers, shared by all indexes
+_query_pools: Dict[int, ThreadPoolExecutor] = {}
+_query_pools_lock = threading.Lock()
+
+
+def get_query_pool(workers: int = DEFAULT_QUERY_WORKERS) -> ThreadPoolExecutor:
+    """
+    Get the shared thread pool that searches index segments.
+    
+    Args:
+        workers: Number of threads
+    
+    Returns:
+        The thread pool, created on first use
+    """
+    with _query_pools_lock:
+        pool = _query_pools.get(workers)
+        if pool is None:
+            pool = _query_pools[workers] = ThreadPoolExecutor(workers, thread_name_prefix="plagiarism-query")
+        return pool
+
+
+def index_parameters(k: int = K_GRAM, window: int = WINDOW, bands: int = DEFAULT_BANDS,
+                     rows: int = DEFAULT_ROWS, paraphrases: bool = False) -> Dict[str, Any]:
+    """
+    Get the parameters every segment of an index is built with.
+    
+    Args:
+        k: Words per k-gram
+        window: Number of k-grams per winnowing window
+        bands: Number of MinHash bands
+        rows: Rows per MinHash band
+        paraphrases: Whether to store TF-IDF passages for paraphrase search
+    
+    Returns:
+        Dictionary with k, window, lsh and paraphrases
+    """
+    return {"k": k, "window": window, "lsh": MinHasher(bands, rows).header(), "paraphrases": paraphrases}
+
+
+def segment_parameters(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Get the parameters new segments of an index are built with.
+    
+    Args:
+        manifest: The index manifest
+    
+    Returns:
+        Dictionary with k, window, lsh and paraphrases
+    """
+    parameters = {key: manifest[key] for key in ("k", "window", "lsh")}
+    # Indexes created before paraphrase search was optional always stored passages
+    parameters["paraphrases"] = manifest.get("paraphrases", True)
+    return parameters
+
+
+def read_manifest(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Read the manifest of an index.
+    
+    Args:
+        path: Index directory
+    
+    Returns:
+        The manifest, or None if there is no index at path
+    
+    Raises:
+        ValueError: If the manifest is unreadable or of an unsupported format
+    """
+    try:
+        with open(os.path.join(path, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Unreadable plagiarism index manifest at {path}: {e}")
+    
+    if manifest.get("format") != INDEX_FORMAT:
+        raise ValueError(f"Unsupported plagiarism index format: {manifest.get('format')}")
+    return manifest
+
+
+def _write_manifest(path: str, manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """Give the manifest a new version and replace the current one atomically."""
+    manifest["version"] = uuid.uuid4().hex
+    manifest["updated"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    manifest["documents"] = sum(segment["documents"] for segment in manifest["segments"])
+    
+    temporary_path = os.path.join(path, MANIFEST_NAME + TEMPORARY_SUFFIX)
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temporary_path, os.path.join(path, MANIFEST_NAME))
+    return manifest
+
+
+@contextmanager
+def _manifest_lock(path: str) -> Iterator[None]:
+    """Serialize manifest updates between writer processes."""
+    with open(os.path.join(path, LOCK_NAME), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def create_index(path: str = DEFAULT_INDEX_PATH, k: int = K_GRAM, window: int = WINDOW,
+                 bands: int = DEFAULT_BANDS, rows: int = DEFAULT_ROWS, paraphrases: bool = False) -> Dict[str, Any]:
+    """
+    Create an empty index, unless one already exists.
+    
+    Args:
+        path: Index directory
+        k: Words per k-gram
+        window: Number of k-grams per winnowing window
+        bands: Number of MinHash bands
+        rows: Rows per MinHash band
+        paraphrases: Whether to store TF-IDF passages for paraphrase search
+    
+    Returns:
+        The manifest of the new or existing index
+    """
+    os.makedirs(os.path.join(path, SEGMENTS_DIRECTORY), exist_ok=True)
+    with _manifest_lock(path):
+        manifest = read_manifest(path)
+        if manifest is None:
+            manifest = {"format": INDEX_FORMAT, "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "segments": [],
+                        "retired": []}
+            manifest.update(index_parameters(k, window, bands, rows, paraphrases))
+            manifest = _write_manifest(path, manifest)
+    return manifest
+
+
+def new_segment_writer(path: str, manifest: Dict[str, Any]) -> SegmentWriter:
+    """
+    Start writing a segment of an index.
+    
+    The segment is written under a temporary name and stays invisible until it
+    is passed to publish_segment.
+    
+    Args:
+        path: Index directory
+        manifest: The index manifest, for its parameters
+    
+    Returns:
+        The segment writer
+    """
+    # Names sort by creation time
+    name = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+    return SegmentWriter(os.path.join(path, SEGMENTS_DIRECTORY, name + TEMPORARY_SUFFIX), segment_parameters(manifest))
+
+
+def publish_segment(path: str, writer: SegmentWriter, replaces: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Finish a segment and make it visible to new queries.
+    
+    Args:
+        path: Index directory
+        writer: Writer from new_segment_writer
+        replaces: Names of segments whose documents the new segment holds; it takes
+            the place of the first of them
+    
+    Returns:
+        The new manifest
+    
+    Raises:
+        ValueError: If a segment to replace is no longer live
+    """
+    header = writer.close()
+    final_path = writer.path[:-len(TEMPORARY_SUFFIX)]
+    os.replace(writer.path, final_path)
+    entry = {"name": os.path.basename(final_path), "documents": header["documents"],
+             "fingerprints": header["fingerprints"]}
+    
+    with _manifest_lock(path):
+        manifest = read_manifest(path)
+        names = [segment["name"] for segment in manifest["segments"]]
+        replaces = replaces or []
+        missing = [name for name in replaces if name not in names]
+        if missing:
+            shutil.rmtree(final_path, ignore_errors=True)
+            raise ValueError(f"Segments are no longer live: {', '.join(missing)}")
+        
+        if replaces:
+            position = names.index(replaces[0])
+            kept = [segment for segment in manifest["segments"] if segment["name"] not in replaces]
+            manifest["segments"] = kept[:position] + [entry] + kept[position:]
+            manifest["retired"].extend({"name": name, "retired": time.time()} for name in replaces)
+        else:
+            manifest["segments"].append(entry)
+        return _write_manifest(path, manifest)
+
+
+def remove_retired_segments(path: str, grace: float = RETIRED_SEGMENT_GRACE) -> List[str]:
+    """
+    Delete segments that left the manifest more than grace seconds ago.
+    
+    Args:
+        path: Index directory
+        grace: Seconds to keep retired segments for running queries
+    
+    Returns:
+        Names of the deleted segments
+    """
+    now = time.time()
+    with _manifest_lock(path):
+        manifest = read_manifest(path)
+        expired = [segment["name"] for segment in manifest["retired"] if now - segment["retired"] >= grace]
+        if expired:
+            manifest["retired"] = [segment for segment in manifest["retired"] if segment["name"] not in expired]
+            _write_manifest(path, manifest)
+    
+    for name in expired:
+        # Open memory maps keep the files alive on POSIX; elsewhere deletion may fail until they close
+        shutil.rmtree(os.path.join(path, SEGMENTS_DIRECTORY, name), ignore_errors=True)
+    return expired
+
+
+def compact(path: str = DEFAULT_INDEX_PATH, small_documents: int = SMALL_SEGMENT_DOCUMENTS,
+            grace: float = RETIRED_SEGMENT_GRACE) -> Optional[Dict[str, Any]]:
+    """
+    Merge the small segments of an index into one.
+    
+    Queries keep using the old segments until the merged one is published.
+    
+    Args:
+        path: Index directory
+        small_documents: Segments with fewer documents than this are merged
+        grace: Seconds to keep the merged segments for running queries
+    
+    Returns:
+        The new manifest, or None if there were fewer than two small segments
+    """
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise ValueError(f"No plagiarism index at {path}")
+    
+    small = [segment["name"] for segment in manifest["segments"] if segment["documents"] < small_documents]
+    manifest_after = None
+    if len(small) >= 2:
+        writer = new_segment_writer(path, manifest)
+        for name in small:
+            writer.add_segment(Segment(os.path.join(path, SEGMENTS_DIRECTORY, name)))
+        manifest_after = publish_segment(path, writer, replaces=small)
+    
+    remove_retired_segments(path, grace)
+    return manifest_after
+
+
+def start_background_compaction(path: str = DEFAULT_INDEX_PATH, small_documents: int = SMALL_SEGMENT_DOCUMENTS,
+                                grace: float = RETIRED_SEGMENT_GRACE) -> threading.Thread:
+    """
+    Compact an index on a background thread.
+    
+    Args:
+        path: Index directory
+        small_documents: Segments with fewer documents than this are merged
+        grace: Seconds to keep the merged segments for running queries
+    
+    Returns:
+        The started thread
+    """
+    thread = threading.Thread(target=compact, args=(path, small_documents, grace), daemon=True)
+    thread.start()
+    return thread
+
+
+def build_index(documents: Iterable[Dict[str, Any]], path: str = DEFAULT_INDEX_PATH,
+                k: int = K_GRAM, window: int = WINDOW, bands: int = DEFAULT_BANDS,
+                rows: int = DEFAULT_ROWS, paraphrases: bool = False) -> Dict[str, Any]:
+    """
+    Build an index of reference documents as one segment, replacing any index at path.
+    
+    Large corpora are better added with plagiarism.ingest, which fingerprints in
+    parallel and writes several segments.
+    
+    Args:
+        documents: Dictionaries with text and optionally id, title and url
+        path: Index directory
+        k: Words per k-gram
+        window: Number of k-grams per winnowing window
+        bands: Number of MinHash bands
+        rows: Rows per MinHash band
+        paraphrases: Whether to store TF-IDF passages for paraphrase search
+    
+    Returns:
+        The index manifest
+    """
+    temporary_path = path + TEMPORARY_SUFFIX
+    shutil.rmtree(temporary_path, ignore_errors=True)
+    manifest = create_index(temporary_path, k, window, bands, rows, paraphrases)
+    
+    writer = new_segment_writer(temporary_path, manifest)
+    for number, document in enumerate(documents):
+        writer.add(prepare_document(dict(document, id=document.get("id", number)), writer.parameters))
+    manifest = publish_segment(temporary_path, writer)
+    
+    # Swap the new index in
+    if os.path.exists(path):
+        old_path = path + ".old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        os.replace(path, old_path)
+        os.replace(temporary_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        os.replace(temporary_path, path)
+    
+    return manifest
+
+
+class ReferenceIndex:
+    """A snapshot of the live segments of a plagiarism index."""
+    
+    def __init__(self, path: str = DEFAULT_INDEX_PATH, previous: Optional["ReferenceIndex"] = None,
+                 workers: int = DEFAULT_QUERY_WORKERS):
+        """
+        Args:
+            path: Index directory
+            previous: An older snapshot of the same index, whose open segments are reused
+            workers: Number of threads searching segments in parallel (1 to search in the calling thread)
+        
+        Raises:
+            ValueError: If the directory does not hold a supported index
+        """
+        self.path = os.path.abspath(path)
+        manifest = read_manifest(path)
+        if manifest is None:
+            raise ValueError(f"No plagiarism index at {path}")
+        self.manifest = manifest
+        self.k = manifest["k"]
+        self.window = manifest["window"]
+        self.hasher = MinHasher(manifest["lsh"]["bands"], manifest["lsh"]["rows"], manifest["lsh"]["seed"])
+        self.workers = workers
+        
+        reusable = {segment.name: segment for segment in previous.segments} if previous else {}
+        self.segments = [reusable.get(entry["name"]) or Segment(os.path.join(path, SEGMENTS_DIRECTORY, entry["name"]))
+                         for entry in manifest["segments"]]
+        
+        # Global number of the first document of each segment
+        self._bases = [0]
+        for segment in self.segments:
+            self._bases.append(self._bases[-1] + len(segment))
+    
+    @property
+    def version(self) -> str:
+        """Identifier that changes whenever the live segments change."""
+        return self.manifest["version"]
+    
+    def __len__(self) -> int:
+        return self._bases[-1]
+    
+    def _locate(self, number: int) -> Tuple[Segment, int]:
+        """Get the segment holding a document and the document's number in it."""
+        position = bisect.bisect_right(self._bases, number) - 1
+        return self.segments[position], number - self._bases[position]
+    
+    def document(self, number: int) -> Dict[str, Any]:
+        """
+        Get the metadata of a document.
+        
+        Args:
+            number: Document number in the index
+        
+        Returns:
+            Dictionary with id, title and url
+        """
+        segment, local = self._locate(number)
+        return segment.document(local)
+    
+    def document_text(self, number: int) -> str:
+        """
+        Get the text of a document.
+        
+        Args:
+            number: Document number in the index
+        
+        Returns:
+            The document text
+        """
+        segment, local = self._locate(number)
+        return segment.document_text(local)
+    
+    def _map_segments(self, function: Callable[[int], T]) -> List[T]:
+        """Call a function with the position of every segment, on the query pool if there are several."""
+        positions = range(len(self.segments))
+        if self.workers > 1 and len(self.segments) > 1:
+            return list(get_query_pool(self.workers).map(function, positions))
+        return [function(position) for position in positions]
+    
+    def fingerprint_hits(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Test which fingerprint hashes occur in any segment, without looking up their documents.
+        
+        Args:
+            hashes: Query fingerprint hashes
+        
+        Returns:
+            Boolean array, True where a hash occurs in the index
+        """
+        hits = np.zeros(len(hashes), dtype=bool)
+        for found in self._map_segments(lambda position: self.segments[position].contains(hashes)):
+            hits |= found
+        return hits
+    
+    def candidates(self, text: str, max_candidates: int = DEFAULT_MAX_SOURCES,
+                   prints: Optional[Fingerprints] = None, bands: int = 0) -> List[Dict[str, Any]]:
+        """
+        Find the reference documents that may share passages with a text.
+        
+        Args:
+            text: The text to check
+            max_candidates: Maximum number of documents found through fingerprints;
+                up to MAX_NEAR_CANDIDATES more may be found through MinHash
+            prints: Fingerprints of the text, if already computed
+            bands: Number of MinHash bands to probe (0 for all)
+        
+        Returns:
+            One dictionary per document with the document number and the number
+            of matched fingerprints and MinHash bands
+        """
+        if prints is None:
+            prints = fingerprint(text, self.k, self.window)
+        query = prepare_query(text, prints, self.hasher, bands)
+        
+        def search_segment(position: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+            exact, near = self.segments[position].candidates(query, max_candidates, MAX_NEAR_CANDIDATES)
+            for candidate in exact + near:
+                candidate["document"] += self._bases[position]
+            return exact, near
+        
+        found = self._map_segments(search_segment)
+        
+        # Each segment's lists are already sorted, so only their heads are compared
+        exact = heapq.merge(*(segment_exact for segment_exact, _ in found),
+                            key=lambda candidate: -candidate["fingerprints"])
+        near = heapq.merge(*(segment_near for _, segment_near in found), key=lambda candidate: -candidate["bands"])
+        return list(islice(exact, max_candidates)) + list(islice(near, MAX_NEAR_CANDIDATES))
+    
+    def search(self, text: str, max_sources: int = DEFAULT_MAX_SOURCES,
+               prints: Optional[Fingerprints] = None, bands: int = 0) -> List[Dict[str, Any]]:
+        """
+        Find the reference documents that share passages with a text.
+        
+        Args:
+            text: The text to check
+            max_sources: Maximum number of documents to return
+            prints: Fingerprints of the text, if already computed
+            bands: Number of MinHash bands to probe (0 for all)
+        
+        Returns:
+            Candidates as from candidates() that share at least one passage, most
+            copied characters first, each with its merged "matches" as (query
+            start, query end, source start, source end) and the number of query
+            characters they cover as "covered"
+        """
+        aligner = TextAligner(text)
+        results = []
+        for candidate in self.candidates(text, max_sources, prints, bands):
+            matches = aligner.align(self.document_text(candidate["document"]))
+            if matches:
+                candidate["matches"] = matches
+                candidate["covered"] = covered_length(merge_intervals([match[:2] for match in matches]))
+                results.append(candidate)
+        
+        results.sort(key=lambda result: -result["covered"])
+        return results[:max_sources]
+    
+    def paraphrases(self, text: str, top_k: int = DEFAULT_TOP_K,
+                    min_similarity: float = DEFAULT_MIN_SIMILARITY) -> List[Dict[str, Any]]:
+        """
+        Find the reference passages most similar to each paragraph of a text.
+        
+        Args:
+            text: The text to check
+            top_k: Maximum number of documents per paragraph
+            min_similarity: Lowest cosine similarity of the TF-IDF vectors reported
+        
+        Returns:
+            One dictionary per paragraph (or passage of a long paragraph) with
+            at least one match, with its start and end, and its "matches": the
+            document number, similarity and source start and end of each
+            matching passage, most similar first; none if the index holds no
+            TF-IDF passages
+        """
+        if all(segment.tfidf is None for segment in self.segments):
+            return []
+        query = vectorize_paragraphs(text)
+        
+        def search_segment(position: int) -> List[List[Dict[str, Any]]]:
+            found = self.segments[position].paraphrases(query, top_k, min_similarity)
+            for matches in found:
+                for match in matches:
+                    match["document"] += self._bases[position]
+            return found
+        
+        found = self._map_segments(search_segment)
+        results = []
+        for number, (start, end) in enumerate(query.spans):
+            matches = heapq.merge(*(segment_found[number] for segment_found in found),
+                                  key=lambda match: -match["similarity"])
+            matches = list(islice(matches, top_k))
+            if matches:
+                results.append({"start": int(start), "end": int(end), "matches": matches})
+        return results
+
+
+if __name__ == "__main__":
+    # Usage: python -m plagiarism.index <documents> [<index_dir>] [--paraphrases]
+    arguments = [argument for argument in sys.argv[1:] if argument != "--paraphrases"]
+    if not arguments:
+        print("Usage: python -m plagiarism.index <documents> [<index_dir>] [--paraphrases]")
+        sys.exit(1)
+    
+    from .documents import iter_documents
+    
+    output = arguments[1] if len(arguments) > 1 else DEFAULT_INDEX_PATH
+    print(json.dumps(build_index(iter_documents(arguments[0]), output,
+                                 paraphrases="--paraphrases" in sys.argv[1:]), indent=2))
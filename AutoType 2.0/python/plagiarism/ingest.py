@@ -0,0 +1,239 @@
+"""
+Ingestion module for AutoType.
+This module adds large document dumps to the plagiarism index.
+
+Usage:
+    python -m plagiarism.ingest add <documents>... [--index DIR] [--workers N] [--compact] [--paraphrases]
+    python -m plagiarism.ingest compact [--index DIR] [--small_documents N]
+
+Documents are streamed from the dumps (see plagiarism.documents) and
+fingerprinted in batches on a process pool, with only a few batches in flight
+per worker. Fingerprinted documents are written into a new segment that is
+published every segment_documents documents, or sooner once the arrays it keeps
+in memory reach segment_bytes, so memory stays flat however large the dump is.
+Queries see each published segment at once and are never blocked by ingestion
+or compaction.
+
+Documents whose ID is already in the index, or earlier in the same run, are
+skipped, so adding a dump again adds nothing. Documents already in the index
+are dropped before they are fingerprinted.
+"""
+
+import argparse
+import os
+import time
+from collections import deque
+from multiprocessing import Pool
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from .documents import iter_documents
+from .index import (DEFAULT_INDEX_PATH, RETIRED_SEGMENT_GRACE, SEGMENTS_DIRECTORY, SMALL_SEGMENT_DOCUMENTS, compact,
+                    create_index, new_segment_writer, publish_segment, segment_parameters)
+from .segment import DocumentEntry, Segment, document_key, prepare_batch
+
+
+# Documents fingerprinted per worker task
+DEFAULT_BATCH_SIZE = 256
+
+# Documents per published segment
+DEFAULT_SEGMENT_DOCUMENTS = 100_000
+
+# In-memory array bytes at which a segment is published early; writing it out
+# takes a few times this much
+DEFAULT_SEGMENT_BYTES = 256 * 1024 * 1024
+
+# Batches queued per worker process
+PENDING_BATCHES_PER_WORKER = 2
+
+
+def iter_batches(documents: Iterable[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Group a stream of documents into batches.
+    
+    Args:
+        documents: The documents
+        batch_size: Documents per batch
+    
+    Yields:
+        Lists of at most batch_size documents
+    """
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def map_bounded(pool: Any, func: Callable, items: Iterable[Any], max_pending: int) -> Iterator[Any]:
+    """
+    Map a function over items on a pool, in order, with a bounded number of items in flight.
+    
+    Pool.imap reads its whole input ahead of the workers; this reads only as far
+    as max_pending items ahead of the results consumed.
+    
+    Args:
+        pool: A multiprocessing pool
+        func: The function (must be picklable)
+        items: The items
+        max_pending: Maximum number of submitted items without a consumed result
+    
+    Yields:
+        The results, in item order
+    """
+    pending: Deque[Any] = deque()
+    for item in items:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def ingest(paths: List[str], index_path: str = DEFAULT_INDEX_PATH, workers: int = 1,
+           segment_documents: int = DEFAULT_SEGMENT_DOCUMENTS, batch_size: int = DEFAULT_BATCH_SIZE,
+           compact_after: bool = False, segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+           paraphrases: bool = False) -> Dict[str, Any]:
+    """
+    Add the documents of one or more dumps to an index, creating it if needed.
+    
+    Args:
+        paths: Document files or directories
+        index_path: Index directory
+        workers: Number of worker processes (1 to fingerprint in this process)
+        segment_documents: Documents per published segment
+        batch_size: Documents fingerprinted per worker task
+        compact_after: Whether to merge small segments when done
+        segment_bytes: In-memory array bytes at which a segment is published early
+        paraphrases: Whether a new index stores TF-IDF passages for paraphrase
+            search; an existing index keeps its setting
+    
+    Returns:
+        Dictionary with the number of documents added and skipped as already
+        indexed, the names of the new segments, the elapsed seconds and the
+        resulting manifest
+    """
+    start = time.perf_counter()
+    manifest = create_index(index_path, paraphrases=paraphrases)
+    parameters = segment_parameters(manifest)
+    
+    def open_segment(name: str) -> Segment:
+        return Segment(os.path.join(index_path, SEGMENTS_DIRECTORY, name))
+    
+    existing = [open_segment(segment["name"]) for segment in manifest["segments"]]
+    skipped = 0
+    
+    def documents() -> Iterator[Dict[str, Any]]:
+        nonlocal skipped
+        for path in paths:
+            for batch in iter_batches(iter_documents(path), batch_size):
+                # Drop documents the index already holds before fingerprinting them
+                keys = np.array([document_key(document["id"]) for document in batch], dtype=np.uint64)
+                indexed = np.zeros(len(batch), dtype=bool)
+                for segment in existing:
+                    indexed |= segment.contains_keys(keys)
+                skipped += int(indexed.sum())
+                yield from (document for document, seen in zip(batch, indexed) if not seen)
+    
+    batches = ((batch, parameters) for batch in iter_batches(documents(), batch_size))
+    added = 0
+    segments: List[str] = []
+    # Segments published by this run, to skip documents repeated in the dumps
+    published: List[Segment] = []
+    writer = None
+    
+    def publish() -> None:
+        nonlocal manifest, writer
+        manifest = publish_segment(index_path, writer)
+        segments.append(manifest["segments"][-1]["name"])
+        published.append(open_segment(segments[-1]))
+        writer = None
+    
+    def repeated(key: int) -> bool:
+        if writer is not None and writer.contains_key(key):
+            return True
+        keys = np.array([key], dtype=np.uint64)
+        return any(segment.contains_keys(keys)[0] for segment in published)
+    
+    pool = Pool(workers) if workers > 1 else None
+    try:
+        entries: Iterable[List[DocumentEntry]] = (
+            map_bounded(pool, prepare_batch, batches, workers * PENDING_BATCHES_PER_WORKER) if pool
+            else map(prepare_batch, batches))
+        for batch_entries in entries:
+            for entry in batch_entries:
+                if repeated(entry.key):
+                    skipped += 1
+                    continue
+                if writer is None:
+                    writer = new_segment_writer(index_path, manifest)
+                writer.add(entry)
+                added += 1
+                if len(writer) >= segment_documents or writer.nbytes >= segment_bytes:
+                    publish()
+        if writer is not None and len(writer):
+            publish()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    
+    if compact_after:
+        manifest = compact(index_path) or manifest
+    
+    return {"documents": added, "skipped": skipped, "segments": segments, "seconds": time.perf_counter() - start,
+            "manifest": manifest}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Command-line entry point.
+    
+    Args:
+        argv: Command-line arguments (defaults to sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Add documents to the AutoType plagiarism index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    add_parser = subparsers.add_parser("add", help="Add document dumps to the index")
+    add_parser.add_argument("documents", nargs="+", help="Document files (.txt, .html, .jsonl, optionally .gz) or directories")
+    add_parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="Index directory")
+    add_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    add_parser.add_argument("--segment_documents", type=int, default=DEFAULT_SEGMENT_DOCUMENTS, help="Documents per segment")
+    add_parser.add_argument("--segment_bytes", type=int, default=DEFAULT_SEGMENT_BYTES,
+                            help="In-memory array bytes at which a segment is published early")
+    add_parser.add_argument("--batch_size", type=int, default=DEFAULT_BATCH_SIZE, help="Documents per worker task")
+    add_parser.add_argument("--compact", action="store_true", help="Merge small segments when done")
+    add_parser.add_argument("--paraphrases", action="store_true",
+                            help="Store TF-IDF passages for paraphrase search when creating the index")
+    
+    compact_parser = subparsers.add_parser("compact", help="Merge small segments")
+    compact_parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="Index directory")
+    compact_parser.add_argument("--small_documents", type=int, default=SMALL_SEGMENT_DOCUMENTS,
+                                help="Merge segments with fewer documents than this")
+    compact_parser.add_argument("--grace", type=float, default=RETIRED_SEGMENT_GRACE,
+                                help="Seconds to keep merged segments for running queries")
+    args = parser.parse_args(argv)
+    
+    if args.command == "add":
+        result = ingest(args.documents, args.index, args.workers, args.segment_documents, args.batch_size, args.compact,
+                        args.segment_bytes, args.paraphrases)
+        rate = result["documents"] / max(result["seconds"], 1e-9)
+        print(f"Added {result['documents']} documents in {len(result['segments'])} segments "
+              f"in {result['seconds']:.1f} s ({rate:.0f} documents/s), skipped {result['skipped']} already indexed; "
+              f"the index now has {result['manifest']['documents']} documents "
+              f"in {len(result['manifest']['segments'])} segments")
+    else:
+        manifest = compact(args.index, args.small_documents, args.grace)
+        if manifest is None:
+            print("Nothing to compact")
+        else:
+            print(f"Compacted into {len(manifest['segments'])} segments")
+
+
+if __name__ == "__main__":
+    main()
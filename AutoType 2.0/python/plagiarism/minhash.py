@@ -0,0 +1,188 @@
+"""
+MinHash module for AutoType.
+This module finds candidate sources for lightly edited copies with MinHash and LSH.
+
+Documents are split into overlapping passages of PASSAGE_STEP * 2 word shingles,
+and each passage gets a MinHash signature of bands * rows values. Passages with
+Jaccard similarity s share at least one band with probability
+1 - (1 - s ** rows) ** bands, so more bands raise recall and more rows raise
+precision. Each band is stored as a sorted key array with the document number of
+every key, and is probed with a binary search, so a query costs O(bands * log N)
+however many documents are indexed.
+"""
+
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .fingerprint import kgram_hashes, tokenize
+
+
+# Words per shingle; shorter than the fingerprint k-grams so edits break fewer of them
+SHINGLE_SIZE = 3
+
+# Passages span two steps of shingles, so consecutive passages overlap by half
+PASSAGE_STEP = 25
+
+# Bands x rows per band; the similarity threshold is about (1 / bands) ** (1 / rows)
+DEFAULT_BANDS = 20
+DEFAULT_ROWS = 3
+
+# Seed of the hash permutations, stored with the index
+DEFAULT_SEED = 1
+
+# Hash permutations are (a * x + b) mod a Mersenne prime below 2 ** 31, so
+# products fit in 64 bits
+MINHASH_PRIME = np.uint64((1 << 31) - 1)
+
+# Multiplier that combines the rows of a band into one key
+BAND_KEY_BASE = np.uint64(1099511628211)
+
+# Buckets holding more passages than this are boilerplate and ignored
+MAX_BUCKET_SIZE = 200
+
+
+def lsh_probability(similarity: float, bands: int = DEFAULT_BANDS, rows: int = DEFAULT_ROWS) -> float:
+    """
+    Get the probability that two passages become candidates.
+    
+    Args:
+        similarity: Jaccard similarity of the passages' shingle sets
+        bands: Number of bands
+        rows: Rows per band
+    
+    Returns:
+        Probability that at least one band matches
+    """
+    return 1.0 - (1.0 - similarity ** rows) ** bands
+
+
+class MinHasher:
+    """Computes passage signatures and band keys with fixed hash permutations."""
+    
+    def __init__(self, bands: int = DEFAULT_BANDS, rows: int = DEFAULT_ROWS, seed: int = DEFAULT_SEED):
+        """
+        Args:
+            bands: Number of bands
+            rows: Rows per band
+            seed: Seed of the hash permutations
+        """
+        self.bands = bands
+        self.rows = rows
+        self.seed = seed
+        
+        rng = np.random.default_rng(seed)
+        size = bands * rows
+        self._a = rng.integers(1, int(MINHASH_PRIME), size=size, dtype=np.uint64)
+        self._b = rng.integers(0, int(MINHASH_PRIME), size=size, dtype=np.uint64)
+    
+    def signatures(self, text: str) -> np.ndarray:
+        """
+        Compute the MinHash signature of every passage of a text.
+        
+        Args:
+            text: The text
+        
+        Returns:
+            uint64 array of shape (passages, bands * rows); texts shorter than one
+            shingle have no passages
+        """
+        shingles = kgram_hashes([match.group().lower() for match in tokenize(text)], SHINGLE_SIZE)
+        if len(shingles) == 0:
+            return np.zeros((0, self.bands * self.rows), dtype=np.uint64)
+        
+        values = shingles % MINHASH_PRIME
+        permuted = (values[:, None] * self._a + self._b) % MINHASH_PRIME
+        
+        # Minimum of each step of shingles, then of each pair of neighbouring steps
+        steps = np.minimum.reduceat(permuted, np.arange(0, len(permuted), PASSAGE_STEP), axis=0)
+        if len(steps) == 1:
+            return steps
+        return np.minimum(steps[:-1], steps[1:])
+    
+    def band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """
+        Combine the rows of each band into one key.
+        
+        Args:
+            signatures: Signatures from signatures()
+        
+        Returns:
+            uint64 array of shape (passages, bands)
+        """
+        rows = signatures.reshape(len(signatures), self.bands, self.rows)
+        keys = np.zeros((len(signatures), self.bands), dtype=np.uint64)
+        for row in range(self.rows):
+            keys = keys * BAND_KEY_BASE + rows[:, :, row]
+        return keys
+    
+    def header(self) -> Dict[str, int]:
+        """Parameters stored with an index, to rebuild the same hasher."""
+        return {"bands": self.bands, "rows": self.rows, "seed": self.seed, "shingle": SHINGLE_SIZE,
+                "step": PASSAGE_STEP}
+
+
+def save_lsh_tables(path: str, keys: np.ndarray, documents: np.ndarray) -> None:
+    """
+    Write the band tables of an index segment.
+    
+    Args:
+        path: Segment directory
+        keys: uint64 band keys of shape (bands, passages)
+        documents: Document number of each key, of the same shape
+    """
+    order = np.argsort(keys, axis=1, kind="stable")
+    np.save(os.path.join(path, "lsh_keys.npy"), np.take_along_axis(keys, order, axis=1))
+    np.save(os.path.join(path, "lsh_documents.npy"), np.take_along_axis(documents, order, axis=1).astype(np.uint32))
+
+
+class LSHTables:
+    """The band tables of an index, memory-mapped."""
+    
+    def __init__(self, path: str, header: Dict[str, int]):
+        """
+        Args:
+            path: Segment directory
+            header: Parameters from MinHasher.header()
+        
+        Raises:
+            ValueError: If the index was built with different shingles or passages
+        """
+        if header.get("shingle") != SHINGLE_SIZE or header.get("step") != PASSAGE_STEP:
+            raise ValueError("Plagiarism index was built with different MinHash parameters; rebuild it")
+        self.hasher = MinHasher(header["bands"], header["rows"], header["seed"])
+        self.keys = np.load(os.path.join(path, "lsh_keys.npy"), mmap_mode="r")
+        self.documents = np.load(os.path.join(path, "lsh_documents.npy"), mmap_mode="r")
+    
+    def query(self, query_keys: np.ndarray, max_candidates: int, bands: int = 0) -> List[Tuple[int, int]]:
+        """
+        Find documents with passages similar to passages of a text.
+        
+        Args:
+            query_keys: Band keys of the text's passages, from MinHasher.band_keys()
+            max_candidates: Maximum number of documents to return
+            bands: Number of bands to probe (0 for all); fewer bands are faster
+                but find fewer lightly edited copies
+        
+        Returns:
+            List of (document number, matching bands), most matching bands first
+        """
+        if self.keys.size == 0 or len(query_keys) == 0:
+            return []
+        
+        probed = min(bands or self.hasher.bands, self.hasher.bands)
+        hits = []
+        for band in range(probed):
+            table = self.keys[band]
+            low = np.searchsorted(table, query_keys[:, band], side="left")
+            high = np.searchsorted(table, query_keys[:, band], side="right")
+            for start, end in zip(low, high):
+                if 0 < end - start <= MAX_BUCKET_SIZE:
+                    hits.append(self.documents[band, start:end])
+        
+        if not hits:
+            return []
+        candidates, counts = np.unique(np.concatenate(hits), return_counts=True)
+        top = np.argsort(-counts, kind="stable")[:max_candidates]
+        return [(int(candidates[position]), int(counts[position])) for position in top]
@@ -0,0 +1,571 @@
+"""
+Index segment module for AutoType.
+This module writes, reads and merges the immutable segments of a plagiarism index.
+
+A segment is a directory of flat files that are memory-mapped when opened:
+
+    segment.json            header (document and fingerprint counts, parameters)
+    hashes.npy              uint64 fingerprint hashes, sorted
+    postings.npy            (document, start, end) of each fingerprint, in hash order
+    texts.bin / .npy        UTF-8 text of each document, and the byte offset of each
+    metadata.bin / .npy     JSON metadata (id, title, url) of each document
+    lsh_keys.npy            MinHash band keys of every passage, sorted per band
+    lsh_documents.npy       document number of each band key
+    bloom.npy               bloom filter of the fingerprint hashes and band keys
+    tfidf_*.npy             posting lists of the passage features, with feature
+                            document frequencies and passage norms (only in
+                            indexes built for paraphrase search)
+    keys.npy                uint64 keys of the document IDs, sorted, to skip
+                            documents that are already indexed
+
+Once written, a segment never changes; new documents go into new segments, and
+compaction merges segments into a new one.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import time
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from .bloom import BloomFilter, BloomProbe, probe
+from .fingerprint import Fingerprints, fingerprint
+from .minhash import BAND_KEY_BASE, LSHTables, MinHasher, save_lsh_tables
+from .tfidf import (DEFAULT_MIN_SIMILARITY, DEFAULT_TOP_K, FEATURES, PassageVectors, TfidfTables,
+                    concatenate_vectors, save_tfidf_tables, vectorize_passages)
+
+
+SEGMENT_HEADER_NAME = "segment.json"
+
+KEYS_NAME = "keys.npy"
+
+POSTING_DTYPE = np.dtype([("doc", "<u4"), ("start", "<u4"), ("end", "<u4")])
+
+# Fingerprints found in more documents than this are boilerplate and ignored
+MAX_POSTINGS_PER_HASH = 1000
+
+# Hashers by (bands, rows, seed), so worker processes build each only once
+_hashers: Dict[Tuple[int, int, int], MinHasher] = {}
+
+
+def document_key(document_id: Any) -> int:
+    """
+    Get the key that identifies a document across segments.
+    
+    Args:
+        document_id: The document ID
+    
+    Returns:
+        Stable 64-bit hash of the ID
+    """
+    return int.from_bytes(hashlib.blake2b(str(document_id).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def band_items(keys: np.ndarray) -> np.ndarray:
+    """
+    Combine MinHash band keys with their band, as they are stored in bloom filters.
+    
+    Args:
+        keys: uint64 band keys of shape (bands, passages)
+    
+    Returns:
+        Flat uint64 array, different for equal keys in different bands
+    """
+    bands = np.arange(len(keys), dtype=np.uint64)[:, None]
+    return (keys * BAND_KEY_BASE + bands).ravel()
+
+
+class SegmentQuery(NamedTuple):
+    """A text prepared once to search every segment of an index."""
+    prints: Fingerprints    # fingerprints of the text
+    band_keys: np.ndarray   # MinHash band keys, one row per passage
+    bands: int              # number of bands probed (0 for all)
+    probe: BloomProbe       # fingerprint hashes and probed band keys, for bloom filters
+
+
+class DocumentEntry(NamedTuple):
+    """A document ready to be added to a segment."""
+    hashes: np.ndarray      # winnowed fingerprint hashes
+    starts: np.ndarray      # character offset where each fingerprint starts
+    ends: np.ndarray        # character offset where each fingerprint ends
+    band_keys: np.ndarray   # MinHash band keys, one row per passage
+    passages: PassageVectors  # TF-IDF term frequencies of overlapping passages (none without paraphrases)
+    text: bytes             # UTF-8 text
+    metadata: bytes         # JSON id, title and url
+    key: int                # key of the document ID, see document_key
+
+
+def prepare_document(document: Dict[str, Any], parameters: Dict[str, Any]) -> DocumentEntry:
+    """
+    Fingerprint a document for a segment.
+    
+    Args:
+        document: Dictionary with id, text and optionally title and url
+        parameters: Index parameters with k, window, lsh (bands, rows, seed) and
+            paraphrases (whether to vectorize passages for paraphrase search)
+    
+    Returns:
+        The document entry
+    """
+    lsh = parameters["lsh"]
+    key = (lsh["bands"], lsh["rows"], lsh["seed"])
+    hasher = _hashers.get(key)
+    if hasher is None:
+        hasher = _hashers[key] = MinHasher(*key)
+    
+    text = document.get("text", "")
+    prints = fingerprint(text, parameters["k"], parameters["window"])
+    document_id = str(document["id"])
+    info = {"id": document_id, "title": document.get("title") or document_id, "url": document.get("url", "")}
+    passages = vectorize_passages(text if parameters["paraphrases"] else "")
+    return DocumentEntry(prints.hashes, prints.starts, prints.ends, hasher.band_keys(hasher.signatures(text)),
+                         passages, text.encode("utf-8"), json.dumps(info).encode("utf-8"), document_key(document_id))
+
+
+def prepare_query(text: str, prints: Fingerprints, hasher: MinHasher, bands: int = 0) -> SegmentQuery:
+    """
+    Prepare a text to be searched for in segments.
+    
+    Args:
+        text: The text to check
+        prints: Fingerprints of the text
+        hasher: MinHash hasher of the index
+        bands: Number of MinHash bands to probe (0 for all)
+    
+    Returns:
+        The query
+    """
+    band_keys = hasher.band_keys(hasher.signatures(text))
+    probed = min(bands or hasher.bands, hasher.bands)
+    values = np.concatenate([prints.hashes, band_items(band_keys[:, :probed].T)])
+    return SegmentQuery(prints, band_keys, bands, probe(values))
+
+
+def prepare_batch(batch: Tuple[List[Dict[str, Any]], Dict[str, Any]]) -> List[DocumentEntry]:
+    """
+    Fingerprint a batch of documents; the unit of work of ingestion workers.
+    
+    Args:
+        batch: Tuple of (documents, index parameters)
+    
+    Returns:
+        One entry per document
+    """
+    documents, parameters = batch
+    return [prepare_document(document, parameters) for document in documents]
+
+
+class Blobs:
+    """Byte strings stored back to back in path.bin, with their offsets in path.npy, memory-mapped."""
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Path without extension
+        """
+        self.offsets = np.load(path + ".npy", mmap_mode="r")
+        with open(path + ".bin", "rb") as f:
+            # Empty files cannot be mapped
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+    
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+    
+    def __getitem__(self, index: int) -> bytes:
+        return self._data[int(self.offsets[index]):int(self.offsets[index + 1])]
+
+
+class BlobWriter:
+    """Writes byte strings back to back to path.bin as they arrive, and their offsets to path.npy on close."""
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Path without extension
+        """
+        self.path = path
+        self._file = open(path + ".bin", "wb")
+        self._offsets = [0]
+    
+    def write(self, blob: bytes) -> None:
+        """
+        Append a byte string.
+        
+        Args:
+            blob: The byte string
+        """
+        self._file.write(blob)
+        self._offsets.append(self._offsets[-1] + len(blob))
+    
+    def copy(self, blobs: Blobs) -> None:
+        """
+        Append every byte string of a Blobs.
+        
+        Args:
+            blobs: The byte strings to copy
+        """
+        end = int(blobs.offsets[-1])
+        self._file.write(blobs._data[:end])
+        self._offsets.extend((np.asarray(blobs.offsets[1:], dtype=np.int64) + self._offsets[-1]).tolist())
+    
+    def close(self) -> int:
+        """
+        Finish writing.
+        
+        Returns:
+            Number of byte strings written
+        """
+        self._file.close()
+        np.save(self.path + ".npy", np.array(self._offsets, dtype=np.uint64))
+        return len(self._offsets) - 1
+
+
+class SegmentWriter:
+    """Writes documents into a new segment as they arrive."""
+    
+    def __init__(self, path: str, parameters: Dict[str, Any]):
+        """
+        Args:
+            path: Segment directory, which must not exist yet
+            parameters: Index parameters with k, window, lsh and paraphrases
+        """
+        os.makedirs(path)
+        self.path = path
+        self.parameters = parameters
+        self._hashes: List[np.ndarray] = []
+        self._postings: List[np.ndarray] = []
+        self._band_keys: List[np.ndarray] = []
+        self._band_documents: List[np.ndarray] = []
+        self._passages: List[PassageVectors] = []
+        self._passage_documents: List[np.ndarray] = []
+        # Document frequencies of features pruned from copied segments
+        self._pruned_frequencies = np.zeros(FEATURES, dtype=np.uint32) if parameters["paraphrases"] else None
+        self._keys: List[np.ndarray] = []
+        self._added_keys: set = set()
+        
+        # Texts and metadata are streamed to disk; only the fingerprints are kept in memory
+        self._texts = BlobWriter(os.path.join(path, "texts"))
+        self._metadata = BlobWriter(os.path.join(path, "metadata"))
+        self.documents = 0
+        # Bytes of the arrays kept in memory until close
+        self.nbytes = 0
+    
+    def __len__(self) -> int:
+        return self.documents
+    
+    def contains_key(self, key: int) -> bool:
+        """
+        Check whether a document with the given key was added with add().
+        
+        Args:
+            key: Key of the document ID, see document_key
+        
+        Returns:
+            True if the document is already in the segment
+        """
+        return key in self._added_keys
+    
+    def add(self, entry: DocumentEntry) -> None:
+        """
+        Add a document.
+        
+        Args:
+            entry: The document entry, from prepare_document
+        """
+        postings = np.empty(len(entry.hashes), dtype=POSTING_DTYPE)
+        postings["doc"] = self.documents
+        postings["start"] = entry.starts
+        postings["end"] = entry.ends
+        self._hashes.append(entry.hashes)
+        self._postings.append(postings)
+        self._band_keys.append(entry.band_keys.T)
+        self._band_documents.append(np.full(entry.band_keys.shape[::-1], self.documents, dtype=np.uint32))
+        self._passages.append(entry.passages)
+        self._passage_documents.append(np.full(len(entry.passages.spans), self.documents, dtype=np.uint32))
+        self._keys.append(np.array([entry.key], dtype=np.uint64))
+        self._added_keys.add(entry.key)
+        self._texts.write(entry.text)
+        self._metadata.write(entry.metadata)
+        self.documents += 1
+        self.nbytes += (entry.hashes.nbytes + postings.nbytes + 2 * entry.band_keys.nbytes
+                        + sum(array.nbytes for array in entry.passages) + self._passage_documents[-1].nbytes)
+    
+    def add_segment(self, segment: "Segment") -> None:
+        """
+        Add every document of an existing segment.
+        
+        Args:
+            segment: The segment to copy
+        """
+        postings = np.array(segment.postings)
+        postings["doc"] += np.uint32(self.documents)
+        self._hashes.append(np.asarray(segment.hashes))
+        self._postings.append(postings)
+        # Band tables are sets of (key, document) pairs per band, so they concatenate
+        self._band_keys.append(np.asarray(segment.lsh.keys))
+        self._band_documents.append(np.asarray(segment.lsh.documents) + np.uint32(self.documents))
+        if self.parameters["paraphrases"] and segment.tfidf is not None:
+            self._passages.append(segment.tfidf.vectors())
+            self._passage_documents.append(np.asarray(segment.tfidf.passages["doc"]) + np.uint32(self.documents))
+            self._pruned_frequencies += segment.tfidf.pruned_frequencies()
+        elif self.parameters["paraphrases"]:
+            # Segments written before TF-IDF passages were added are vectorized now
+            for number in range(len(segment)):
+                passages = vectorize_passages(segment.document_text(number))
+                self._passages.append(passages)
+                self._passage_documents.append(np.full(len(passages.spans), self.documents + number, dtype=np.uint32))
+        self._keys.append(np.asarray(segment.keys))
+        self._texts.copy(segment.texts)
+        self._metadata.copy(segment.metadata)
+        self.documents += len(segment)
+    
+    def close(self) -> Dict[str, Any]:
+        """
+        Sort the fingerprints and finish writing the segment.
+        
+        Returns:
+            The segment header
+        """
+        self._texts.close()
+        self._metadata.close()
+        
+        hashes = np.concatenate(self._hashes) if self._hashes else np.zeros(0, dtype=np.uint64)
+        postings = np.concatenate(self._postings) if self._postings else np.zeros(0, dtype=POSTING_DTYPE)
+        order = np.argsort(hashes, kind="stable")
+        np.save(os.path.join(self.path, "hashes.npy"), hashes[order])
+        np.save(os.path.join(self.path, "postings.npy"), postings[order])
+        
+        bands = self.parameters["lsh"]["bands"]
+        band_keys = np.concatenate(self._band_keys, axis=1) if self._band_keys else np.zeros((bands, 0), dtype=np.uint64)
+        band_documents = (np.concatenate(self._band_documents, axis=1) if self._band_documents
+                          else np.zeros((bands, 0), dtype=np.uint32))
+        save_lsh_tables(self.path, band_keys, band_documents)
+        
+        bloom = BloomFilter.build(np.concatenate([hashes, band_items(band_keys)]))
+        bloom.save(self.path)
+        
+        tfidf = None
+        if self.parameters["paraphrases"]:
+            passage_documents = (np.concatenate(self._passage_documents) if self._passage_documents
+                                 else np.zeros(0, dtype=np.uint32))
+            tfidf = save_tfidf_tables(self.path, passage_documents, concatenate_vectors(self._passages),
+                                      self._pruned_frequencies)
+        
+        keys = np.concatenate(self._keys) if self._keys else np.zeros(0, dtype=np.uint64)
+        np.save(os.path.join(self.path, KEYS_NAME), np.sort(keys))
+        
+        header = {
+            "documents": self.documents,
+            "fingerprints": int(len(hashes)),
+            "k": self.parameters["k"],
+            "window": self.parameters["window"],
+            "lsh": self.parameters["lsh"],
+            "bloom": bloom.header(),
+            "keys": True,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        if tfidf is not None:
+            header["tfidf"] = tfidf
+        # The header is written last, so a segment without one is incomplete
+        with open(os.path.join(self.path, SEGMENT_HEADER_NAME), "w", encoding="utf-8") as f:
+            json.dump(header, f, indent=2)
+        return header
+
+
+class Segment:
+    """One immutable segment of a plagiarism index, memory-mapped."""
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Segment directory
+        
+        Raises:
+            ValueError: If the directory does not hold a complete segment
+        """
+        self.path = path
+        self.name = os.path.basename(path)
+        try:
+            with open(os.path.join(path, SEGMENT_HEADER_NAME), "r", encoding="utf-8") as f:
+                self.header = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Incomplete plagiarism index segment at {path}: {e}")
+        
+        self.hashes = np.load(os.path.join(path, "hashes.npy"), mmap_mode="r")
+        self.postings = np.load(os.path.join(path, "postings.npy"), mmap_mode="r")
+        self.texts = Blobs(os.path.join(path, "texts"))
+        self.metadata = Blobs(os.path.join(path, "metadata"))
+        self.lsh = LSHTables(path, self.header["lsh"])
+        # Segments written before bloom filters were added are always searched
+        self.bloom = BloomFilter.load(path, self.header["bloom"]) if "bloom" in self.header else None
+        # Likewise, segments without TF-IDF passages (indexes built without
+        # paraphrase search, or before it was added) are not searched for paraphrases
+        self.tfidf = TfidfTables(path, self.header["tfidf"]) if "tfidf" in self.header else None
+        # Segments without document keys derive them from the metadata when first needed
+        self._keys = np.load(os.path.join(path, KEYS_NAME), mmap_mode="r") if "keys" in self.header else None
+    
+    def __len__(self) -> int:
+        return len(self.texts)
+    
+    @property
+    def keys(self) -> np.ndarray:
+        """Sorted keys of the document IDs, see document_key."""
+        if self._keys is None:
+            self._keys = np.sort(np.array([document_key(self.document(number)["id"]) for number in range(len(self))],
+                                          dtype=np.uint64))
+        return self._keys
+    
+    def contains_keys(self, keys: np.ndarray) -> np.ndarray:
+        """
+        Test which documents are in the segment.
+        
+        Args:
+            keys: uint64 keys of document IDs, see document_key
+        
+        Returns:
+            Boolean array, True where the segment holds a document with the key
+        """
+        if not len(self.keys):
+            return np.zeros(len(keys), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return self.keys[positions] == keys
+    
+    def document(self, number: int) -> Dict[str, Any]:
+        """
+        Get the metadata of a document.
+        
+        Args:
+            number: Document number in the segment
+        
+        Returns:
+            Dictionary with id, title and url
+        """
+        return json.loads(self.metadata[number])
+    
+    def document_text(self, number: int) -> str:
+        """
+        Get the text of a document.
+        
+        Args:
+            number: Document number in the segment
+        
+        Returns:
+            The document text
+        """
+        return self.texts[number].decode("utf-8")
+    
+    def lookup(self, hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the postings of many fingerprint hashes at once.
+        
+        Args:
+            hashes: Query fingerprint hashes
+        
+        Returns:
+            Tuple of (index of the query hash of each posting, the postings)
+        """
+        low = np.searchsorted(self.hashes, hashes, side="left")
+        high = np.searchsorted(self.hashes, hashes, side="right")
+        counts = high - low
+        counts[counts > MAX_POSTINGS_PER_HASH] = 0
+        
+        total = int(counts.sum())
+        query_index = np.repeat(np.arange(len(hashes)), counts)
+        first = np.cumsum(counts) - counts
+        positions = np.arange(total) - np.repeat(first, counts) + np.repeat(low, counts)
+        return query_index, self.postings[positions]
+    
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Test which fingerprint hashes occur in the segment.
+        
+        Args:
+            hashes: Query fingerprint hashes
+        
+        Returns:
+            Boolean array, True where a hash has postings (boilerplate hashes
+            with too many postings count as absent, as in lookup())
+        """
+        counts = np.searchsorted(self.hashes, hashes, side="right") - np.searchsorted(self.hashes, hashes, side="left")
+        return (counts > 0) & (counts <= MAX_POSTINGS_PER_HASH)
+    
+    def might_match(self, query: SegmentQuery) -> bool:
+        """
+        Check whether the segment may hold any of a query's fingerprints or band keys.
+        
+        Args:
+            query: The query, from prepare_query()
+        
+        Returns:
+            False if the bloom filter rules out every hash, so the segment can be skipped
+        """
+        return self.bloom is None or bool(self.bloom.contains(query.probe).any())
+    
+    def candidates(self, query: SegmentQuery, max_candidates: int,
+                   max_near_candidates: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Find the documents of this segment that may share passages with a text.
+        
+        Args:
+            query: The query, from prepare_query()
+            max_candidates: Maximum number of documents found through fingerprints
+            max_near_candidates: Maximum number of documents found through MinHash
+        
+        Returns:
+            Tuple of the documents found through fingerprints, most matched
+            fingerprints first, and those found only through MinHash, most
+            matched bands first; each is a dictionary with the document number in
+            the segment and the number of matched fingerprints and MinHash bands
+        """
+        if not self.might_match(query):
+            return [], []
+        
+        exact: Dict[int, Dict[str, Any]] = {}
+        query_index, postings = self.lookup(query.prints.hashes)
+        if len(postings):
+            # Rank documents by the number of distinct query fingerprints they share
+            pairs = np.unique((postings["doc"].astype(np.int64) << 32) | query_index)
+            ranked, counts = np.unique(pairs >> 32, return_counts=True)
+            for position in np.argsort(-counts, kind="stable")[:max_candidates]:
+                document = int(ranked[position])
+                exact[document] = {"document": document, "fingerprints": int(counts[position]), "bands": 0}
+        
+        near = []
+        for document, hits in self.lsh.query(query.band_keys, max_near_candidates, query.bands):
+            if document in exact:
+                exact[document]["bands"] = hits
+            else:
+                near.append({"document": document, "fingerprints": 0, "bands": hits})
+        
+        return list(exact.values()), near
+    
+    def paraphrases(self, query: PassageVectors, top_k: int = DEFAULT_TOP_K,
+                    min_similarity: float = DEFAULT_MIN_SIMILARITY) -> List[List[Dict[str, Any]]]:
+        """
+        Find the passages of this segment most similar to each query passage.
+        
+        Args:
+            query: The query's passages, from vectorize_paragraphs()
+            top_k: Number of documents wanted per query passage
+            min_similarity: Lowest cosine similarity returned
+        
+        Returns:
+            For each query passage, one dictionary per document with the document
+            number in the segment, the similarity, and the character span of the
+            matching passage in the document, most similar first
+        """
+        if self.tfidf is None:
+            return [[] for _ in range(len(query.spans))]
+        
+        results = []
+        for matches in self.tfidf.search(query, top_k, min_similarity):
+            found = []
+            for similarity, passage in matches:
+                info = self.tfidf.passages[passage]
+                found.append({"document": int(info["doc"]), "similarity": similarity,
+                              "sourceStart": int(info["start"]), "sourceEnd": int(info["end"])})
+            results.append(found)
+        return results
@@ -0,0 +1,395 @@
+"""
+TF-IDF module for AutoType.
+This module finds reworded passages with hashed TF-IDF vectors and cosine similarity.
+
+Shingles and fingerprints only match runs of identical words, so a paraphrase
+that swaps most words for synonyms and reorders clauses slips past them. Here
+every passage becomes a sparse vector of its words, word pairs and CHAR_GRAM
+character n-grams, hashed into FEATURES dimensions so no vocabulary has to be
+kept. Character n-grams still match inflected and derived forms ("utilize",
+"utilized", "utilization"), and rare features weigh more than common ones.
+
+Reference documents are split into overlapping windows of PASSAGE_WORDS words.
+Each index segment stores, memory-mapped, the document frequency of every
+feature, the TF-IDF norm of every passage and posting lists: for each feature,
+the passages holding it with their raw sublinear term frequencies (as float16,
+which is precise enough for a similarity). Features
+held by more than max_feature_passages() passages are pruned: they weigh little,
+make up most of the stored values, and would make every passage a candidate.
+Similarities are cosines over the features a segment keeps, on both sides.
+
+Scoring a query's paragraphs against a segment only reads the posting lists of
+the paragraphs' own features, so it touches the passages that share a kept
+feature with the query and never scans the rest of the segment.
+"""
+
+import os
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from .fingerprint import HASH_BASE, tokenize, word_hash
+
+
+# Hashed feature space; a power of two so features are the top bits of a hash
+FEATURE_BITS = 20
+FEATURES = 1 << FEATURE_BITS
+
+# Characters per character n-gram
+CHAR_GRAM = 4
+
+# Reference passages are windows of this many words, starting every PASSAGE_STEP words
+PASSAGE_WORDS = 60
+PASSAGE_STEP = 30
+
+# Query paragraphs shorter than this carry too little to be compared
+MIN_PARAGRAPH_WORDS = 8
+
+# Features held by more passages of a segment than the larger of these are
+# pruned from it; the share keeps small segments from losing their common words
+MAX_FEATURE_SHARE = 0.01
+MIN_PRUNED_PASSAGES = 64
+
+# Sources reported per paragraph, and the lowest cosine similarity reported;
+# pruned features no longer add to the similarity of matching passages, while
+# unrelated passages, which share few rare features, stay below 0.1
+DEFAULT_TOP_K = 3
+DEFAULT_MIN_SIMILARITY = 0.2
+
+# Best passages kept per paragraph; neighbouring windows of one document often
+# score alike, and only the best of them is reported
+PASSAGES_PER_SOURCE = 4
+
+# Blank lines separate paragraphs
+PARAGRAPH_BREAK_PATTERN = re.compile(r'\n\s*\n')
+
+# Multiplier spreading hashes before their top bits are taken (Fibonacci hashing),
+# and offsets keeping words, word pairs and character n-grams apart
+FEATURE_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+BIGRAM_SALT = np.uint64(0x5BD1E995)
+CHAR_SALT = np.uint64(0x27D4EB2F165667C5)
+
+
+class PassageVectors(NamedTuple):
+    """Passages of a text and their term frequencies, as a CSR matrix."""
+    spans: np.ndarray     # uint32 array of shape (passages, 2): character start and end
+    indptr: np.ndarray    # int64 offsets of each passage's features
+    indices: np.ndarray   # int32 features, sorted within each passage
+    counts: np.ndarray    # float32 sublinear term frequency of each feature
+
+
+def _feature_ids(hashes: np.ndarray) -> np.ndarray:
+    """Map uint64 hashes to features."""
+    return ((hashes * FEATURE_MULTIPLIER) >> np.uint64(64 - FEATURE_BITS)).astype(np.int32)
+
+
+def _vectorize(word_spans: List[Tuple[int, int]], matches: List[re.Match]) -> PassageVectors:
+    """
+    Build the vectors of passages given as (first word, end word) ranges.
+    
+    The words, word pairs and character n-grams of the whole text are hashed
+    once, and each passage takes its slice of them. Its character n-grams are
+    those of its words joined by single spaces, with a space at both ends.
+    """
+    words = [match.group().lower() for match in matches]
+    spans = np.array([(matches[first].start(), matches[end - 1].end()) for first, end in word_spans],
+                     dtype=np.uint32).reshape(len(word_spans), 2)
+    if not word_spans:
+        return PassageVectors(spans, np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32),
+                              np.zeros(0, dtype=np.float32))
+    
+    word_hashes = np.fromiter(map(word_hash, words), dtype=np.uint64, count=len(words))
+    word_features = _feature_ids(word_hashes)
+    bigram_features = _feature_ids((word_hashes[:-1] * HASH_BASE + word_hashes[1:]) ^ BIGRAM_SALT)
+    
+    characters = np.frombuffer(f" {' '.join(words)} ".encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    grams = np.zeros(max(len(characters) - CHAR_GRAM + 1, 0), dtype=np.uint64)
+    for offset in range(CHAR_GRAM):
+        grams = grams * HASH_BASE + characters[offset:offset + len(grams)]
+    gram_features = _feature_ids(grams ^ CHAR_SALT)
+    
+    # Offset of each word in the joined text
+    lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+    word_offsets = np.cumsum(lengths + 1) - lengths
+    
+    pieces = []
+    for first, end in word_spans:
+        gram_start = word_offsets[first] - 1
+        gram_end = max(word_offsets[end - 1] + lengths[end - 1] + 2 - CHAR_GRAM, gram_start)
+        pieces.append(np.concatenate([word_features[first:end], bigram_features[first:end - 1],
+                                      gram_features[gram_start:gram_end]]))
+    
+    # Count each (passage, feature) pair with one sort
+    rows = np.repeat(np.arange(len(pieces), dtype=np.int64), [len(piece) for piece in pieces])
+    keys, counts = np.unique((rows << FEATURE_BITS) | np.concatenate(pieces), return_counts=True)
+    indptr = np.searchsorted(keys >> FEATURE_BITS, np.arange(len(pieces) + 1)).astype(np.int64)
+    return PassageVectors(spans, indptr, (keys & (FEATURES - 1)).astype(np.int32),
+                          (1.0 + np.log(counts)).astype(np.float32))
+
+
+def _windows(first: int, end: int) -> List[Tuple[int, int]]:
+    """Split a range of words into overlapping windows of PASSAGE_WORDS words."""
+    if end - first <= PASSAGE_WORDS:
+        return [(first, end)]
+    windows = [(start, start + PASSAGE_WORDS) for start in range(first, end - PASSAGE_WORDS + 1, PASSAGE_STEP)]
+    if windows[-1][1] < end:
+        windows.append((end - PASSAGE_WORDS, end))
+    return windows
+
+
+def vectorize_passages(text: str) -> PassageVectors:
+    """
+    Vectorize a reference document as overlapping passages.
+    
+    Args:
+        text: The document text
+    
+    Returns:
+        The passage vectors (none for a text without words)
+    """
+    matches = tokenize(text)
+    return _vectorize(_windows(0, len(matches)) if matches else [], matches)
+
+
+def vectorize_paragraphs(text: str) -> PassageVectors:
+    """
+    Vectorize the paragraphs of a text to check; long paragraphs are split into passages.
+    
+    Args:
+        text: The text to check
+    
+    Returns:
+        The vectors of every paragraph of at least MIN_PARAGRAPH_WORDS words
+    """
+    matches = tokenize(text)
+    starts = [match.start() for match in matches]
+    spans = []
+    position = 0
+    for paragraph in PARAGRAPH_BREAK_PATTERN.split(text):
+        start = text.index(paragraph, position)
+        position = start + len(paragraph)
+        first = np.searchsorted(starts, start)
+        end = np.searchsorted(starts, position)
+        if end - first >= MIN_PARAGRAPH_WORDS:
+            spans.extend(_windows(int(first), int(end)))
+    return _vectorize(spans, matches)
+
+
+def concatenate_vectors(parts: List[PassageVectors]) -> PassageVectors:
+    """
+    Stack the passages of several texts.
+    
+    Args:
+        parts: Passage vectors, e.g. one per document
+    
+    Returns:
+        All their passages, in order
+    """
+    if not parts:
+        return _vectorize([], [])
+    # Each part's offsets are shifted past the features of the parts before it
+    lengths = np.concatenate([np.diff(part.indptr) for part in parts])
+    indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    return PassageVectors(np.concatenate([part.spans for part in parts]), indptr,
+                          np.concatenate([part.indices for part in parts]),
+                          np.concatenate([part.counts for part in parts]))
+
+
+def inverse_document_frequencies(frequencies: np.ndarray, passages: int) -> np.ndarray:
+    """
+    Weigh features by rarity (smoothed IDF).
+    
+    Args:
+        frequencies: Number of passages holding each feature
+        passages: Number of passages
+    
+    Returns:
+        float32 weight of every feature
+    """
+    return (np.log((1.0 + passages) / (1.0 + frequencies)) + 1.0).astype(np.float32)
+
+
+def max_feature_passages(passages: int) -> int:
+    """
+    Get the number of passages of a segment above which a feature is pruned.
+    
+    Args:
+        passages: Number of passages in the segment
+    
+    Returns:
+        The largest document frequency of a kept feature
+    """
+    return max(MIN_PRUNED_PASSAGES, int(MAX_FEATURE_SHARE * passages))
+
+
+def save_tfidf_tables(path: str, documents: np.ndarray, vectors: PassageVectors,
+                      pruned_frequencies: Optional[np.ndarray] = None) -> Dict[str, int]:
+    """
+    Write the passage vectors of an index segment as posting lists.
+    
+    Args:
+        path: Segment directory
+        documents: Document number of each passage
+        vectors: The passages, concatenated over all documents
+        pruned_frequencies: Document frequencies of features that are missing
+            from vectors because they were pruned from the segments vectors was
+            merged from (see TfidfTables.pruned_frequencies); such features stay
+            pruned, as their posting lists are incomplete
+    
+    Returns:
+        Parameters to store in the segment header
+    """
+    passage_count = len(vectors.spans)
+    frequencies = np.bincount(vectors.indices, minlength=FEATURES).astype(np.uint32)
+    pruned = frequencies > max_feature_passages(passage_count)
+    if pruned_frequencies is not None:
+        frequencies += pruned_frequencies.astype(np.uint32)
+        pruned |= pruned_frequencies > 0
+    idf = inverse_document_frequencies(frequencies, passage_count)
+    
+    # Keep the values of unpruned features, grouped by feature; passages stay in order within each
+    kept = ~pruned[vectors.indices]
+    rows = np.repeat(np.arange(passage_count, dtype=np.uint32), np.diff(vectors.indptr))[kept]
+    indices = vectors.indices[kept]
+    counts = vectors.counts[kept]
+    norms = np.sqrt(np.bincount(rows, weights=(counts * idf[indices]) ** 2, minlength=passage_count))
+    order = np.argsort(indices, kind="stable")
+    features, starts = np.unique(indices[order], return_index=True)
+    offsets = np.append(starts, len(order)).astype(np.int64)
+    
+    passages = np.empty(passage_count, dtype=[("doc", "<u4"), ("start", "<u4"), ("end", "<u4")])
+    passages["doc"] = documents
+    passages["start"] = vectors.spans[:, 0]
+    passages["end"] = vectors.spans[:, 1]
+    
+    np.save(os.path.join(path, "tfidf_passages.npy"), passages)
+    np.save(os.path.join(path, "tfidf_features.npy"), features.astype(np.int32))
+    np.save(os.path.join(path, "tfidf_offsets.npy"), offsets)
+    np.save(os.path.join(path, "tfidf_postings.npy"), rows[order])
+    np.save(os.path.join(path, "tfidf_counts.npy"), counts[order].astype(np.float16))
+    np.save(os.path.join(path, "tfidf_frequencies.npy"), frequencies)
+    np.save(os.path.join(path, "tfidf_norms.npy"), norms.astype(np.float32))
+    return tfidf_header()
+
+
+def tfidf_header() -> Dict[str, Any]:
+    """Parameters stored with an index segment, to check queries are vectorized alike."""
+    return {"features": FEATURES, "char_gram": CHAR_GRAM, "passage_words": PASSAGE_WORDS, "passage_step": PASSAGE_STEP,
+            "layout": "postings"}
+
+
+class TfidfTables:
+    """The passage posting lists of an index segment, memory-mapped."""
+    
+    def __init__(self, path: str, header: Dict[str, Any]):
+        """
+        Args:
+            path: Segment directory
+            header: Parameters from tfidf_header()
+        
+        Raises:
+            ValueError: If the segment was vectorized with different parameters
+        """
+        if header != tfidf_header():
+            raise ValueError("Plagiarism index was built with different TF-IDF parameters; rebuild it")
+        self.passages = np.load(os.path.join(path, "tfidf_passages.npy"), mmap_mode="r")
+        self.features = np.load(os.path.join(path, "tfidf_features.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "tfidf_offsets.npy"), mmap_mode="r")
+        self.postings = np.load(os.path.join(path, "tfidf_postings.npy"), mmap_mode="r")
+        self.counts = np.load(os.path.join(path, "tfidf_counts.npy"), mmap_mode="r")
+        self.frequencies = np.load(os.path.join(path, "tfidf_frequencies.npy"), mmap_mode="r")
+        self.norms = np.load(os.path.join(path, "tfidf_norms.npy"), mmap_mode="r")
+        self.idf = inverse_document_frequencies(self.frequencies, len(self.passages))
+    
+    def __len__(self) -> int:
+        return len(self.passages)
+    
+    def vectors(self) -> PassageVectors:
+        """Get the stored passages, without their pruned features, e.g. to merge them into another segment."""
+        lengths = np.diff(self.offsets)
+        indices = np.repeat(np.asarray(self.features), lengths)
+        rows = np.asarray(self.postings)
+        order = np.lexsort((indices, rows))
+        indptr = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(self)), out=indptr[1:])
+        spans = np.stack([self.passages["start"], self.passages["end"]], axis=1)
+        return PassageVectors(spans, indptr, indices[order], np.asarray(self.counts)[order].astype(np.float32))
+    
+    def pruned_frequencies(self) -> np.ndarray:
+        """Get the document frequencies of the pruned features, and zero for the others."""
+        frequencies = np.array(self.frequencies)
+        frequencies[np.asarray(self.features)] = 0
+        return frequencies
+    
+    def _lookup(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Find features in the posting lists: (position in self.features, whether stored)."""
+        positions = np.searchsorted(self.features, features)
+        if not len(self.features):
+            return positions, np.zeros(len(features), dtype=bool)
+        return positions, self.features[np.minimum(positions, len(self.features) - 1)] == features
+    
+    def search(self, query: PassageVectors, top_k: int = DEFAULT_TOP_K,
+               min_similarity: float = DEFAULT_MIN_SIMILARITY) -> List[List[Tuple[float, int]]]:
+        """
+        Find the passages most similar to each query passage.
+        
+        Only the posting lists of the query's features are read, so the cost
+        depends on how many passages share a kept feature with the query, not
+        on the size of the segment.
+        
+        Args:
+            query: The query's passages, from vectorize_paragraphs()
+            top_k: Number of source documents wanted per query passage
+            min_similarity: Lowest cosine similarity returned
+        
+        Returns:
+            For each query passage, (similarity, passage number) of its best
+            matching passages, most similar first, at most one per document
+        """
+        results: List[List[Tuple[float, int]]] = [[] for _ in range(len(query.spans))]
+        if len(self) == 0 or len(query.spans) == 0:
+            return results
+        
+        # Weigh the query with this segment's IDF over the features it keeps
+        rows = np.repeat(np.arange(len(query.spans)), np.diff(query.indptr))
+        positions, stored = self._lookup(query.indices)
+        weights = query.counts * self.idf[query.indices]
+        weights[~stored & (self.frequencies[query.indices] > 0)] = 0.0
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=len(query.spans)))
+        # Stored postings hold raw frequencies, so their IDF is applied on the query side
+        weights = weights * self.idf[query.indices] / np.maximum(norms, 1e-12)[rows]
+        
+        # Gather the postings of every stored query feature
+        low = np.asarray(self.offsets[positions[stored]])
+        lengths = np.asarray(self.offsets[positions[stored] + 1]) - low
+        first = np.cumsum(lengths) - lengths
+        posting_positions = np.arange(int(lengths.sum())) - np.repeat(first - low, lengths)
+        passages = np.asarray(self.postings[posting_positions]).astype(np.int64)
+        values = np.repeat(weights[stored], lengths) * self.counts[posting_positions]
+        
+        # Sum the products of each (query passage, reference passage) pair
+        scores = sparse.csr_matrix((values, (np.repeat(rows[stored], lengths), passages)),
+                                   shape=(len(query.spans), len(self)))
+        scores.sum_duplicates()
+        keep = top_k * PASSAGES_PER_SOURCE
+        for number in range(len(query.spans)):
+            begin, end = scores.indptr[number], scores.indptr[number + 1]
+            candidates = scores.indices[begin:end]
+            similarities = scores.data[begin:end] / np.maximum(self.norms[candidates], 1e-12)
+            selected = np.flatnonzero(similarities >= min_similarity)
+            if len(selected) > keep:
+                selected = selected[np.argpartition(-similarities[selected], keep)[:keep]]
+            matches = sorted(((float(similarities[i]), int(candidates[i])) for i in selected), reverse=True)
+            
+            documents = set()
+            for similarity, passage in matches:
+                document = int(self.passages[passage]["doc"])
+                if document not in documents:
+                    documents.add(document)
+                    results[number].append((similarity, passage))
+                    if len(results[number]) == top_k:
+                        break
+        return results
@@ -0,0 +1,625 @@
+"""
+Web sources module for AutoType.
+This module fetches candidate source pages from the web for plagiarism checks.
+
+Usage:
+    python -m plagiarism.web <urls>... [--output FILE] [--cache DIR]
+                             [--concurrency 16] [--per_host 4] [--max_age 0]
+
+A check against online sources fetches dozens of candidate pages, each taking
+most of its time waiting on the network. The fetcher overlaps these waits: pages
+are fetched by coroutines on an asyncio event loop, each request running on a
+thread of a bounded pool through one requests session, whose connection pool
+keeps connections to a host open between requests. At most per_host requests go
+to one host at a time. Connection errors, timeouts, broken chunked bodies and
+overloaded responses (429 and 5xx) are retried with exponential backoff,
+honouring Retry-After; other errors, such as a malformed URL, fail at once.
+
+A URL is downloaded at most once per fetcher: later requests for it, including
+those made while it is being fetched, share the first request's result. Pages
+are also kept in an on-disk cache, their bodies stored under the SHA-256 of the
+content, so identical pages are stored once, and their ETag and Last-Modified
+headers kept with the URL. A page fetched before is revalidated with a
+conditional request, and a 304 answer reuses the stored body without
+downloading it again; pages younger than max_age are used without a request.
+Once the stored bodies exceed the size limit, the least recently used pages are
+evicted.
+
+Fetched pages are returned as documents with the same fields as those read by
+plagiarism.documents, so --output writes a .jsonl dump that can be ingested into
+the reference index.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple
+from urllib.parse import urldefrag, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import get_encoding_from_headers
+
+from .documents import html_to_text
+
+
+DEFAULT_WEB_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".autotype", "web_cache")
+
+# Name of the page database in the cache directory, and of the body directory
+PAGES_NAME = "pages.sqlite"
+OBJECTS_NAME = "objects"
+
+# Bump when the stored page format changes; older caches are then dropped
+CACHE_FORMAT = 1
+
+# Bytes of page bodies kept, and the share evicted at once when over the limit
+DEFAULT_MAX_BYTES = 256 << 20
+EVICTION_SHARE = 0.2
+
+# Requests in flight in total and to a single host
+DEFAULT_CONCURRENCY = 16
+DEFAULT_PER_HOST = 4
+
+# Retries after the first attempt, and the delay before the first retry in
+# seconds, doubled for each later one
+DEFAULT_RETRIES = 3
+RETRY_BACKOFF = 0.5
+
+# Longest Retry-After delay honoured, in seconds
+MAX_RETRY_AFTER = 30.0
+
+# Statuses worth retrying: the server is overloaded or failed transiently
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Request errors worth retrying: the network failed transiently
+RETRY_EXCEPTIONS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+# Connect and read timeouts in seconds
+DEFAULT_TIMEOUT = (5.0, 20.0)
+
+# Seconds a cached page is used without revalidation (0 to always revalidate)
+DEFAULT_MAX_AGE = 0.0
+
+# Longest page body read; longer bodies are truncated
+MAX_PAGE_BYTES = 10 << 20
+
+# Bytes read from the network at a time
+READ_CHUNK_SIZE = 64 << 10
+
+# Seconds to wait for another process writing to the cache
+SQLITE_TIMEOUT = 5.0
+
+USER_AGENT = "AutoType-PlagiarismChecker/1.0"
+
+# Content types whose text can be checked
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+TEXT_CONTENT_TYPE_PREFIX = "text/"
+
+
+class CachedPage(NamedTuple):
+    """A page stored in the web cache."""
+    url: str
+    digest: str                         # SHA-256 of the body, naming its object file
+    content_type: str
+    etag: str                           # validators sent back when revalidating
+    last_modified: str
+    fetched: float                      # time.time() of the last download or revalidation
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL so that the same page always gets the same cache entry.
+    
+    The fragment is dropped, as it is never sent to the server, and the scheme
+    and host are lowercased.
+    
+    Args:
+        url: The URL
+    
+    Returns:
+        The normalized URL
+    """
+    parts = urlsplit(urldefrag(url.strip())[0])
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, ""))
+
+
+class WebCache:
+    """Fetched pages on disk: bodies addressed by content, validators in an SQLite database."""
+    
+    def __init__(self, path: str = DEFAULT_WEB_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            path: Cache directory, created if missing
+            max_bytes: Bytes of page bodies kept
+        
+        Raises:
+            OSError: If the directory cannot be created
+            sqlite3.Error: If the database cannot be opened
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(path, OBJECTS_NAME), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(os.path.join(path, PAGES_NAME), timeout=SQLITE_TIMEOUT,
+                                           check_same_thread=False)
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, digest TEXT, "
+                                     "content_type TEXT, etag TEXT, last_modified TEXT, fetched REAL, "
+                                     "size INTEGER, used REAL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS pages_used ON pages (used)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS pages_digest ON pages (digest)")
+            row = self._connection.execute("SELECT value FROM meta WHERE name = 'format'").fetchone()
+            if row is None or row[0] != str(CACHE_FORMAT):
+                with self._connection:
+                    self._connection.execute("DELETE FROM pages")
+                    self._connection.execute("INSERT OR REPLACE INTO meta VALUES ('format', ?)", (str(CACHE_FORMAT),))
+    
+    def _object_path(self, digest: str) -> str:
+        """Path of the file holding a body."""
+        return os.path.join(self.path, OBJECTS_NAME, digest[:2], digest)
+    
+    def get(self, url: str) -> Optional[CachedPage]:
+        """
+        Look up a page.
+        
+        Args:
+            url: Normalized URL of the page
+        
+        Returns:
+            The stored page, or None if it is not stored or its body is missing
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT url, digest, content_type, etag, last_modified, fetched "
+                                           "FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None or not os.path.exists(self._object_path(row[1])):
+            return None
+        return CachedPage(*row)
+    
+    def read(self, page: CachedPage) -> bytes:
+        """
+        Read the body of a stored page.
+        
+        Args:
+            page: The page, from get()
+        
+        Returns:
+            The body
+        
+        Raises:
+            OSError: If the body was evicted since the lookup
+        """
+        with open(self._object_path(page.digest), "rb") as f:
+            body = f.read()
+        with self._lock, self._connection:
+            self._connection.execute("UPDATE pages SET used = ? WHERE url = ?", (time.time(), page.url))
+        return body
+    
+    def put(self, url: str, body: bytes, content_type: str, etag: str, last_modified: str) -> CachedPage:
+        """
+        Store a downloaded page, evicting old ones if over the size limit.
+        
+        Args:
+            url: Normalized URL of the page
+            body: The body
+            content_type: Content-Type header
+            etag: ETag header (empty if none)
+            last_modified: Last-Modified header (empty if none)
+        
+        Returns:
+            The stored page
+        """
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write under a unique name and rename, so readers never see a partial body
+            temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(body)
+            os.replace(temporary, path)
+        
+        now = time.time()
+        with self._lock:
+            with self._connection:
+                self._connection.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                         (url, digest, content_type, etag, last_modified, now, len(body), now))
+            self._evict()
+        return CachedPage(url, digest, content_type, etag, last_modified, now)
+    
+    def touch(self, page: CachedPage) -> CachedPage:
+        """
+        Record that a stored page was revalidated and is still current.
+        
+        Args:
+            page: The page, from get()
+        
+        Returns:
+            The page with its new fetch time
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute("UPDATE pages SET fetched = ?, used = ? WHERE url = ?", (now, now, page.url))
+        return page._replace(fetched=now)
+    
+    def _evict(self) -> None:
+        """Remove the least recently used pages until well under the size limit."""
+        # Bodies shared by several URLs are counted once
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM "
+                                         "(SELECT MAX(size) AS size FROM pages GROUP BY digest)").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        
+        excess = total - self.max_bytes * (1.0 - EVICTION_SHARE)
+        evicted = []
+        for url, size in self._connection.execute("SELECT url, size FROM pages ORDER BY used"):
+            evicted.append((url,))
+            excess -= size
+            if excess <= 0:
+                break
+        with self._connection:
+            self._connection.executemany("DELETE FROM pages WHERE url = ?", evicted)
+        
+        for directory, _, names in os.walk(os.path.join(self.path, OBJECTS_NAME)):
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                referenced = self._connection.execute("SELECT 1 FROM pages WHERE digest = ? LIMIT 1",
+                                                      (name,)).fetchone()
+                if referenced is None:
+                    try:
+                        os.remove(os.path.join(directory, name))
+                    except OSError:
+                        pass
+    
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._connection.close()
+
+
+def _retry_delay(attempt: int, retry_after: str) -> float:
+    """Seconds to wait before retrying, from the attempt number and a Retry-After header."""
+    delay = RETRY_BACKOFF * 2 ** attempt
+    try:
+        return min(max(delay, float(retry_after)), MAX_RETRY_AFTER)
+    except ValueError:
+        pass
+    try:
+        # Retry-After may also be an HTTP date
+        return min(max(delay, parsedate_to_datetime(retry_after).timestamp() - time.time()), MAX_RETRY_AFTER)
+    except (TypeError, ValueError, IndexError):
+        return delay
+
+
+def page_document(url: str, body: bytes, content_type: str) -> Dict[str, str]:
+    """
+    Extract the text of a page.
+    
+    Args:
+        url: URL of the page
+        body: The body
+        content_type: Content-Type header
+    
+    Returns:
+        Dictionary with id, text, title and url, as read by plagiarism.documents;
+        the text is empty for content other than HTML and plain text
+    """
+    media_type = content_type.split(";")[0].strip().lower()
+    encoding = get_encoding_from_headers({"content-type": content_type}) if "charset" in content_type else "utf-8"
+    try:
+        decoded = body.decode(encoding, errors="replace")
+    except LookupError:
+        decoded = body.decode("utf-8", errors="replace")
+    
+    if media_type in HTML_CONTENT_TYPES or (not media_type and decoded.lstrip()[:1] == "<"):
+        extracted = html_to_text(decoded)
+        return {"id": url, "text": extracted["text"], "title": extracted["title"], "url": url}
+    if not media_type or media_type.startswith(TEXT_CONTENT_TYPE_PREFIX):
+        return {"id": url, "text": decoded, "title": "", "url": url}
+    return {"id": url, "text": "", "title": "", "url": url}
+
+
+class WebFetcher:
+    """
+    Fetches pages concurrently on an asyncio event loop, each at most once.
+    
+    A fetcher belongs to the event loop it is first used on. Close it, or use it
+    as a context manager, to release its threads and connections.
+    """
+    
+    def __init__(self, cache: Optional[WebCache] = None, concurrency: int = DEFAULT_CONCURRENCY,
+                 per_host: int = DEFAULT_PER_HOST, retries: int = DEFAULT_RETRIES,
+                 timeout: Tuple[float, float] = DEFAULT_TIMEOUT, max_age: float = DEFAULT_MAX_AGE):
+        """
+        Args:
+            cache: Cache to revalidate pages against and store them in (None for no cache)
+            concurrency: Requests in flight in total
+            per_host: Requests in flight to a single host
+            retries: Retries of a failed request
+            timeout: Connect and read timeouts in seconds
+            max_age: Seconds a cached page is used without revalidation
+        """
+        self.cache = cache
+        self.per_host = per_host
+        self.retries = retries
+        self.timeout = timeout
+        self.max_age = max_age
+        self.stats: Counter = Counter()
+        
+        self._session = requests.Session()
+        self._session.headers["User-Agent"] = USER_AGENT
+        # Connections are kept per host, up to one per request in flight
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(concurrency, thread_name_prefix="web-fetch")
+        
+        # Normalized URL -> task fetching it, kept once done so the page is reused
+        self._pages: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+    
+    def __enter__(self) -> "WebFetcher":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def close(self) -> None:
+        """Release the threads and connections."""
+        self._executor.shutdown(wait=True)
+        self._session.close()
+    
+    def _request(self, url: str, headers: Dict[str, str]) -> Tuple[int, Mapping[str, str], bytes]:
+        """Make one request and read its body, on a pool thread."""
+        with self._session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+            # Bodies of other statuses are read too, as only a connection whose
+            # response was read to the end goes back to the pool
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(READ_CHUNK_SIZE):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= MAX_PAGE_BYTES:
+                    break
+            body = b"".join(chunks)[:MAX_PAGE_BYTES] if response.status_code == 200 else b""
+            return response.status_code, response.headers, body
+    
+    def _lookup(self, url: str) -> Optional[CachedPage]:
+        """Look a page up in the cache, on a pool thread."""
+        try:
+            return self.cache.get(url)
+        except sqlite3.Error:
+            return None
+    
+    def _store(self, url: str, body: bytes, headers: Mapping[str, str]) -> Optional[CachedPage]:
+        """Store a downloaded page, on a pool thread."""
+        try:
+            return self.cache.put(url, body, headers.get("Content-Type", ""), headers.get("ETag", ""),
+                                  headers.get("Last-Modified", ""))
+        except (OSError, sqlite3.Error):
+            # A cache that cannot be written only costs later downloads
+            return None
+    
+    def _touch(self, page: CachedPage) -> None:
+        """Record a revalidation, on a pool thread."""
+        try:
+            self.cache.touch(page)
+        except sqlite3.Error:
+            pass
+    
+    def _read(self, page: CachedPage) -> Optional[bytes]:
+        """Read a stored body, on a pool thread."""
+        try:
+            return self.cache.read(page)
+        except (OSError, sqlite3.Error):
+            return None
+    
+    async def fetch(self, url: str) -> Dict[str, Any]:
+        """
+        Fetch a page, or get the result of an earlier or ongoing fetch of it.
+        
+        Args:
+            url: URL of the page
+        
+        Returns:
+            The page document (see page_document) with the status, the content
+            type, where the body came from ("network", "revalidated" or "cache")
+            and an error message (None on success)
+        """
+        url = normalize_url(url)
+        task = self._pages.get(url)
+        if task is None:
+            task = self._pages[url] = asyncio.ensure_future(self._fetch(url))
+        else:
+            self.stats["shared"] += 1
+        # Callers that are cancelled must not cancel the fetch shared with others
+        return await asyncio.shield(task)
+    
+    async def fetch_many(self, urls: List[str]) -> List[Dict[str, Any]]:
+        """
+        Fetch pages concurrently.
+        
+        Args:
+            urls: URLs of the pages; duplicates are fetched once
+        
+        Returns:
+            The results of fetch(), in URL order
+        """
+        return list(await asyncio.gather(*(self.fetch(url) for url in urls)))
+    
+    async def _fetch(self, url: str) -> Dict[str, Any]:
+        """Fetch a page that no other caller is fetching."""
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(self._executor, self._lookup, url) if self.cache is not None else None
+        if cached is not None and time.time() - cached.fetched < self.max_age:
+            body = await loop.run_in_executor(self._executor, self._read, cached)
+            if body is not None:
+                self.stats["cache"] += 1
+                return self._result(url, 200, body, cached.content_type, "cache")
+            cached = None
+        
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        
+        host = urlsplit(url).netloc
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        
+        error = ""
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+            retry_after = ""
+            async with limit:
+                try:
+                    status, response_headers, body = await loop.run_in_executor(
+                        self._executor, self._request, url, headers)
+                except RETRY_EXCEPTIONS as e:
+                    status, error = 0, str(e)
+                except requests.RequestException as e:
+                    self.stats["failed"] += 1
+                    return self._result(url, 0, b"", "", "network", str(e))
+            
+            if status == 304 and cached is not None:
+                body = await loop.run_in_executor(self._executor, self._read, cached)
+                if body is not None:
+                    self.stats["revalidated"] += 1
+                    await loop.run_in_executor(self._executor, self._touch, cached)
+                    return self._result(url, 200, body, cached.content_type, "revalidated")
+                # The body was evicted meanwhile, so download it unconditionally
+                headers, cached, error = {}, None, "Cached page evicted while revalidating"
+                continue
+            if status == 200:
+                self.stats["downloaded"] += 1
+                if self.cache is not None:
+                    await loop.run_in_executor(self._executor, self._store, url, body, response_headers)
+                return self._result(url, 200, body, response_headers.get("Content-Type", ""), "network")
+            if status and status not in RETRY_STATUSES:
+                self.stats["failed"] += 1
+                return self._result(url, status, b"", "", "network", f"HTTP {status}")
+            
+            if status:
+                error = f"HTTP {status}"
+                retry_after = response_headers.get("Retry-After", "")
+            if attempt < self.retries:
+                await asyncio.sleep(_retry_delay(attempt, retry_after))
+        
+        self.stats["failed"] += 1
+        return self._result(url, status, b"", "", "network", error)
+    
+    def _result(self, url: str, status: int, body: bytes, content_type: str, origin: str,
+                error: Optional[str] = None) -> Dict[str, Any]:
+        """Build the result of a fetch."""
+        result: Dict[str, Any] = page_document(url, body, content_type)
+        result.update({"status": status, "contentType": content_type, "origin": origin, "error": error})
+        return result
+
+
+def get_web_cache(path: Optional[str] = DEFAULT_WEB_CACHE_PATH) -> Optional[WebCache]:
+    """
+    Open a web cache.
+    
+    Args:
+        path: Cache directory (None for no cache)
+    
+    Returns:
+        The cache, or None if no path is given or it cannot be opened there
+    """
+    if path is None:
+        return None
+    try:
+        return WebCache(path)
+    except (OSError, sqlite3.Error):
+        return None
+
+
+def fetch_pages(urls: List[str], cache_path: Optional[str] = DEFAULT_WEB_CACHE_PATH,
+                concurrency: int = DEFAULT_CONCURRENCY, per_host: int = DEFAULT_PER_HOST,
+                retries: int = DEFAULT_RETRIES, max_age: float = DEFAULT_MAX_AGE) -> Dict[str, Any]:
+    """
+    Fetch pages concurrently, from synchronous code.
+    
+    Args:
+        urls: URLs of the pages; duplicates are fetched once
+        cache_path: Cache directory (None for no cache)
+        concurrency: Requests in flight in total
+        per_host: Requests in flight to a single host
+        retries: Retries of a failed request
+        max_age: Seconds a cached page is used without revalidation
+    
+    Returns:
+        Dictionary with the results of WebFetcher.fetch() in URL order, the
+        fetcher's counts (downloaded, revalidated, cache, shared, retries,
+        failed) and the time taken
+    """
+    start = time.perf_counter()
+    cache = get_web_cache(cache_path)
+    
+    async def fetch_all() -> Tuple[List[Dict[str, Any]], Counter]:
+        with WebFetcher(cache, concurrency, per_host, retries, max_age=max_age) as fetcher:
+            return await fetcher.fetch_many(urls), fetcher.stats
+    
+    try:
+        pages, stats = asyncio.run(fetch_all())
+    finally:
+        if cache is not None:
+            cache.close()
+    return {"pages": pages, "stats": dict(stats), "seconds": time.perf_counter() - start}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Command-line entry point.
+    
+    Args:
+        argv: Command-line arguments (defaults to sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Fetch web pages as reference documents")
+    parser.add_argument("urls", nargs="+", help="URLs of the pages")
+    parser.add_argument("--output", default=None, help="Write the fetched documents to this .jsonl file")
+    parser.add_argument("--cache", default=DEFAULT_WEB_CACHE_PATH, help="Cache directory")
+    parser.add_argument("--no_cache", action="store_true", help="Neither read nor store cached pages")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Requests in flight in total")
+    parser.add_argument("--per_host", type=int, default=DEFAULT_PER_HOST, help="Requests in flight to a single host")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="Retries of a failed request")
+    parser.add_argument("--max_age", type=float, default=DEFAULT_MAX_AGE,
+                        help="Seconds a cached page is used without revalidation")
+    args = parser.parse_args(argv)
+    
+    result = fetch_pages(args.urls, None if args.no_cache else args.cache, args.concurrency, args.per_host,
+                         args.retries, args.max_age)
+    if args.output:
+        written = set()
+        with open(args.output, "w", encoding="utf-8") as f:
+            for page in result["pages"]:
+                if page["error"] is None and page["text"] and page["id"] not in written:
+                    written.add(page["id"])
+                    f.write(json.dumps({key: page[key] for key in ("id", "text", "title", "url")}) + "\n")
+    
+    stats = result["stats"]
+    print(f"Fetched {len(result['pages'])} pages in {result['seconds']:.1f} s: "
+          f"{stats.get('downloaded', 0)} downloaded, {stats.get('revalidated', 0)} revalidated, "
+          f"{stats.get('cache', 0)} from the cache, {stats.get('failed', 0)} failed")
+    for page in result["pages"]:
+        if page["error"] is not None:
+            print(f"  {page['url']}: {page['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,26 @@ Tone analyzer module for AutoType.
 This module analyzes and adjusts the tone of text.
 """
 
-from typing import Dict, List, Any, Tuple
-import re
+from typing import Dict, List, Any, Optional, Tuple
 
+from nlp.model_service import parse_if_available
+from .heatmap import ToneProfile
+from .indicators import count_indicators, count_words, score_dimensions
+from .readability import readability_from_counts
+from .registry import get_preset_registry
+from .rules import (DEFAULT_RULE_SETS, LESS_FORMAL, LESS_TECHNICAL, MORE_FORMAL, MORE_TECHNICAL,
+                    ToneRuleSet, apply_rule_sets)
+from .targeting import DEFAULT_TOLERANCE, seek_tone
 
-def analyze_tone(text: str) -> Dict[str, Any]:
+
+def analyze_tone(text: str, use_nlp: bool = False, heatmap_buckets: int = 0) -> Dict[str, Any]:
     """
     Analyze the tone of the given text.
     
     Args:
         text: The text to analyze
+        use_nlp: Whether to add part-of-speech features from the shared spaCy pipeline
+        heatmap_buckets: If positive, add a per-section heatmap with up to this many buckets
     
     Returns:
         Dictionary with tone analysis results
@@ -20,63 +30,83 @@ def analyze_tone(text: str) -> Dict[str, Any]:
     # This is a placeholder that would contain actual tone analysis logic
     # In a real implementation, this would use NLP libraries or API calls
     
-    # Calculate some basic metrics
-    formality_score = calculate_formality(text)
-    technical_level = calculate_technical_level(text)
+    if heatmap_buckets > 0:
+        # The per-sentence pass also gives the whole-text scores and word counts
+        profile = ToneProfile(text)
+        scores = profile.window_scores(0, profile.sentence_count)
+        words, sentences = profile.words, profile.counted_sentences
+    else:
+        # Count all words in one pass and score every dimension from the counts
+        words, sentences = count_words(text)
+        scores = score_dimensions(words)
+    # Readability comes from the same word counts
+    results = summarize_tone(scores, readability_from_counts(words, sentences))
+    
+    if heatmap_buckets > 0:
+        results["heatmap"] = profile.heatmap(heatmap_buckets)
     
-    # Return analysis results
-    return {
-        "formality": formality_score,
-        "technical_level": technical_level,
-        "closest_preset": get_closest_preset(formality_score, technical_level)
-    }
+    if use_nlp:
+        doc = parse_if_available([text], "tone")[0]
+        if doc is not None:
+            results["pos_profile"] = calculate_pos_profile(doc)
+    
+    return results
 
 
-def calculate_formality(text: str) -> float:
+def summarize_tone(scores: Dict[str, float], readability: Dict[str, float]) -> Dict[str, Any]:
     """
-    Calculate the formality score of the text.
+    Assemble a tone analysis from dimension scores and readability metrics.
     
     Args:
-        text: The text to analyze
+        scores: Dimension name -> score, see score_dimensions
+        readability: Readability metrics, see readability_from_counts
     
     Returns:
-        Formality score from 1 (informal) to 5 (formal)
+        Dictionary with formality, technical_level, the readability metrics and
+        the closest preset over all of them
     """
-    # This is a placeholder that would contain actual formality calculation logic
-    # For now, just do some basic checks
-    
-    formality_indicators = {
-        r'\bI\b': -0.5,            # First person pronouns (informal)
-        r'\byou\b': -0.5,          # Second person pronouns (informal)
-        r'\bwe\b': -0.3,           # First person plural (somewhat informal)
-        r'\bgonna\b': -1.0,        # Contractions and slang (very informal)
-        r'\bwanna\b': -1.0,
-        r'\bcool\b': -0.5,
-        r'\bawesome\b': -0.5,
-        r'\bstuff\b': -0.5,
-        r'\bthing\b': -0.3,
-        r'\bretains\b': 0.5,       # Formal verbs
-        r'\bfacilitate\b': 0.5,
-        r'\bpursuant\b': 1.0,      # Legal/formal terms
-        r'\bhereby\b': 1.0,
-        r'\bthus\b': 0.5,
-        r'\bconsequently\b': 0.5,
-        r'\bnevertheless\b': 0.5,
-        r'\btherefore\b': 0.3,
+    results: Dict[str, Any] = {
+        "formality": scores["formality"],
+        "technical_level": scores["technical_level"],
     }
+    results.update(readability)
+    results["closest_preset"] = get_preset_registry().get_tone_index().nearest(results)
+    return results
+
+
+def calculate_pos_profile(doc: Any) -> Dict[str, float]:
+    """
+    Calculate part-of-speech ratios that correlate with tone.
+    
+    Args:
+        doc: spaCy Doc of the text, tagged by the shared model service
     
-    # Start with a neutral formality (3.0)
-    score = 3.0
+    Returns:
+        Dictionary of part-of-speech tags to their share of all words
+    """
+    words = [token for token in doc if not token.is_punct and not token.is_space]
+    if not words:
+        return {}
     
-    # Check for indicators
-    for pattern, weight in formality_indicators.items():
-        matches = len(re.findall(pattern, text, re.IGNORECASE))
-        score += matches * weight
+    counts: Dict[str, int] = {}
+    for token in words:
+        counts[token.pos_] = counts.get(token.pos_, 0) + 1
+    
+    # Pronouns and interjections read informal, nouns and adjectives formal/technical
+    return {pos: counts.get(pos, 0) / len(words) for pos in ("PRON", "INTJ", "NOUN", "ADJ", "VERB", "ADV")}
+
+
+def calculate_formality(text: str) -> float:
+    """
+    Calculate the formality score of the text.
     
-    # Normalize to 1-5 range
-    score = max(1.0, min(5.0, score))
+    Args:
+        text: The text to analyze
     
-    return score
+    Returns:
+        Formality score from 1 (informal) to 5 (formal)
+    """
+    return score_dimensions(count_indicators(text))["formality"]
 
 
 def calculate_technical_level(text: str) -> float:
@@ -89,44 +119,7 @@ def calculate_technical_level(text: str) -> float:
     Returns:
         Technical level score from 1 (non-technical) to 5 (highly technical)
     """
-    # This is a placeholder that would contain actual technical level calculation logic
-    # For now, just do some basic checks
-    
-    technical_indicators = {
-        r'\balgorithm\b': 0.5,
-        r'\bimplementation\b': 0.3,
-        r'\bfunction\b': 0.3,
-        r'\bmethod\b': 0.3,
-        r'\bvariable\b': 0.3,
-        r'\bparameter\b': 0.3,
-        r'\binterface\b': 0.5,
-        r'\bprotocol\b': 0.5,
-        r'\bmodule\b': 0.3,
-        r'\blibrary\b': 0.3,
-        r'\babstraction\b': 0.5,
-        r'\bencapsulation\b': 0.5,
-        r'\binheritance\b': 0.5,
-        r'\bpolymorphism\b': 0.5,
-        r'\basynchronous\b': 0.5,
-        r'\bsynchronous\b': 0.5,
-        r'\bconcurrency\b': 0.5,
-        r'\bparallelism\b': 0.5,
-        r'\bmultithreading\b': 0.5,
-        r'\barchitecture\b': 0.3,
-    }
-    
-    # Start with a neutral technical level (3.0)
-    score = 3.0
-    
-    # Check for indicators
-    for pattern, weight in technical_indicators.items():
-        matches = len(re.findall(pattern, text, re.IGNORECASE))
-        score += matches * weight
-    
-    # Normalize to 1-5 range
-    score = max(1.0, min(5.0, score))
-    
-    return score
+    return score_dimensions(count_indicators(text))["technical_level"]
 
 
 def get_closest_preset(formality: float, technical_level: float) -> str:
@@ -140,32 +133,26 @@ def get_closest_preset(formality: float, technical_level: float) -> str:
     Returns:
         Name of the closest preset
     """
-    # Preset characteristics
-    presets = {
-        "academic": {"formality": 5.0, "technical_level": 4.0},
-        "casual": {"formality": 1.0, "technical_level": 2.0},
-        "professional": {"formality": 4.0, "technical_level": 3.0},
-        "technical": {"formality": 3.0, "technical_level": 5.0},
-        "creative": {"formality": 2.0, "technical_level": 1.0},
-    }
-    
-    # Find the closest preset
-    closest_preset = None
-    closest_distance = float('inf')
+    return get_preset_registry().get_tone_index().nearest({"formality": formality, "technical_level": technical_level})
+
+
+def get_closest_presets(profile: Dict[str, Any], k: int = 3) -> List[Dict[str, Any]]:
+    """
+    Get the tone presets closest to a tone profile.
     
-    for preset_name, preset_values in presets.items():
-        # Calculate Euclidean distance
-        distance = ((formality - preset_values["formality"]) ** 2 + 
-                   (technical_level - preset_values["technical_level"]) ** 2) ** 0.5
-        
-        if distance < closest_distance:
-            closest_distance = distance
-            closest_preset = preset_name
+    Args:
+        profile: Tone analysis (see analyze_tone); every tone dimension it contains is compared
+        k: Number of presets to return
     
-    return closest_preset
+    Returns:
+        List of dictionaries with preset id and distance, closest first
+    """
+    return [{"id": preset_id, "distance": distance}
+            for preset_id, distance in get_preset_registry().get_tone_index().query(profile, k)]
 
 
-def adjust_tone(text: str, target_formality: float, target_technical_level: float) -> str:
+def adjust_tone(text: str, target_formality: float, target_technical_level: float,
+                iterative: bool = False, tolerance: float = DEFAULT_TOLERANCE) -> str:
     """
     Adjust the tone of the text to match the target formality and technical level.
     
@@ -173,32 +160,59 @@ def adjust_tone(text: str, target_formality: float, target_technical_level: floa
         text: The text to adjust
         target_formality: Target formality level (1-5)
         target_technical_level: Target technical level (1-5)
+        iterative: Whether to keep rewriting until the scores are within tolerance
+            of the target (see tone.targeting.seek_tone)
+        tolerance: Maximum remaining difference per dimension in iterative mode
     
     Returns:
         The adjusted text
     """
+    if iterative:
+        return seek_tone(text, target_formality, target_technical_level, tolerance)["text"]
+    
     # This is a placeholder that would contain actual tone adjustment logic
     # In a real implementation, this would use NLP libraries or API calls
     
     # Analyze current tone
     current_tone = analyze_tone(text)
     
+    # Apply adjustments
+    return apply_rule_sets(text, plan_adjustments(current_tone, target_formality, target_technical_level))
+
+
+def plan_adjustments(current_tone: Dict[str, Any], target_formality: float,
+                     target_technical_level: float,
+                     rule_sets: Optional[Dict[str, ToneRuleSet]] = None) -> List[ToneRuleSet]:
+    """
+    Choose the rule sets that move a text from its current tone towards a target.
+    
+    Args:
+        current_tone: Tone analysis of the text (see analyze_tone)
+        target_formality: Target formality level (1-5)
+        target_technical_level: Target technical level (1-5)
+        rule_sets: Rule set name -> rule set to choose from (defaults to tone.rules.DEFAULT_RULE_SETS)
+    
+    Returns:
+        Rule sets in the order they should be applied
+    """
     # Determine adjustments needed
     formality_change = target_formality - current_tone["formality"]
     technical_change = target_technical_level - current_tone["technical_level"]
     
-    # Apply adjustments
-    adjusted_text = text
+    if rule_sets is None:
+        rule_sets = DEFAULT_RULE_SETS
+    
+    plan = []
     
     # Adjust formality
     if abs(formality_change) > 0.5:
-        adjusted_text = adjust_formality(adjusted_text, formality_change)
+        plan.append(rule_sets["more_formal" if formality_change > 0 else "less_formal"])
     
     # Adjust technical level
     if abs(technical_change) > 0.5:
-        adjusted_text = adjust_technical_level(adjusted_text, technical_change)
+        plan.append(rule_sets["more_technical" if technical_change > 0 else "less_technical"])
     
-    return adjusted_text
+    return plan
 
 
 def adjust_formality(text: str, formality_change: float) -> str:
@@ -213,53 +227,11 @@ def adjust_formality(text: str, formality_change: float) -> str:
         The adjusted text
     """
     # This is a placeholder that would contain actual formality adjustment logic
-    # For now, just do some basic replacements
+    # For now, just do some basic replacements (see tone.rules)
     
     if formality_change > 0:
-        # Make more formal
-        replacements = {
-            r'\bdon\'t\b': 'do not',
-            r'\bcan\'t\b': 'cannot',
-            r'\bwon\'t\b': 'will not',
-            r'\bI\b': 'one',
-            r'\bwe\b': 'one',
-            r'\byou\b': 'one',
-            r'\bthing\b': 'matter',
-            r'\bstuff\b': 'materials',
-            r'\blot\b': 'significant amount',
-            r'\bgot\b': 'obtained',
-            r'\bget\b': 'obtain',
-            r'\bwant\b': 'desire',
-            r'\bneed\b': 'require',
-            r'\buse\b': 'utilize',
-            r'\bmake\b': 'create',
-            r'\bshow\b': 'demonstrate',
-        }
-    else:
-        # Make less formal
-        replacements = {
-            r'\butilize\b': 'use',
-            r'\bobtain\b': 'get',
-            r'\brequire\b': 'need',
-            r'\bdesire\b': 'want',
-            r'\bdemonstrate\b': 'show',
-            r'\bpurchase\b': 'buy',
-            r'\binform\b': 'tell',
-            r'\bprovide\b': 'give',
-            r'\bassist\b': 'help',
-            r'\bconsider\b': 'think about',
-            r'\bdiscuss\b': 'talk about',
-            r'\bcommunicate\b': 'talk',
-            r'\bcommence\b': 'start',
-            r'\bterminate\b': 'end',
-            r'\bfacilitate\b': 'help',
-        }
-    
-    # Apply replacements
-    for pattern, replacement in replacements.items():
-        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-    
-    return text
+        return MORE_FORMAL.apply(text)
+    return LESS_FORMAL.apply(text)
 
 
 def adjust_technical_level(text: str, technical_change: float) -> str:
@@ -274,47 +246,8 @@ def adjust_technical_level(text: str, technical_change: float) -> str:
         The adjusted text
     """
     # This is a placeholder that would contain actual technical level adjustment logic
-    # For now, just do some basic replacements
+    # For now, just do some basic replacements (see tone.rules)
     
     if technical_change > 0:
-        # Make more technical
-        replacements = {
-            r'\buse\b': 'implement',
-            r'\bfix\b': 'resolve',
-            r'\bfast\b': 'high-performance',
-            r'\bloop\b': 'iteration',
-            r'\berror\b': 'exception',
-            r'\bspeed\b': 'throughput',
-            r'\bsize\b': 'payload dimension',
-            r'\bcheck\b': 'validate',
-            r'\bsend\b': 'transmit',
-            r'\bget\b': 'retrieve',
-            r'\bkeep\b': 'persist',
-            r'\bwait\b': 'block',
-            r'\bstop\b': 'terminate',
-            r'\blook at\b': 'analyze',
-        }
-    else:
-        # Make less technical
-        replacements = {
-            r'\bimplementation\b': 'way it works',
-            r'\bfunctionality\b': 'features',
-            r'\butilization\b': 'use',
-            r'\binterface\b': 'screen',
-            r'\balgorithm\b': 'process',
-            r'\bconfiguration\b': 'settings',
-            r'\basynchronous\b': 'background',
-            r'\bperformance optimization\b': 'speed improvements',
-            r'\bencapsulation\b': 'grouping',
-            r'\bexception handling\b': 'error checking',
-            r'\brefactoring\b': 'rewriting',
-            r'\bdependency\b': 'requirement',
-            r'\barchitecture\b': 'design',
-            r'\bparameterize\b': 'set options for',
-        }
-    
-    # Apply replacements
-    for pattern, replacement in replacements.items():
-        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-    
-    return text 
\ No newline at end of file
+        return MORE_TECHNICAL.apply(text)
+    return LESS_TECHNICAL.apply(text)
@@ -0,0 +1,271 @@
+"""
+Corpus tone analysis module for AutoType.
+This module analyzes the tone of many documents at once, for calibrating presets.
+
+Usage:
+    python -m tone.corpus <documents> <output.npz> [--workers N] [--counts]
+
+Documents are streamed from a .txt or .jsonl file, or a directory of them (one
+document per .txt file, one {"id": ..., "text": ...} object per .jsonl line).
+Each document is tokenized once into a row of a document x feature count matrix:
+one column per indicator word, plus the word, sentence, syllable, letter and
+complex-word totals. Every score is then computed for all documents at once with
+NumPy, and the results are written as a columnar .npz file with one array per
+column.
+"""
+
+import argparse
+import json
+import os
+from multiprocessing import Pool
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .indicators import (DIMENSION_NAMES, INDICATOR_WEIGHTS, MAX_SCORE, MIN_SCORE, NEUTRAL_SCORE,
+                         count_words)
+from .readability import (FLESCH_BASE, FLESCH_SENTENCE_LENGTH_WEIGHT, FLESCH_SYLLABLES_PER_WORD_WEIGHT,
+                          FOG_WEIGHT, readability_totals)
+from .registry import get_preset_registry
+
+
+# Feature columns: indicator words, then the readability totals
+INDICATOR_FEATURES = sorted(INDICATOR_WEIGHTS)
+TOTAL_FEATURES = ["words", "sentences", "syllables", "letters", "complex_words"]
+FEATURE_NAMES = INDICATOR_FEATURES + TOTAL_FEATURES
+FEATURE_COLUMNS = {name: column for column, name in enumerate(FEATURE_NAMES)}
+INDICATOR_COLUMNS = {word: FEATURE_COLUMNS[word] for word in INDICATOR_FEATURES}
+
+# Indicator feature x dimension weights, so totals are one matrix product
+WEIGHT_MATRIX = np.array([INDICATOR_WEIGHTS[word] for word in INDICATOR_FEATURES],
+                         dtype=np.float64).reshape(len(INDICATOR_FEATURES), len(DIMENSION_NAMES))
+
+# Documents counted per batch (and per task when using worker processes)
+DEFAULT_BATCH_SIZE = 512
+
+DOCUMENT_EXTENSIONS = (".txt", ".jsonl")
+
+
+def iter_documents(path: str) -> Iterator[Tuple[str, str]]:
+    """
+    Stream documents from a file or directory.
+    
+    Args:
+        path: A .txt or .jsonl file, or a directory searched recursively for them
+    
+    Yields:
+        Tuples of (document ID, text)
+    """
+    if os.path.isdir(path):
+        for root, directories, files in os.walk(path):
+            directories.sort()
+            for name in sorted(files):
+                if name.endswith(DOCUMENT_EXTENSIONS):
+                    file_path = os.path.join(root, name)
+                    yield from _iter_file(file_path, os.path.relpath(file_path, path))
+    else:
+        yield from _iter_file(path, os.path.basename(path))
+
+
+def _iter_file(path: str, name: str) -> Iterator[Tuple[str, str]]:
+    """Yield the documents of one .txt or .jsonl file."""
+    if not path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            yield name, f.read()
+        return
+    
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                yield f"{name}:{line_number}", record
+            else:
+                yield str(record.get("id", f"{name}:{line_number}")), record.get("text", "")
+
+
+def count_document(text: str) -> List[int]:
+    """
+    Count the features of one document in a single pass.
+    
+    Args:
+        text: The document text
+    
+    Returns:
+        Feature counts in FEATURE_NAMES order
+    """
+    words, sentences = count_words(text)
+    row = [0] * len(FEATURE_NAMES)
+    for word, count in words.items():
+        column = INDICATOR_COLUMNS.get(word)
+        if column is not None:
+            row[column] = count
+    
+    word_total, syllable_total, letter_total, complex_total = readability_totals(words)
+    row[len(INDICATOR_FEATURES):] = [word_total, sentences, syllable_total, letter_total, complex_total]
+    return row
+
+
+def count_batch(texts: List[str]) -> np.ndarray:
+    """
+    Count the features of a batch of documents.
+    
+    Args:
+        texts: Document texts
+    
+    Returns:
+        Count matrix with one row per document
+    """
+    return np.array([count_document(text) for text in texts], dtype=np.int64).reshape(len(texts), len(FEATURE_NAMES))
+
+
+def count_corpus(documents: Iterable[Tuple[str, str]], batch_size: int = DEFAULT_BATCH_SIZE,
+                 workers: int = 1) -> Tuple[List[str], np.ndarray]:
+    """
+    Build the document x feature count matrix of a stream of documents.
+    
+    Args:
+        documents: Iterable of (document ID, text)
+        batch_size: Number of documents counted per batch
+        workers: Number of worker processes (1 to count in this process)
+    
+    Returns:
+        Tuple of (document IDs, count matrix with one row per document)
+    """
+    ids: List[str] = []
+    
+    def batches() -> Iterator[List[str]]:
+        texts = []
+        for document_id, text in documents:
+            ids.append(document_id)
+            texts.append(text)
+            if len(texts) >= batch_size:
+                yield texts
+                texts = []
+        if texts:
+            yield texts
+    
+    if workers > 1:
+        with Pool(workers) as pool:
+            blocks = list(pool.imap(count_batch, batches()))
+    else:
+        blocks = [count_batch(texts) for texts in batches()]
+    
+    if not blocks:
+        return ids, np.zeros((0, len(FEATURE_NAMES)), dtype=np.int64)
+    return ids, np.concatenate(blocks)
+
+
+def score_counts(counts: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Compute the tone and readability scores of every document at once.
+    
+    The values match what analyze_tone reports for each document, except that
+    readability metrics are not rounded.
+    
+    Args:
+        counts: Count matrix from count_corpus
+    
+    Returns:
+        Dictionary of score name -> array with one value per document
+    """
+    totals = counts[:, :len(INDICATOR_FEATURES)] @ WEIGHT_MATRIX
+    columns = {name: np.clip(NEUTRAL_SCORE + totals[:, index], MIN_SCORE, MAX_SCORE)
+               for index, name in enumerate(DIMENSION_NAMES)}
+    
+    words, sentences, syllables, letters, complex_words = (
+        counts[:, FEATURE_COLUMNS[name]].astype(np.float64) for name in TOTAL_FEATURES)
+    has_words = words > 0
+    safe_words = np.where(has_words, words, 1.0)
+    words_per_sentence = words / np.maximum(sentences, 1.0)
+    
+    readability = {
+        "flesch_reading_ease": (FLESCH_BASE - FLESCH_SENTENCE_LENGTH_WEIGHT * words_per_sentence
+                                - FLESCH_SYLLABLES_PER_WORD_WEIGHT * (syllables / safe_words)),
+        "gunning_fog": FOG_WEIGHT * (words_per_sentence + 100.0 * complex_words / safe_words),
+        "average_sentence_length": words_per_sentence,
+        "average_word_length": letters / safe_words,
+    }
+    for name, values in readability.items():
+        columns[name] = np.where(has_words, values, 0.0)
+    
+    return columns
+
+
+def analyze_corpus(path: str, output: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                   workers: int = 1, include_counts: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Analyze the tone of every document under a path.
+    
+    Args:
+        path: A .txt or .jsonl file, or a directory of them
+        output: If given, the .npz file the columns are written to
+        batch_size: Number of documents counted per batch
+        workers: Number of worker processes
+        include_counts: Whether to include the raw count matrix and feature names
+    
+    Returns:
+        Dictionary of column name -> array with one entry per document; "id" holds
+        the document IDs and "closest_preset" the closest preset of each
+    """
+    ids, counts = count_corpus(iter_documents(path), batch_size, workers)
+    
+    columns: Dict[str, np.ndarray] = {"id": np.array(ids, dtype=str)}
+    columns.update(score_counts(counts))
+    columns["closest_preset"] = np.array(get_preset_registry().get_tone_index().nearest_many(columns), dtype=str)
+    
+    if include_counts:
+        columns["counts"] = counts
+        columns["feature_names"] = np.array(FEATURE_NAMES, dtype=str)
+    
+    if output:
+        save_columns(output, columns)
+    
+    return columns
+
+
+def save_columns(path: str, columns: Dict[str, np.ndarray]) -> None:
+    """
+    Write columns to an .npz file, one array per column.
+    
+    Args:
+        path: Path to the output file
+        columns: Column name -> array
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    
+    # Write to a temporary file first, so readers never see a partial file
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as f:
+        np.savez(f, **columns)
+    os.replace(temporary_path, path)
+
+
+def load_columns(path: str) -> Dict[str, np.ndarray]:
+    """
+    Read columns written by save_columns.
+    
+    Args:
+        path: Path to the .npz file
+    
+    Returns:
+        Column name -> array
+    """
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze the tone of a corpus of documents")
+    parser.add_argument("documents", help=".txt or .jsonl file, or a directory of them")
+    parser.add_argument("output", help="Output .npz file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("--batch_size", type=int, default=DEFAULT_BATCH_SIZE, help="Documents per batch")
+    parser.add_argument("--counts", action="store_true", help="Also store the raw count matrix")
+    cli_args = parser.parse_args()
+    
+    result = analyze_corpus(cli_args.documents, cli_args.output, cli_args.batch_size, cli_args.workers,
+                            cli_args.counts)
+    print(f"Analyzed {len(result['id'])} documents into {cli_args.output}")
@@ -0,0 +1,140 @@
+"""
+Tone heatmap module for AutoType.
+This module shows where the tone of a long document drifts.
+
+A single pass counts the indicators of every sentence and stores running (prefix)
+sums of the weighted totals and of the word counts. The totals of any range of
+sentences are then the difference of two prefix sums, so windows and sections are
+scored in O(1).
+
+Ranges are scored on indicator density rather than raw totals: a range's totals
+are divided by its word count and scaled to a reference length. Heatmap buckets
+share one reference length, the mean words per bucket, so a long bucket does not
+saturate just because it holds more indicators than a short one.
+"""
+
+import bisect
+from collections import Counter
+from itertools import accumulate
+from typing import Any, Dict, List, Optional, Tuple
+
+from .indicators import DIMENSION_NAMES, SENTENCE_BREAK_PATTERN, count_words, indicator_totals, score_from_total
+
+
+class ToneProfile:
+    """Per-sentence indicator totals of a text, with prefix sums for range queries."""
+    
+    def __init__(self, text: str):
+        """
+        Args:
+            text: The text to profile
+        """
+        self.length = len(text)
+        self.sentence_starts: List[int] = []
+        sentence_totals: List[Tuple[float, ...]] = []
+        sentence_words: List[int] = []
+        
+        # Word and sentence counts of the whole text, as count_words gives them
+        self.words: Counter = Counter()
+        self.counted_sentences = 0
+        
+        start = 0
+        for match in SENTENCE_BREAK_PATTERN.finditer(text):
+            self.sentence_starts.append(start)
+            self._count(text[start:match.start()], sentence_totals, sentence_words)
+            start = match.end()
+        self.sentence_starts.append(start)
+        self._count(text[start:], sentence_totals, sentence_words)
+        
+        # prefix[d][i] is the total of dimension d over the first i sentences
+        self._prefix = [[0.0] + list(accumulate(totals[d] for totals in sentence_totals))
+                        for d in range(len(DIMENSION_NAMES))]
+        # word_prefix[i] is the number of words in the first i sentences
+        self._word_prefix = [0] + list(accumulate(sentence_words))
+    
+    def _count(self, sentence: str, totals: List[Tuple[float, ...]], word_counts: List[int]) -> None:
+        """Count the words of one sentence and append its indicator totals and word count."""
+        words, sentences = count_words(sentence)
+        self.words.update(words)
+        self.counted_sentences += sentences
+        totals.append(indicator_totals(words))
+        word_counts.append(sum(words.values()))
+    
+    @property
+    def sentence_count(self) -> int:
+        """Number of sentences in the text."""
+        return len(self.sentence_starts)
+    
+    @property
+    def word_count(self) -> int:
+        """Number of words in the text."""
+        return self._word_prefix[-1]
+    
+    def window_scores(self, first: int, end: int, reference_words: Optional[float] = None) -> Dict[str, float]:
+        """
+        Score the sentences first:end in O(1).
+        
+        Args:
+            first: Index of the first sentence
+            end: Index after the last sentence
+            reference_words: Length the range's indicator density is scaled to;
+                defaults to the range's own word count, which scores the range
+                as analyze_tone scores a text on its own
+        
+        Returns:
+            Dictionary of dimension name -> score from 1 to 5
+        """
+        first = max(0, min(first, self.sentence_count))
+        end = max(first, min(end, self.sentence_count))
+        words = self._word_prefix[end] - self._word_prefix[first]
+        scale = reference_words / words if reference_words is not None and words else 1.0
+        return {name: score_from_total((prefix[end] - prefix[first]) * scale)
+                for name, prefix in zip(DIMENSION_NAMES, self._prefix)}
+    
+    def section_scores(self, start: int, end: int, reference_words: Optional[float] = None) -> Dict[str, float]:
+        """
+        Score the sentences that overlap a character range.
+        
+        Args:
+            start: Offset of the first character of the section
+            end: Offset after the last character of the section
+            reference_words: Length the section's indicator density is scaled to,
+                see window_scores
+        
+        Returns:
+            Dictionary of dimension name -> score from 1 to 5
+        """
+        first = max(0, bisect.bisect_right(self.sentence_starts, start) - 1)
+        last = bisect.bisect_left(self.sentence_starts, end)
+        return self.window_scores(first, max(last, first + 1), reference_words)
+    
+    def heatmap(self, buckets: int) -> List[Dict[str, Any]]:
+        """
+        Downsample the profile into at most the given number of buckets.
+        
+        Sentences are divided evenly between buckets, so each bucket covers a
+        contiguous run of sentences. Every bucket is scored at the mean words per
+        bucket, so buckets of different lengths are compared on density.
+        
+        Args:
+            buckets: Maximum number of buckets
+        
+        Returns:
+            One dictionary per bucket with start and end offsets and the scores
+        """
+        count = self.sentence_count
+        buckets = max(1, min(buckets, count))
+        reference_words = self.word_count / buckets
+        
+        result = []
+        for bucket in range(buckets):
+            first = bucket * count // buckets
+            end = (bucket + 1) * count // buckets
+            entry = {
+                "start": self.sentence_starts[first],
+                "end": self.sentence_starts[end] if end < count else self.length,
+            }
+            entry.update(self.window_scores(first, end, reference_words))
+            result.append(entry)
+        
+        return result
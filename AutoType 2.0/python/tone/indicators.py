@@ -0,0 +1,183 @@
+"""
+Tone indicators module for AutoType.
+This module holds the indicator word tables and counts them in a single pass over the text.
+
+Every tone dimension is a table of indicator words and weights. The tables are
+compiled into one word -> weights lookup, so the text is tokenized once and all
+dimensions are scored from the same counts, however many indicators there are.
+"""
+
+import re
+from collections import Counter
+from typing import Dict, Tuple
+
+
+# Words; matches exactly what r'\bword\b' matches for the indicator words below
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Where sentences break: sentence-ending punctuation followed by whitespace, the
+# humanizer's sentence boundary (humanizer.sentence_structure.SENTENCE_BOUNDARY),
+# unless it ends a single-letter abbreviation ("e.g.", "J."); or a line break, so
+# headings and list items count as sentences and no sentence spans two lines.
+# Starting with a character class lets the search skip ahead quickly
+SENTENCE_BREAK_PATTERN = re.compile(r'[.!?\n](?:(?<=\n)|(?<!\b\w\.)(?=\s))\s*')
+
+# Score of a text with no indicators, and the range scores are clamped to
+NEUTRAL_SCORE = 3.0
+MIN_SCORE = 1.0
+MAX_SCORE = 5.0
+
+FORMALITY_INDICATORS = {
+    'i': -0.5,              # First person pronouns (informal)
+    'you': -0.5,            # Second person pronouns (informal)
+    'we': -0.3,             # First person plural (somewhat informal)
+    'gonna': -1.0,          # Contractions and slang (very informal)
+    'wanna': -1.0,
+    'cool': -0.5,
+    'awesome': -0.5,
+    'stuff': -0.5,
+    'thing': -0.3,
+    'retains': 0.5,         # Formal verbs
+    'facilitate': 0.5,
+    'pursuant': 1.0,        # Legal/formal terms
+    'hereby': 1.0,
+    'thus': 0.5,
+    'consequently': 0.5,
+    'nevertheless': 0.5,
+    'therefore': 0.3,
+}
+
+TECHNICAL_INDICATORS = {
+    'algorithm': 0.5,
+    'implementation': 0.3,
+    'function': 0.3,
+    'method': 0.3,
+    'variable': 0.3,
+    'parameter': 0.3,
+    'interface': 0.5,
+    'protocol': 0.5,
+    'module': 0.3,
+    'library': 0.3,
+    'abstraction': 0.5,
+    'encapsulation': 0.5,
+    'inheritance': 0.5,
+    'polymorphism': 0.5,
+    'asynchronous': 0.5,
+    'synchronous': 0.5,
+    'concurrency': 0.5,
+    'parallelism': 0.5,
+    'multithreading': 0.5,
+    'architecture': 0.3,
+}
+
+# Tone dimension -> indicator table; new dimensions only need an entry here
+DIMENSIONS = {
+    "formality": FORMALITY_INDICATORS,
+    "technical_level": TECHNICAL_INDICATORS,
+}
+
+DIMENSION_NAMES = tuple(DIMENSIONS)
+
+
+def compile_indicators(dimensions: Dict[str, Dict[str, float]]) -> Dict[str, Tuple[float, ...]]:
+    """
+    Compile indicator tables into one lookup from word to per-dimension weights.
+    
+    Args:
+        dimensions: Dimension name -> {word: weight}
+    
+    Returns:
+        Dictionary of word -> tuple of weights, one per dimension in order
+    """
+    names = list(dimensions)
+    weights: Dict[str, Tuple[float, ...]] = {}
+    for index, name in enumerate(names):
+        for word, weight in dimensions[name].items():
+            vector = list(weights.get(word, (0.0,) * len(names)))
+            vector[index] += weight
+            weights[word] = tuple(vector)
+    return weights
+
+
+INDICATOR_WEIGHTS = compile_indicators(DIMENSIONS)
+
+
+def count_indicators(text: str) -> Counter:
+    """
+    Count the indicator words in the text in a single pass.
+    
+    Args:
+        text: The text to analyze
+    
+    Returns:
+        Counter of indicator word -> number of occurrences
+    """
+    words = Counter(TOKEN_PATTERN.findall(text.lower()))
+    return Counter({word: count for word, count in words.items() if word in INDICATOR_WEIGHTS})
+
+
+def count_words(text: str) -> Tuple[Counter, int]:
+    """
+    Count every word of the text, and its sentences.
+    
+    The word counts can be used wherever indicator counts are expected, since
+    words that are not indicators carry no weight. A sentence is a piece of text
+    between sentence breaks (SENTENCE_BREAK_PATTERN) holding at least one word,
+    so a final sentence without punctuation counts and "3.5" does not end one.
+    Pieces of a text split at sentence breaks add up to the count of the text.
+    
+    Args:
+        text: The text to analyze
+    
+    Returns:
+        Tuple of (Counter of lowercase word -> occurrences, number of sentences)
+    """
+    words = Counter(TOKEN_PATTERN.findall(text.lower()))
+    sentences = sum(1 for piece in SENTENCE_BREAK_PATTERN.split(text) if TOKEN_PATTERN.search(piece))
+    return words, sentences
+
+
+def indicator_totals(counts: Dict[str, int]) -> Tuple[float, ...]:
+    """
+    Sum the weighted indicator counts per dimension.
+    
+    Args:
+        counts: Indicator word -> number of occurrences
+    
+    Returns:
+        Raw (unclamped) weight total per dimension, in DIMENSION_NAMES order
+    """
+    totals = [0.0] * len(DIMENSION_NAMES)
+    for word, count in counts.items():
+        weights = INDICATOR_WEIGHTS.get(word)
+        if weights is None:
+            continue
+        for index, weight in enumerate(weights):
+            totals[index] += count * weight
+    return tuple(totals)
+
+
+def score_from_total(total: float) -> float:
+    """
+    Turn a raw weight total into a score.
+    
+    Args:
+        total: Raw weight total of a dimension
+    
+    Returns:
+        Score from 1 to 5, where 3 is neutral
+    """
+    return max(MIN_SCORE, min(MAX_SCORE, NEUTRAL_SCORE + total))
+
+
+def score_dimensions(counts: Dict[str, int]) -> Dict[str, float]:
+    """
+    Score every tone dimension from indicator counts.
+    
+    Args:
+        counts: Indicator word -> number of occurrences
+    
+    Returns:
+        Dictionary of dimension name -> score from 1 to 5
+    """
+    return {name: score_from_total(total) for name, total in zip(DIMENSION_NAMES, indicator_totals(counts))}
@@ -3,8 +3,11 @@ Tone presets module for AutoType.
 This module handles predefined tone presets for text adjustment.
 """
 
-from typing import Dict, List, Any
-from .analyzer import adjust_tone
+from typing import Dict, List, Any, Optional
+from .analyzer import analyze_tone, plan_adjustments
+from .registry import get_preset_registry
+from .rules import apply_rule_sets, render_with_rule_sets, rule_sets_overlap, tokenize_for_rules
+from .targeting import DEFAULT_TOLERANCE, seek_tone
 
 
 def get_tone_presets() -> List[Dict[str, Any]]:
@@ -12,45 +15,9 @@ def get_tone_presets() -> List[Dict[str, Any]]:
     Get a list of available tone presets.
     
     Returns:
-        List of preset information dictionaries
+        List of preset information dictionaries, built-in presets first
     """
-    return [
-        {
-            "id": "academic",
-            "name": "Academic/Formal",
-            "description": "Scholarly and rigorous tone suitable for academic papers",
-            "formality_level": 5,
-            "technical_level": 4
-        },
-        {
-            "id": "casual",
-            "name": "Casual/Conversational",
-            "description": "Relaxed and friendly tone for informal communication",
-            "formality_level": 1,
-            "technical_level": 2
-        },
-        {
-            "id": "professional",
-            "name": "Professional/Business",
-            "description": "Polished and respectful tone for business communication",
-            "formality_level": 4,
-            "technical_level": 3
-        },
-        {
-            "id": "technical",
-            "name": "Technical/Scientific",
-            "description": "Precise and detailed tone for technical documentation",
-            "formality_level": 3,
-            "technical_level": 5
-        },
-        {
-            "id": "creative",
-            "name": "Creative/Narrative",
-            "description": "Expressive and vivid tone for storytelling",
-            "formality_level": 2,
-            "technical_level": 1
-        }
-    ]
+    return get_preset_registry().list_presets()
 
 
 def get_preset_by_id(preset_id: str) -> Dict[str, Any]:
@@ -66,22 +33,20 @@ def get_preset_by_id(preset_id: str) -> Dict[str, Any]:
     Raises:
         ValueError: If the preset ID is not found
     """
-    presets = get_tone_presets()
-    
-    for preset in presets:
-        if preset["id"] == preset_id:
-            return preset
-    
-    raise ValueError(f"Preset with ID '{preset_id}' not found")
+    return get_preset_registry().get(preset_id)
 
 
-def apply_tone_preset(text: str, preset_id: str) -> str:
+def apply_tone_preset(text: str, preset_id: str, iterative: bool = False,
+                      tolerance: float = DEFAULT_TOLERANCE) -> str:
     """
     Apply a tone preset to the given text.
     
     Args:
         text: The text to adjust
         preset_id: The ID of the preset to apply
+        iterative: Whether to keep rewriting until the scores are within tolerance
+            of the preset (see tone.targeting.seek_tone)
+        tolerance: Maximum remaining difference per dimension in iterative mode
     
     Returns:
         The adjusted text
@@ -89,11 +54,70 @@ def apply_tone_preset(text: str, preset_id: str) -> str:
     Raises:
         ValueError: If the preset ID is not found
     """
-    # Get the preset
-    preset = get_preset_by_id(preset_id)
+    # Get the preset and its precompiled rule sets
+    registry = get_preset_registry()
+    preset = registry.get(preset_id)
+    rule_sets = registry.get_rule_sets(preset_id)
     
     # Apply the tone adjustment
-    return adjust_tone(text, preset["formality_level"], preset["technical_level"])
+    if iterative:
+        return seek_tone(text, preset["formality_level"], preset["technical_level"], tolerance,
+                         rule_sets=rule_sets)["text"]
+    plan = plan_adjustments(analyze_tone(text), preset["formality_level"], preset["technical_level"], rule_sets)
+    return apply_rule_sets(text, plan)
+
+
+def preview_presets(text: str, preset_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Preview several tone presets on the same text.
+    
+    The text is analyzed once and tokenized once per distinct group of rule
+    sets; every preset is then rendered from its group's matches. The built-in
+    presets share a handful of groups, so previewing all of them costs about as
+    much as applying a few. Presets whose rule sets could match overlapping text
+    are applied one rule set after another instead, as apply_tone_preset does.
+    
+    Args:
+        text: The text to adjust
+        preset_ids: IDs of the presets to preview (all presets if None)
+    
+    Returns:
+        Dictionary with the tone analysis of the text and a preview per preset ID
+    
+    Raises:
+        ValueError: If a preset ID is not found
+    """
+    registry = get_preset_registry()
+    if preset_ids is None:
+        presets = registry.list_presets()
+    else:
+        presets = [registry.get(preset_id) for preset_id in preset_ids]
+    
+    # Analyze once
+    current_tone = analyze_tone(text)
+    plans = {
+        preset["id"]: plan_adjustments(current_tone, preset["formality_level"], preset["technical_level"],
+                                       registry.get_rule_sets(preset["id"]))
+        for preset in presets
+    }
+    
+    # Tokenize once per group of rule sets; a union over unrelated presets could
+    # let one preset's phrase hide another's
+    matches_by_group: Dict[frozenset, Any] = {}
+    previews = {}
+    for preset_id, rule_sets in plans.items():
+        if rule_sets_overlap(rule_sets):
+            previews[preset_id] = apply_rule_sets(text, rule_sets)
+            continue
+        group = frozenset(id(rules) for rules in rule_sets)
+        if group not in matches_by_group:
+            matches_by_group[group] = tokenize_for_rules(text, rule_sets)
+        previews[preset_id] = render_with_rule_sets(text, matches_by_group[group], rule_sets)
+    
+    return {
+        "analysis": current_tone,
+        "previews": previews,
+    }
 
 
 def get_preset_examples() -> Dict[str, str]:
@@ -0,0 +1,140 @@
+"""
+Readability module for AutoType.
+This module computes readability metrics from the word counts of the tone analysis.
+
+The metrics only need totals (words, sentences, syllables, letters and complex
+words), and those follow from the word -> count table that the indicator
+counting already builds. Syllables are counted once per distinct word, with the
+results kept in a bounded cache, so readability adds no pass over the text.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Tuple
+
+
+# Most distinct words seen in practice fit comfortably
+SYLLABLE_CACHE_SIZE = 65536
+
+VOWEL_GROUP_PATTERN = re.compile(r'[aeiouy]+')
+
+# Common words the vowel-group heuristic gets wrong
+SYLLABLE_EXCEPTIONS = {
+    "the": 1, "are": 1, "were": 1, "here": 1, "there": 1, "where": 1, "one": 1, "once": 1,
+    "some": 1, "come": 1, "done": 1, "gone": 1, "none": 1, "give": 1, "have": 1, "live": 1,
+    "people": 2, "every": 2, "area": 3, "idea": 3, "being": 2, "doing": 2, "going": 2,
+    "create": 2, "created": 3, "business": 2, "different": 3, "interesting": 3, "science": 2,
+    "quiet": 2, "poem": 2, "real": 1, "really": 2, "video": 3, "radio": 3, "period": 3,
+}
+
+# Words with this many syllables count as complex for the Gunning fog index
+COMPLEX_WORD_SYLLABLES = 3
+
+# Coefficients of the Flesch reading ease and Gunning fog formulas
+FLESCH_BASE = 206.835
+FLESCH_SENTENCE_LENGTH_WEIGHT = 1.015
+FLESCH_SYLLABLES_PER_WORD_WEIGHT = 84.6
+FOG_WEIGHT = 0.4
+
+
+@lru_cache(maxsize=SYLLABLE_CACHE_SIZE)
+def count_syllables(word: str) -> int:
+    """
+    Estimate the number of syllables in a word.
+    
+    Args:
+        word: A lowercase word
+    
+    Returns:
+        Number of syllables (0 for words without letters, such as numbers)
+    """
+    exception = SYLLABLE_EXCEPTIONS.get(word)
+    if exception is not None:
+        return exception
+    
+    count = len(VOWEL_GROUP_PATTERN.findall(word))
+    if count == 0:
+        return 1 if any(c.isalpha() for c in word) else 0
+    
+    # Silent final e, as in "make", but not "table" or "agree"
+    if count > 1 and word.endswith('e') and not word.endswith(('le', 'ee', 'ye')):
+        count -= 1
+    # Silent "-ed", as in "worked", but not "wanted" or "needed"
+    elif count > 1 and word.endswith('ed') and not word.endswith(('ted', 'ded')):
+        count -= 1
+    
+    return count
+
+
+def readability_totals(words: Dict[str, int]) -> Tuple[int, int, int, int]:
+    """
+    Sum the quantities the readability formulas need.
+    
+    Args:
+        words: Lowercase word -> number of occurrences
+    
+    Returns:
+        Tuple of (words, syllables, letters, complex words)
+    """
+    word_total = 0
+    syllable_total = 0
+    letter_total = 0
+    complex_total = 0
+    for word, count in words.items():
+        syllables = count_syllables(word)
+        word_total += count
+        syllable_total += syllables * count
+        letter_total += len(word) * count
+        if syllables >= COMPLEX_WORD_SYLLABLES:
+            complex_total += count
+    return word_total, syllable_total, letter_total, complex_total
+
+
+def readability_from_counts(words: Dict[str, int], sentences: int) -> Dict[str, float]:
+    """
+    Compute readability metrics from word counts.
+    
+    Args:
+        words: Lowercase word -> number of occurrences
+        sentences: Number of sentences
+    
+    Returns:
+        Dictionary with flesch_reading_ease, gunning_fog, average_sentence_length
+        (words per sentence) and average_word_length (characters per word)
+    """
+    return readability_from_totals(readability_totals(words), sentences)
+
+
+def readability_from_totals(totals: Tuple[int, int, int, int], sentences: int) -> Dict[str, float]:
+    """
+    Compute readability metrics from summed totals.
+    
+    Totals of separate pieces of text add up, so callers that keep them per
+    piece can update the metrics without recounting the whole text.
+    
+    Args:
+        totals: Tuple of (words, syllables, letters, complex words), see readability_totals
+        sentences: Number of sentences
+    
+    Returns:
+        Dictionary of metrics, see readability_from_counts
+    """
+    word_total, syllable_total, letter_total, complex_total = totals
+    
+    if word_total == 0:
+        return {
+            "flesch_reading_ease": 0.0,
+            "gunning_fog": 0.0,
+            "average_sentence_length": 0.0,
+            "average_word_length": 0.0,
+        }
+    
+    words_per_sentence = word_total / max(1, sentences)
+    syllables_per_word = syllable_total / word_total
+    return {
+        "flesch_reading_ease": round(FLESCH_BASE - FLESCH_SENTENCE_LENGTH_WEIGHT * words_per_sentence
+                                     - FLESCH_SYLLABLES_PER_WORD_WEIGHT * syllables_per_word, 2),
+        "gunning_fog": round(FOG_WEIGHT * (words_per_sentence + 100.0 * complex_total / word_total), 2),
+        "average_sentence_length": round(words_per_sentence, 2),
+        "average_word_length": round(letter_total / word_total, 2),
+    }
@@ -0,0 +1,381 @@
+"""
+Tone preset registry module for AutoType.
+This module loads the built-in and user-defined tone presets and keeps them indexed by ID.
+
+User presets are read from JSON or TOML files in the user preset directories. A
+file holds either a list of presets or a table with a "presets" list:
+
+    [[presets]]
+    id = "support"
+    name = "Customer Support"
+    description = "Warm and clear tone for support replies"
+    formality_level = 3
+    technical_level = 2
+    
+    [presets.replacements.less_technical]
+    "reboot" = "restart"
+
+A preset may extend any of the rule sets in tone.rules (more_formal, less_formal,
+more_technical, less_technical) through "replacements". Rule sets are compiled
+when a preset is registered, so applying a custom preset costs the same as
+applying a built-in one. Files are re-read when they change.
+"""
+
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .rules import DEFAULT_RULE_SETS, ToneRuleSet
+from .vectors import TONE_DIMENSIONS, ToneIndex
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+
+# Where user presets are looked for by default
+DEFAULT_USER_PRESET_DIR = os.path.join(os.path.expanduser("~"), ".autotype", "presets")
+
+# Minimum number of seconds between checks of the user preset files
+RELOAD_CHECK_INTERVAL = 1.0
+
+PRESET_FILE_EXTENSIONS = (".json", ".toml")
+
+BUILTIN_PRESETS = [
+    {
+        "id": "academic",
+        "name": "Academic/Formal",
+        "description": "Scholarly and rigorous tone suitable for academic papers",
+        "formality_level": 5,
+        "technical_level": 4
+    },
+    {
+        "id": "casual",
+        "name": "Casual/Conversational",
+        "description": "Relaxed and friendly tone for informal communication",
+        "formality_level": 1,
+        "technical_level": 2
+    },
+    {
+        "id": "professional",
+        "name": "Professional/Business",
+        "description": "Polished and respectful tone for business communication",
+        "formality_level": 4,
+        "technical_level": 3
+    },
+    {
+        "id": "technical",
+        "name": "Technical/Scientific",
+        "description": "Precise and detailed tone for technical documentation",
+        "formality_level": 3,
+        "technical_level": 5
+    },
+    {
+        "id": "creative",
+        "name": "Creative/Narrative",
+        "description": "Expressive and vivid tone for storytelling",
+        "formality_level": 2,
+        "technical_level": 1
+    }
+]
+
+
+def compile_preset(preset: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, ToneRuleSet]]:
+    """
+    Validate a preset and compile its rule sets.
+    
+    Args:
+        preset: Preset dictionary with id, name, formality_level and technical_level,
+            and optionally description and replacements
+    
+    Returns:
+        Tuple of (preset information dictionary, rule set name -> compiled rule set)
+    
+    Raises:
+        ValueError: If the preset is invalid
+    """
+    if not isinstance(preset, dict) or not preset.get("id"):
+        raise ValueError("Preset must be a table with an 'id'")
+    
+    preset_id = str(preset["id"])
+    info = {
+        "id": preset_id,
+        "name": str(preset.get("name", preset_id)),
+        "description": str(preset.get("description", "")),
+    }
+    for level in ("formality_level", "technical_level"):
+        try:
+            value = float(preset[level])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Preset '{preset_id}' needs a numeric {level}")
+        if not 1 <= value <= 5:
+            raise ValueError(f"Preset '{preset_id}' {level} must be between 1 and 5")
+        info[level] = int(value) if value.is_integer() else value
+    
+    # Optional further tone dimensions, used when finding the closest preset
+    for key, _, _ in TONE_DIMENSIONS.values():
+        if key in info or key not in preset:
+            continue
+        try:
+            info[key] = float(preset[key])
+        except (TypeError, ValueError):
+            raise ValueError(f"Preset '{preset_id}' {key} must be numeric")
+    
+    # Presets without their own replacements share the default rule sets
+    rule_sets = dict(DEFAULT_RULE_SETS)
+    for name, replacements in (preset.get("replacements") or {}).items():
+        if name not in DEFAULT_RULE_SETS:
+            raise ValueError(f"Preset '{preset_id}' has unknown rule set '{name}'")
+        merged = dict(DEFAULT_RULE_SETS[name].replacements)
+        merged.update({str(phrase): str(replacement) for phrase, replacement in replacements.items()})
+        rule_sets[name] = ToneRuleSet(name, merged)
+    
+    return info, rule_sets
+
+
+def load_preset_file(path: str) -> List[Dict[str, Any]]:
+    """
+    Read the presets defined in a JSON or TOML file.
+    
+    Args:
+        path: Path to the file
+    
+    Returns:
+        List of preset dictionaries (not yet validated)
+    
+    Raises:
+        ValueError: If the file cannot be parsed
+    """
+    if path.endswith(".toml") and tomllib is None:
+        raise ValueError("TOML presets need Python 3.11+ or the tomli package")
+    
+    try:
+        if path.endswith(".toml"):
+            with open(path, "rb") as f:
+                data = tomllib.load(f)
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+    except Exception as e:
+        # OSError, JSONDecodeError or TOMLDecodeError
+        raise ValueError(str(e))
+    
+    if isinstance(data, dict):
+        data = data.get("presets", [])
+    if not isinstance(data, list):
+        raise ValueError("Expected a list of presets")
+    return data
+
+
+class PresetRegistry:
+    """Tone presets indexed by ID, with user preset files reloaded when they change."""
+    
+    def __init__(self, preset_dirs: Optional[List[str]] = None,
+                 builtin_presets: Optional[List[Dict[str, Any]]] = None):
+        """
+        Args:
+            preset_dirs: Directories searched for user preset files
+                (defaults to DEFAULT_USER_PRESET_DIR)
+            builtin_presets: Presets that are always available (defaults to BUILTIN_PRESETS)
+        """
+        self.preset_dirs = list(preset_dirs) if preset_dirs is not None else [DEFAULT_USER_PRESET_DIR]
+        
+        # Errors from the last load, by file path
+        self.errors: Dict[str, str] = {}
+        
+        self._builtin = [compile_preset(preset) for preset in (builtin_presets or BUILTIN_PRESETS)]
+        # path -> (modification time, compiled presets from that file)
+        self._files: Dict[str, Tuple[int, List[Tuple[Dict[str, Any], Dict[str, ToneRuleSet]]]]] = {}
+        self._presets: Dict[str, Dict[str, Any]] = {}
+        self._rule_sets: Dict[str, Dict[str, ToneRuleSet]] = {}
+        self._tone_index: Optional[ToneIndex] = None
+        self._last_check = 0.0
+        
+        self.reload()
+    
+    def get(self, preset_id: str) -> Dict[str, Any]:
+        """
+        Get a preset by its ID.
+        
+        Args:
+            preset_id: The ID of the preset to get
+        
+        Returns:
+            Preset information dictionary
+        
+        Raises:
+            ValueError: If the preset ID is not found
+        """
+        self.reload_if_changed()
+        preset = self._presets.get(preset_id)
+        if preset is None:
+            raise ValueError(f"Preset with ID '{preset_id}' not found")
+        return dict(preset)
+    
+    def get_rule_sets(self, preset_id: str) -> Dict[str, ToneRuleSet]:
+        """
+        Get the compiled rule sets of a preset.
+        
+        Args:
+            preset_id: The ID of the preset
+        
+        Returns:
+            Dictionary of rule set name -> compiled rule set
+        
+        Raises:
+            ValueError: If the preset ID is not found
+        """
+        self.reload_if_changed()
+        rule_sets = self._rule_sets.get(preset_id)
+        if rule_sets is None:
+            raise ValueError(f"Preset with ID '{preset_id}' not found")
+        return rule_sets
+    
+    def list_presets(self) -> List[Dict[str, Any]]:
+        """
+        Get all presets, built-in presets first.
+        
+        Returns:
+            List of preset information dictionaries
+        """
+        self.reload_if_changed()
+        return [dict(preset) for preset in self._presets.values()]
+    
+    def get_tone_index(self) -> ToneIndex:
+        """
+        Get the tone vectors of all presets, for finding the closest preset.
+        
+        Returns:
+            Tone index over the current presets, built on first use after a reload
+        """
+        self.reload_if_changed()
+        if self._tone_index is None:
+            self._tone_index = ToneIndex(list(self._presets.values()))
+        return self._tone_index
+    
+    def reload_if_changed(self) -> bool:
+        """
+        Reload the user presets if a preset file was added, changed or removed.
+        
+        The files are checked at most once every RELOAD_CHECK_INTERVAL seconds.
+        
+        Returns:
+            True if the presets were reloaded
+        """
+        now = time.monotonic()
+        if now - self._last_check < RELOAD_CHECK_INTERVAL:
+            return False
+        self._last_check = now
+        
+        current = self._scan()
+        if current == {path: mtime for path, (mtime, _) in self._files.items()}:
+            return False
+        
+        self.reload(current)
+        return True
+    
+    def reload(self, current: Optional[Dict[str, int]] = None) -> None:
+        """
+        Re-read changed preset files and rebuild the index.
+        
+        Args:
+            current: Preset file path -> modification time (scanned if None)
+        """
+        if current is None:
+            current = self._scan()
+        self._last_check = time.monotonic()
+        
+        files = {}
+        for path, mtime in current.items():
+            cached = self._files.get(path)
+            if cached is not None and cached[0] == mtime:
+                files[path] = cached
+                continue
+            
+            self.errors.pop(path, None)
+            compiled = []
+            try:
+                for preset in load_preset_file(path):
+                    compiled.append(compile_preset(preset))
+            except ValueError as e:
+                self.errors[path] = str(e)
+                print(f"Skipping tone presets in {path}: {e}", file=sys.stderr)
+                compiled = []
+            files[path] = (mtime, compiled)
+        
+        for path in list(self.errors):
+            if path not in files:
+                del self.errors[path]
+        
+        # User presets override built-in presets with the same ID
+        presets = {}
+        rule_sets = {}
+        for info, compiled_rules in self._builtin + [entry for path in sorted(files) for entry in files[path][1]]:
+            presets[info["id"]] = info
+            rule_sets[info["id"]] = compiled_rules
+        
+        self._files = files
+        self._presets = presets
+        self._rule_sets = rule_sets
+        self._tone_index = None
+    
+    def _scan(self) -> Dict[str, int]:
+        """
+        Find the user preset files and their modification times.
+        
+        Returns:
+            Dictionary of file path -> modification time in nanoseconds
+        """
+        found = {}
+        for directory in self.preset_dirs:
+            try:
+                names = os.listdir(directory)
+            except OSError:
+                continue
+            for name in names:
+                if not name.endswith(PRESET_FILE_EXTENSIONS):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    found[path] = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+        return found
+
+
+# Registry shared by all calls, see get_preset_registry
+_registry: Optional[PresetRegistry] = None
+
+
+def get_preset_registry() -> PresetRegistry:
+    """
+    Get the preset registry, loading it on first use.
+    
+    Returns:
+        The preset registry
+    """
+    global _registry
+    if _registry is None:
+        _registry = PresetRegistry()
+    return _registry
+
+
+def configure_preset_registry(preset_dirs: List[str]) -> PresetRegistry:
+    """
+    Replace the preset registry with one that reads the given directories.
+    
+    Args:
+        preset_dirs: Directories searched for user preset files
+    
+    Returns:
+        The new preset registry
+    """
+    global _registry
+    _registry = PresetRegistry(preset_dirs)
+    return _registry
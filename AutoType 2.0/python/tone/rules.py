@@ -0,0 +1,252 @@
+"""
+Tone rules module for AutoType.
+This module holds the tone replacement tables, compiled once into rule sets.
+
+A rule set matches all of its words and phrases with one case-insensitive regular
+expression and replaces each match through a dictionary lookup. Matching the
+union of a group of rule sets once lets every variant that applies that group be
+rendered from the same tokenization, as long as the group's phrases cannot
+overlap (see rule_sets_overlap).
+"""
+
+import re
+from typing import Dict, Iterable, List, Tuple
+
+
+MORE_FORMAL_REPLACEMENTS = {
+    "don't": 'do not',
+    "can't": 'cannot',
+    "won't": 'will not',
+    'i': 'one',
+    'we': 'one',
+    'you': 'one',
+    'thing': 'matter',
+    'stuff': 'materials',
+    'lot': 'significant amount',
+    'got': 'obtained',
+    'get': 'obtain',
+    'want': 'desire',
+    'need': 'require',
+    'use': 'utilize',
+    'make': 'create',
+    'show': 'demonstrate',
+}
+
+LESS_FORMAL_REPLACEMENTS = {
+    'utilize': 'use',
+    'obtain': 'get',
+    'require': 'need',
+    'desire': 'want',
+    'demonstrate': 'show',
+    'purchase': 'buy',
+    'inform': 'tell',
+    'provide': 'give',
+    'assist': 'help',
+    'consider': 'think about',
+    'discuss': 'talk about',
+    'communicate': 'talk',
+    'commence': 'start',
+    'terminate': 'end',
+    'facilitate': 'help',
+}
+
+MORE_TECHNICAL_REPLACEMENTS = {
+    'use': 'implement',
+    'fix': 'resolve',
+    'fast': 'high-performance',
+    'loop': 'iteration',
+    'error': 'exception',
+    'speed': 'throughput',
+    'size': 'payload dimension',
+    'check': 'validate',
+    'send': 'transmit',
+    'get': 'retrieve',
+    'keep': 'persist',
+    'wait': 'block',
+    'stop': 'terminate',
+    'look at': 'analyze',
+}
+
+LESS_TECHNICAL_REPLACEMENTS = {
+    'implementation': 'way it works',
+    'functionality': 'features',
+    'utilization': 'use',
+    'interface': 'screen',
+    'algorithm': 'process',
+    'configuration': 'settings',
+    'asynchronous': 'background',
+    'performance optimization': 'speed improvements',
+    'encapsulation': 'grouping',
+    'exception handling': 'error checking',
+    'refactoring': 'rewriting',
+    'dependency': 'requirement',
+    'architecture': 'design',
+    'parameterize': 'set options for',
+}
+
+
+def compile_phrase_pattern(phrases: Iterable[str]) -> "re.Pattern":
+    """
+    Compile phrases into one case-insensitive whole-word pattern.
+    
+    Longer phrases are tried first, so "look at" wins over "look".
+    
+    Args:
+        phrases: The words and phrases to match
+    
+    Returns:
+        The compiled pattern
+    """
+    alternatives = sorted({phrase.lower() for phrase in phrases}, key=len, reverse=True)
+    if not alternatives:
+        # Matches nothing
+        return re.compile(r'(?!)')
+    return re.compile(r'\b(?:' + '|'.join(re.escape(phrase) for phrase in alternatives) + r')\b', re.IGNORECASE)
+
+
+class ToneRuleSet:
+    """A replacement table compiled for single-pass application."""
+    
+    def __init__(self, name: str, replacements: Dict[str, str]):
+        """
+        Args:
+            name: Name of the rule set
+            replacements: Word or phrase -> replacement (matched case-insensitively)
+        """
+        self.name = name
+        self.replacements = {phrase.lower(): replacement for phrase, replacement in replacements.items()}
+        self.pattern = compile_phrase_pattern(self.replacements)
+    
+    def apply(self, text: str) -> str:
+        """
+        Apply the rule set to a text.
+        
+        Args:
+            text: The text to adjust
+        
+        Returns:
+            The text with every match replaced
+        """
+        return self.pattern.sub(lambda match: self.replacements[match.group().lower()], text)
+
+
+# Built-in rule sets, compiled once at import
+MORE_FORMAL = ToneRuleSet("more_formal", MORE_FORMAL_REPLACEMENTS)
+LESS_FORMAL = ToneRuleSet("less_formal", LESS_FORMAL_REPLACEMENTS)
+MORE_TECHNICAL = ToneRuleSet("more_technical", MORE_TECHNICAL_REPLACEMENTS)
+LESS_TECHNICAL = ToneRuleSet("less_technical", LESS_TECHNICAL_REPLACEMENTS)
+
+BUILTIN_RULE_SETS = [MORE_FORMAL, LESS_FORMAL, MORE_TECHNICAL, LESS_TECHNICAL]
+
+# Rule set name -> rule set, used by presets that do not define their own
+DEFAULT_RULE_SETS = {rules.name: rules for rules in BUILTIN_RULE_SETS}
+
+
+def apply_rule_sets(text: str, rule_sets: List[ToneRuleSet]) -> str:
+    """
+    Apply rule sets one after another.
+    
+    Args:
+        text: The text to adjust
+        rule_sets: Rule sets in the order they should be applied
+    
+    Returns:
+        The adjusted text
+    """
+    for rules in rule_sets:
+        text = rules.apply(text)
+    return text
+
+
+def rule_sets_overlap(rule_sets: Iterable[ToneRuleSet]) -> bool:
+    """
+    Check whether phrases of different rule sets could match overlapping text.
+    
+    A union tokenization takes the longest phrase at each position, so such a
+    phrase could hide a phrase that another rule set would have matched. The
+    check is conservative: two different phrases of different rule sets overlap
+    if either has several words and they share a word.
+    
+    Args:
+        rule_sets: Rule sets that would be tokenized together
+    
+    Returns:
+        True if a shared tokenization could differ from applying the rule sets
+        one after another
+    """
+    # Word -> (rule set index, phrase) of every phrase containing it
+    containing: Dict[str, List[Tuple[int, str]]] = {}
+    for index, rules in enumerate(rule_sets):
+        for phrase in rules.replacements:
+            for word in set(phrase.split()):
+                containing.setdefault(word, []).append((index, phrase))
+    
+    for entries in containing.values():
+        if not any(' ' in phrase for _, phrase in entries):
+            continue
+        for index, phrase in entries:
+            for other_index, other in entries:
+                if other_index != index and other != phrase and (' ' in phrase or ' ' in other):
+                    return True
+    return False
+
+
+def tokenize_for_rules(text: str, rule_sets: Iterable[ToneRuleSet]) -> List[Tuple[int, int, str]]:
+    """
+    Find every match of any of the rule sets in one pass.
+    
+    Args:
+        text: The text to tokenize
+        rule_sets: Rule sets whose words and phrases should be found
+    
+    Returns:
+        List of (start, end, lowercased match) in text order
+    """
+    phrases = set()
+    for rules in rule_sets:
+        phrases.update(rules.replacements)
+    
+    return [(match.start(), match.end(), match.group().lower())
+            for match in compile_phrase_pattern(phrases).finditer(text)]
+
+
+def render_with_rule_sets(text: str, matches: List[Tuple[int, int, str]],
+                          rule_sets: List[ToneRuleSet]) -> str:
+    """
+    Apply rule sets to a text from a shared tokenization.
+    
+    Each match is run through the rule sets in order, so the result is the same
+    as applying them one after another with apply_rule_sets.
+    
+    Args:
+        text: The text that was tokenized
+        matches: Output of tokenize_for_rules for the same rule sets, which
+            must not overlap (see rule_sets_overlap)
+        rule_sets: Rule sets in the order they should be applied
+    
+    Returns:
+        The adjusted text
+    """
+    if not rule_sets:
+        return text
+    
+    pieces = []
+    position = 0
+    for start, end, phrase in matches:
+        original = text[start:end]
+        value = original
+        for rules in rule_sets:
+            replacement = rules.replacements.get(value.lower())
+            if replacement is not None:
+                value = replacement
+            elif value is not original or ' ' in phrase:
+                # Replaced or multi-word text may still contain matches of this rule set
+                value = rules.apply(value)
+        
+        if value != original:
+            pieces.append(text[position:start])
+            pieces.append(value)
+            position = end
+    
+    pieces.append(text[position:])
+    return ''.join(pieces)
@@ -0,0 +1,207 @@
+"""
+Tone session module for AutoType.
+This module keeps a live tone analysis up to date as the user edits text.
+
+A session splits the text into chunks, initially one per line, and keeps the
+indicator counts, readability totals and sentence count of each one; all of them
+add up across chunks. An edit only re-counts the chunks it touches, and the
+analysis is re-derived from running totals, so a keystroke costs the size of the
+edited chunk rather than the size of the document.
+
+Chunk positions live in a Fenwick tree over fixed slots. An edit that splits or
+joins lines keeps the new text in the first touched slot and empties the others,
+so only the touched entries change. A slot that grows past MAX_CHUNK_LINES lines,
+or too many emptied slots, trigger a rebuild of the slots: multi-line chunks are
+split and recounted one line each, empty slots dropped, and the tree rebuilt in
+linear time. Counts add up across chunks, so the running totals stay as they are.
+"""
+
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+from .analyzer import summarize_tone
+from .indicators import INDICATOR_WEIGHTS, count_words, score_dimensions
+from .readability import readability_from_totals, readability_totals
+
+
+# Lines a chunk may hold before the slots are rebuilt one line each
+MAX_CHUNK_LINES = 32
+
+# Share of empty slots that triggers a rebuild
+MAX_EMPTY_SHARE = 0.5
+
+
+class _ParagraphIndex:
+    """Fenwick tree over chunk lengths, for finding the chunk at an offset in O(log n)."""
+    
+    def __init__(self, lengths: List[int]):
+        self._size = len(lengths)
+        # Build in linear time: each node passes its sum on to its parent
+        self._tree = [0] + list(lengths)
+        for index in range(1, self._size + 1):
+            parent = index + (index & -index)
+            if parent <= self._size:
+                self._tree[parent] += self._tree[index]
+    
+    def add(self, index: int, delta: int) -> None:
+        """Add delta to the length of chunk index."""
+        index += 1
+        while index <= self._size:
+            self._tree[index] += delta
+            index += index & -index
+    
+    def prefix(self, count: int) -> int:
+        """Total length of the first count chunks."""
+        total = 0
+        while count > 0:
+            total += self._tree[count]
+            count -= count & -count
+        return total
+    
+    def find(self, offset: int) -> int:
+        """Index of the chunk whose span contains offset (clamped to the last one)."""
+        index = 0
+        step = 1 << self._size.bit_length()
+        while step:
+            if index + step <= self._size and self._tree[index + step] <= offset:
+                index += step
+                offset -= self._tree[index]
+            step >>= 1
+        return min(index, self._size - 1)
+
+
+# Indicator counts, readability totals (words, syllables, letters, complex words) and sentences of a chunk
+ChunkCounts = Tuple[Counter, Tuple[int, int, int, int], int]
+
+
+def _count_chunk(chunk: str) -> ChunkCounts:
+    """Count what the analysis needs in one chunk."""
+    words, sentences = count_words(chunk)
+    indicators = Counter({word: count for word, count in words.items() if word in INDICATOR_WEIGHTS})
+    return indicators, readability_totals(words), sentences
+
+
+class ToneSession:
+    """Incrementally maintained tone analysis of a text being edited."""
+    
+    def __init__(self, text: str = ""):
+        """
+        Args:
+            text: The initial text
+        """
+        self._set_chunks(text)
+    
+    @property
+    def text(self) -> str:
+        """The current text of the session."""
+        return "".join(self._chunks)
+    
+    def __len__(self) -> int:
+        return self._index.prefix(len(self._chunks))
+    
+    def apply_edit(self, offset: int, deleted_length: int, inserted_text: str) -> Dict[str, Any]:
+        """
+        Apply an edit and update the analysis.
+        
+        Args:
+            offset: Position of the edit in the current text
+            deleted_length: Number of characters removed at offset
+            inserted_text: Text inserted at offset
+        
+        Returns:
+            The updated tone analysis (see analysis)
+        
+        Raises:
+            ValueError: If the edit falls outside the text
+        """
+        length = len(self)
+        if offset < 0 or deleted_length < 0 or offset + deleted_length > length:
+            raise ValueError(f"Edit ({offset}, {deleted_length}) is outside text of length {length}")
+        
+        # Chunks touched by the edit
+        first = self._index.find(offset)
+        last = self._index.find(offset + deleted_length)
+        start = self._index.prefix(first)
+        
+        merged = "".join(self._chunks[first:last + 1])
+        local = offset - start
+        new_chunk = merged[:local] + inserted_text + merged[local + deleted_length:]
+        
+        # The new text goes to the first touched slot and the others are emptied
+        for index in range(first, last + 1):
+            new_text = new_chunk if index == first else ""
+            self._replace(index, new_text, _count_chunk(new_text))
+        
+        if new_chunk.count("\n") > MAX_CHUNK_LINES or self._empty > MAX_EMPTY_SHARE * len(self._chunks):
+            self._rebuild_slots()
+        
+        return self.analysis()
+    
+    def analysis(self) -> Dict[str, Any]:
+        """
+        Get the tone analysis of the current text.
+        
+        Returns:
+            Dictionary with formality, technical_level, the readability metrics
+            and closest_preset, as analyze_tone
+        """
+        readability = readability_from_totals(tuple(self._readability), self._sentences)
+        return summarize_tone(score_dimensions(self._indicators), readability)
+    
+    def _set_chunks(self, text: str) -> None:
+        """Split the text into one chunk per line and count them from scratch."""
+        lines = text.split("\n")
+        self._chunks = [line + "\n" for line in lines[:-1]] + [lines[-1]]
+        self._counts = [_count_chunk(chunk) for chunk in self._chunks]
+        self._empty = sum(1 for chunk in self._chunks if not chunk)
+        
+        self._indicators: Counter = Counter()
+        self._readability = [0, 0, 0, 0]
+        self._sentences = 0
+        for counts in self._counts:
+            self._add_counts(counts, 1)
+        self._index = _ParagraphIndex([len(chunk) for chunk in self._chunks])
+    
+    def _rebuild_slots(self) -> None:
+        """Split multi-line chunks one line per slot, drop empty slots and rebuild the index."""
+        chunks: List[str] = []
+        counts: List[ChunkCounts] = []
+        for chunk, chunk_counts in zip(self._chunks, self._counts):
+            newline = chunk.find("\n")
+            if newline < 0 or newline == len(chunk) - 1:
+                if chunk:
+                    chunks.append(chunk)
+                    counts.append(chunk_counts)
+                continue
+            lines = chunk.split("\n")
+            pieces = [line + "\n" for line in lines[:-1]] + ([lines[-1]] if lines[-1] else [])
+            chunks.extend(pieces)
+            counts.extend(_count_chunk(piece) for piece in pieces)
+        
+        if not chunks:
+            chunks, counts = [""], [_count_chunk("")]
+        self._chunks = chunks
+        self._counts = counts
+        self._empty = sum(1 for chunk in chunks if not chunk)
+        self._index = _ParagraphIndex([len(chunk) for chunk in chunks])
+    
+    def _replace(self, index: int, chunk: str, counts: ChunkCounts) -> None:
+        """Swap one slot's chunk, updating the running totals and its index entry."""
+        old = self._chunks[index]
+        self._add_counts(self._counts[index], -1)
+        self._add_counts(counts, 1)
+        self._empty += (not chunk) - (not old)
+        self._index.add(index, len(chunk) - len(old))
+        self._chunks[index] = chunk
+        self._counts[index] = counts
+    
+    def _add_counts(self, counts: ChunkCounts, sign: int) -> None:
+        """Add (sign 1) or remove (sign -1) a chunk's counts from the running totals."""
+        indicators, readability, sentences = counts
+        if sign > 0:
+            self._indicators.update(indicators)
+        else:
+            self._indicators.subtract(indicators)
+        for position, value in enumerate(readability):
+            self._readability[position] += sign * value
+        self._sentences += sign * sentences
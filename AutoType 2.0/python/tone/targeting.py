@@ -0,0 +1,169 @@
+"""
+Tone targeting module for AutoType.
+This module adjusts text step by step until its tone scores reach a target.
+
+Every place where a rule set could rewrite the text is a candidate. The effect of
+a rewrite on the indicator totals depends only on the phrase and its
+replacement, so it is computed once per distinct rewrite and each candidate is
+re-scored in O(1) by adding it to the running totals. Rewrites are applied in
+order of how much closer they bring the scores to the target, until the scores
+are within the tolerance, nothing helps any more, or the limits are reached.
+"""
+
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from .indicators import (DIMENSION_NAMES, MAX_SCORE, MIN_SCORE, NEUTRAL_SCORE, count_indicators,
+                         indicator_totals, score_dimensions, score_from_total)
+from .rules import DEFAULT_RULE_SETS, ToneRuleSet, tokenize_for_rules
+
+
+# How close (in score points) each dimension must get to its target
+DEFAULT_TOLERANCE = 0.25
+
+# Limits on the number of rewrites and on the time spent choosing them
+DEFAULT_MAX_REWRITES = 10000
+DEFAULT_TIME_LIMIT = 2.0
+
+
+def rewrite_delta(phrase: str, replacement: str) -> Tuple[float, ...]:
+    """
+    Get the change in indicator totals caused by replacing a phrase.
+    
+    Args:
+        phrase: The original word or phrase
+        replacement: The text that replaces it
+    
+    Returns:
+        Change in the raw weight total per dimension, in DIMENSION_NAMES order
+    """
+    before = indicator_totals(count_indicators(phrase))
+    after = indicator_totals(count_indicators(replacement))
+    return tuple(new - old for old, new in zip(before, after))
+
+
+def target_error(total: float, target: float) -> float:
+    """
+    Measure how far a raw weight total is from giving the target score.
+    
+    The distance is taken before scores are clamped to 1-5, so rewrites still
+    count as progress while a score is stuck at the end of the range.
+    
+    Args:
+        total: Raw weight total of a dimension
+        target: Target score
+    
+    Returns:
+        Distance in score points (0 if the total gives the target score)
+    """
+    raw = NEUTRAL_SCORE + total
+    if target >= MAX_SCORE:
+        return max(0.0, MAX_SCORE - raw)
+    if target <= MIN_SCORE:
+        return max(0.0, raw - MIN_SCORE)
+    return abs(raw - target)
+
+
+def seek_tone(text: str, target_formality: float, target_technical_level: float,
+              tolerance: float = DEFAULT_TOLERANCE, max_rewrites: int = DEFAULT_MAX_REWRITES,
+              time_limit: float = DEFAULT_TIME_LIMIT,
+              rule_sets: Optional[Dict[str, ToneRuleSet]] = None) -> Dict[str, Any]:
+    """
+    Rewrite the text until its formality and technical level are close to a target.
+    
+    Only rewrites that move a score are applied, so the text changes no more
+    than needed to reach the target.
+    
+    Args:
+        text: The text to adjust
+        target_formality: Target formality level (1-5)
+        target_technical_level: Target technical level (1-5)
+        tolerance: Maximum remaining difference per dimension
+        max_rewrites: Maximum number of rewrites to apply
+        time_limit: Maximum number of seconds to spend
+        rule_sets: Rule set name -> rule set to draw rewrites from
+            (defaults to tone.rules.DEFAULT_RULE_SETS)
+    
+    Returns:
+        Dictionary with the adjusted text, its formality and technical_level,
+        the number of rewrites applied and whether the target was reached
+    """
+    deadline = time.monotonic() + time_limit
+    if rule_sets is None:
+        rule_sets = DEFAULT_RULE_SETS
+    
+    targets = {"formality": target_formality, "technical_level": target_technical_level}
+    target_vector = [targets.get(name) for name in DIMENSION_NAMES]
+    
+    def error(totals: List[float]) -> float:
+        return sum(target_error(total, target)
+                   for total, target in zip(totals, target_vector) if target is not None)
+    
+    def converged(totals: List[float]) -> bool:
+        return all(abs(score_from_total(total) - target) <= tolerance
+                   for total, target in zip(totals, target_vector) if target is not None)
+    
+    totals = list(indicator_totals(count_indicators(text)))
+    matches = tokenize_for_rules(text, rule_sets.values())
+    
+    # Distinct rewrite (rule set, phrase) -> [replacement, delta, match indices]
+    candidates: Dict[Tuple[str, str], List[Any]] = {}
+    for index, (_, _, phrase) in enumerate(matches):
+        for name, rules in rule_sets.items():
+            replacement = rules.replacements.get(phrase)
+            if replacement is None:
+                continue
+            candidate = candidates.get((name, phrase))
+            if candidate is None:
+                delta = rewrite_delta(phrase, replacement)
+                if not any(delta):
+                    # Rewrites that do not move any score are never worth applying
+                    continue
+                candidate = candidates[(name, phrase)] = [replacement, delta, deque()]
+            candidate[2].append(index)
+    
+    # Match index -> replacement, for the matches rewritten so far
+    rewrites: Dict[int, str] = {}
+    while not converged(totals) and len(rewrites) < max_rewrites and time.monotonic() < deadline:
+        current_error = error(totals)
+        best = None
+        best_gain = 0.0
+        for key, (_, delta, indices) in candidates.items():
+            if not indices:
+                continue
+            gain = current_error - error([total + change for total, change in zip(totals, delta)])
+            if gain > best_gain + 1e-12:
+                best, best_gain = key, gain
+        if best is None:
+            break
+        
+        replacement, delta, indices = candidates[best]
+        index = indices.popleft()
+        if index in rewrites:
+            # Already rewritten by another rule set
+            continue
+        rewrites[index] = replacement
+        totals = [total + change for total, change in zip(totals, delta)]
+    
+    # Build the adjusted text
+    pieces = []
+    position = 0
+    for index in sorted(rewrites):
+        start, end, _ = matches[index]
+        pieces.append(text[position:start])
+        pieces.append(rewrites[index])
+        position = end
+    pieces.append(text[position:])
+    
+    adjusted_text = ''.join(pieces)
+    
+    # One final pass reports the exact scores of the adjusted text
+    scores = score_dimensions(count_indicators(adjusted_text))
+    return {
+        "text": adjusted_text,
+        "formality": scores["formality"],
+        "technical_level": scores["technical_level"],
+        "rewrites": len(rewrites),
+        "converged": all(abs(scores[name] - target) <= tolerance for name, target in targets.items()),
+    }
@@ -0,0 +1,177 @@
+"""
+Tone vectors module for AutoType.
+This module represents tone profiles as vectors and finds the presets closest to a text.
+
+Every preset is a row of a NumPy matrix with one column per tone dimension, scaled
+so that one unit means about the same amount of change in every dimension. A
+nearest-preset or top-k query is a single vectorized distance computation; with
+many presets a KD-tree is built instead, once per combination of dimensions.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+
+# Tone dimension -> (preset key, neutral value, scale)
+# The neutral value stands in for presets that do not set a dimension
+TONE_DIMENSIONS = {
+    "formality": ("formality_level", 3.0, 1.0),
+    "technical_level": ("technical_level", 3.0, 1.0),
+    "flesch_reading_ease": ("flesch_reading_ease", 60.0, 20.0),
+    "average_sentence_length": ("average_sentence_length", 15.0, 5.0),
+}
+
+DIMENSION_NAMES = tuple(TONE_DIMENSIONS)
+
+# Preset count from which queries use a KD-tree instead of brute force
+KD_TREE_THRESHOLD = 1000
+
+# Profiles compared at once by nearest_many, to bound the distance matrix size
+NEAREST_MANY_CHUNK_SIZE = 1024
+
+
+def preset_vector(preset: Dict[str, Any]) -> np.ndarray:
+    """
+    Get the scaled tone vector of a preset.
+    
+    Args:
+        preset: Preset information dictionary
+    
+    Returns:
+        Vector with one entry per tone dimension
+    """
+    return np.array([float(preset.get(key, neutral)) / scale
+                     for key, neutral, scale in TONE_DIMENSIONS.values()], dtype=np.float64)
+
+
+def profile_vector(profile: Dict[str, Any]) -> Tuple[np.ndarray, Tuple[int, ...]]:
+    """
+    Get the scaled tone vector of an analyzed text.
+    
+    Args:
+        profile: Tone analysis (dimension name -> value); missing dimensions are ignored
+    
+    Returns:
+        Tuple of (vector of the dimensions present, their column indices)
+    """
+    columns = []
+    values = []
+    for column, (name, (_, _, scale)) in enumerate(TONE_DIMENSIONS.items()):
+        value = profile.get(name)
+        if value is not None:
+            columns.append(column)
+            values.append(float(value) / scale)
+    return np.array(values, dtype=np.float64), tuple(columns)
+
+
+class ToneIndex:
+    """Tone vectors of a set of presets, for nearest-preset queries."""
+    
+    def __init__(self, presets: Sequence[Dict[str, Any]], tree_threshold: int = KD_TREE_THRESHOLD):
+        """
+        Args:
+            presets: Preset information dictionaries
+            tree_threshold: Preset count from which KD-trees are used (if SciPy is installed)
+        """
+        self.preset_ids = [preset["id"] for preset in presets]
+        self.matrix = np.array([preset_vector(preset) for preset in presets],
+                               dtype=np.float64).reshape(len(presets), len(TONE_DIMENSIONS))
+        self.use_tree = cKDTree is not None and len(presets) >= tree_threshold
+        self._trees: Dict[Tuple[int, ...], Any] = {}
+    
+    def __len__(self) -> int:
+        return len(self.preset_ids)
+    
+    def query(self, profile: Dict[str, Any], k: int = 1) -> List[Tuple[str, float]]:
+        """
+        Find the presets closest to a tone profile.
+        
+        Args:
+            profile: Tone analysis (dimension name -> value); only the dimensions
+                present are compared
+            k: Number of presets to return
+        
+        Returns:
+            List of (preset ID, distance), closest first
+        """
+        k = min(k, len(self))
+        if k <= 0:
+            return []
+        
+        vector, columns = profile_vector(profile)
+        
+        if self.use_tree and columns:
+            tree = self._trees.get(columns)
+            if tree is None:
+                tree = self._trees[columns] = cKDTree(self.matrix[:, columns])
+            distances, indices = tree.query(vector, k=k)
+            distances = np.atleast_1d(distances)
+            indices = np.atleast_1d(indices)
+        else:
+            distances = np.sqrt(((self.matrix[:, columns] - vector) ** 2).sum(axis=1))
+            if k == 1:
+                # First of equally close presets, like a linear scan
+                indices = np.array([np.argmin(distances)])
+            elif k < len(self):
+                indices = np.argpartition(distances, k - 1)[:k]
+                indices = indices[np.argsort(distances[indices], kind="stable")]
+            else:
+                indices = np.argsort(distances, kind="stable")
+            distances = distances[indices]
+        
+        return [(self.preset_ids[index], float(distance)) for index, distance in zip(indices, distances)]
+    
+    def nearest(self, profile: Dict[str, Any]) -> Optional[str]:
+        """
+        Find the preset closest to a tone profile.
+        
+        Args:
+            profile: Tone analysis (dimension name -> value)
+        
+        Returns:
+            ID of the closest preset, or None if there are no presets
+        """
+        closest = self.query(profile, 1)
+        return closest[0][0] if closest else None
+    
+    def nearest_many(self, profiles: Dict[str, np.ndarray]) -> List[Optional[str]]:
+        """
+        Find the closest preset of many tone profiles at once.
+        
+        Args:
+            profiles: Dimension name -> array with one value per profile; missing
+                dimensions are ignored
+        
+        Returns:
+            ID of the closest preset for each profile (None if there are no presets)
+        """
+        columns = tuple(column for column, name in enumerate(TONE_DIMENSIONS) if name in profiles)
+        if not columns:
+            count = len(next(iter(profiles.values()))) if profiles else 0
+            return [self.preset_ids[0] if self.preset_ids else None] * count
+        
+        points = np.column_stack([np.asarray(profiles[DIMENSION_NAMES[column]], dtype=np.float64)
+                                  / TONE_DIMENSIONS[DIMENSION_NAMES[column]][2] for column in columns])
+        if not len(self):
+            return [None] * len(points)
+        
+        if self.use_tree:
+            tree = self._trees.get(columns)
+            if tree is None:
+                tree = self._trees[columns] = cKDTree(self.matrix[:, columns])
+            _, indices = tree.query(points)
+        else:
+            presets = self.matrix[:, columns]
+            indices = np.empty(len(points), dtype=np.int64)
+            for start in range(0, len(points), NEAREST_MANY_CHUNK_SIZE):
+                chunk = points[start:start + NEAREST_MANY_CHUNK_SIZE]
+                distances = ((chunk[:, np.newaxis, :] - presets[np.newaxis, :, :]) ** 2).sum(axis=2)
+                indices[start:start + len(chunk)] = np.argmin(distances, axis=1)
+        
+        return [self.preset_ids[index] for index in indices]